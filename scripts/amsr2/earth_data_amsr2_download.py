@@ -1,11 +1,10 @@
 #!/usr/bin/python
 
-from multiprocessing import Pool
-
 import click
 
-from snowrs import EarthData
-from snowrs.script_helpers import download_file
+from snowrs import EarthData, ListingCache
+from snowrs.download_engine import DownloadEngine
+from snowrs.script_helpers import mb_per_second
 
 
 @click.command()
@@ -18,17 +17,60 @@ from snowrs.script_helpers import download_file
               type=click.Path(exists=True),
               prompt=True,
               help='The destination folder to store the files')
+@click.option('--cache-folder',
+              prompt=False,
+              type=click.Path(file_okay=False),
+              help='Optional - Folder to cache the remote index listings')
+@click.option('--segments',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=1,
+              help='Optional - Number of parallel byte range segments for '
+                   'large files')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.WORKERS,
+              help='Optional - Number of parallel downloads')
+@click.option('--host-connections',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.HOST_CONNECTIONS,
+              help='Optional - Maximum concurrent downloads per host')
+@click.option('--bandwidth',
+              prompt=False,
+              type=float,
+              default=None,
+              help='Optional - Total bandwidth limit in MB/s')
+@click.option('--retries',
+              prompt=False,
+              type=click.IntRange(min=0),
+              default=DownloadEngine.RETRIES,
+              help='Optional - Retries for server errors and timeouts')
 def data_download(**kwargs):
-    session = EarthData(kwargs['username'], kwargs['password'], 'AMSR2')
-    file_list = session.list_datafiles()
-    p = Pool(4)
-    p_res = [
-        p.apply_async(
-            download_file,
-            (session, name, url, kwargs['download_folder'])
-        ) for name, url in file_list.items()
-    ]
-    [res.get() for res in p_res]
+    listing_cache = None
+    if kwargs['cache_folder']:
+        listing_cache = ListingCache(kwargs['cache_folder'])
+
+    def earth_data_session():
+        return EarthData(
+            kwargs['username'], kwargs['password'], 'AMSR2',
+            listing_cache=listing_cache
+        )
+
+    file_list = earth_data_session().list_datafiles()
+
+    engine = DownloadEngine(
+        earth_data_session,
+        workers=kwargs['workers'],
+        host_connections=kwargs['host_connections'],
+        bandwidth=mb_per_second(kwargs['bandwidth']),
+        retries=kwargs['retries'],
+    )
+    engine.download(
+        file_list.items(), kwargs['download_folder'],
+        segments=kwargs['segments']
+    )
 
 
 if __name__ == '__main__':
@@ -1,12 +1,12 @@
 #!/usr/bin/python
 
 import os
-from multiprocessing import Pool
 
 import click
 
-from snowrs import EarthData
-from snowrs.script_helpers import dates_in_range, download_file
+from snowrs import EarthData, ListingCache
+from snowrs.download_engine import DownloadEngine
+from snowrs.script_helpers import dates_in_range, mb_per_second
 
 
 # TODO - Remove me
@@ -39,25 +39,66 @@ def ensure_folder(folder):
               prompt=True,
               type=int,
               help='The ending day to download data from')
+@click.option('--cache-folder',
+              prompt=False,
+              type=click.Path(file_okay=False),
+              help='Optional - Folder to cache the remote index listings')
+@click.option('--segments',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=1,
+              help='Optional - Number of parallel byte range segments for '
+                   'large files')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.WORKERS,
+              help='Optional - Number of parallel downloads')
+@click.option('--host-connections',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.HOST_CONNECTIONS,
+              help='Optional - Maximum concurrent downloads per host')
+@click.option('--bandwidth',
+              prompt=False,
+              type=float,
+              default=None,
+              help='Optional - Total bandwidth limit in MB/s')
+@click.option('--retries',
+              prompt=False,
+              type=click.IntRange(min=0),
+              default=DownloadEngine.RETRIES,
+              help='Optional - Retries for server errors and timeouts')
 def data_download(**kwargs):
-    session = EarthData(kwargs['username'], kwargs['password'], 'AMSRE')
-    # To authenticate for the session
-    session.get_index()
+    listing_cache = None
+    if kwargs['cache_folder']:
+        listing_cache = ListingCache(kwargs['cache_folder'])
+
+    def earth_data_session():
+        session = EarthData(
+            kwargs['username'], kwargs['password'], 'AMSRE',
+            listing_cache=listing_cache
+        )
+        # To authenticate for the session
+        session.get_index()
+        return session
 
     dates = dates_in_range(kwargs['year'], kwargs['day_from'], kwargs['day_to'])
     download_folder = ensure_folder(
         os.path.join(kwargs['download_folder'], str(kwargs['year']))
     )
-    file_list = session.files_for_date_range(dates)
+    file_list = earth_data_session().files_for_date_range(dates)
 
-    p = Pool(4)
-    p_res = [
-        p.apply_async(
-            download_file,
-            (session, name, url, download_folder)
-        ) for name, url in file_list.items()
-    ]
-    [res.get() for res in p_res]
+    engine = DownloadEngine(
+        earth_data_session,
+        workers=kwargs['workers'],
+        host_connections=kwargs['host_connections'],
+        bandwidth=mb_per_second(kwargs['bandwidth']),
+        retries=kwargs['retries'],
+    )
+    engine.download(
+        file_list.items(), download_folder, segments=kwargs['segments']
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+import re
+import sys
+import timeit
+
+import click
+
+from snowrs.link_extractor import find_links
+
+AMSR2_FILE_REGEX = re.compile(r'AMSR_2_L3_DailySnow_.*')
+
+INDEX_ROW = '<tr><td valign="top"><img src="/icons/unknown.gif" alt="[   ]">' \
+            '</td><td><a href="{0}">{0}</a></td>' \
+            '<td align="right">2018-01-02 03:04  </td>' \
+            '<td align="right">9.2M</td><td>&nbsp;</td></tr>\n'
+
+
+def synthetic_index(entries):
+    """
+    Apache style directory listing similar to the AMSR2 LANCE index.
+    """
+    rows = ''.join(
+        INDEX_ROW.format(
+            'AMSR_2_L3_DailySnow_B01_2018{0:04d}.he5'.format(entry)
+        ) for entry in range(entries)
+    )
+    return '<html><head><title>Index of /daysnow</title></head><body>' \
+           '<table><tr><th><a href="?C=N;O=D">Name</a></th></tr>' + \
+           rows + '</table></body></html>'
+
+
+def soup_links(index_html):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(index_html, 'html.parser').find_all(
+        href=AMSR2_FILE_REGEX
+    )
+
+
+def benchmark(name, function, index_html, repeat):
+    seconds = min(timeit.repeat(
+        lambda: function(index_html), number=1, repeat=repeat
+    ))
+    print('  {0:<16} {1:10.2f} ms'.format(name, seconds * 1000))
+    return seconds
+
+
+@click.command()
+@click.option('--index-page',
+              multiple=True,
+              type=click.Path(exists=True, dir_okay=False),
+              help='Recorded index page, can be given multiple times. '
+                   'Uses a synthetic AMSR2 index when omitted')
+@click.option('--entries',
+              default=5000,
+              help='Number of files in the synthetic index')
+@click.option('--repeat',
+              default=5,
+              help='Number of timed runs, the fastest is reported')
+def run_benchmark(**kwargs):
+    pages = {}
+    for index_page in kwargs['index_page']:
+        with open(index_page) as page:
+            pages[index_page] = page.read()
+    if len(pages) == 0:
+        pages['synthetic ({0} files)'.format(kwargs['entries'])] = \
+            synthetic_index(kwargs['entries'])
+
+    try:
+        import bs4  # noqa: F401
+        has_soup = True
+    except ImportError:
+        print('* BeautifulSoup not installed, only timing link extractor')
+        has_soup = False
+
+    for name, index_html in pages.items():
+        print('Index page: ' + name)
+        extractor = benchmark(
+            'link_extractor',
+            lambda page: find_links(page, AMSR2_FILE_REGEX, attribute='href'),
+            index_html, kwargs['repeat']
+        )
+
+        if has_soup:
+            soup = benchmark(
+                'BeautifulSoup', soup_links, index_html, kwargs['repeat']
+            )
+            print('  Speedup: {0:.1f}x'.format(soup / extractor))
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmark())
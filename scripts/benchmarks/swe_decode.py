@@ -0,0 +1,65 @@
+#!/usr/bin/python
+
+import sys
+import timeit
+
+import click
+import numpy
+
+from snowrs.amsr2 import SWE
+
+# Size of the 25 km EASE-Grid for one hemisphere
+GRID_SIZE = 721
+
+
+def masked_decode(raw_values):
+    """
+    Previous implementation with two boolean masks
+    """
+    swe = raw_values.astype(numpy.int16)
+    swe[swe > SWE.BAND_MAX_DATA_VALUE] = SWE.NO_DATA_VALUE
+    swe[swe > SWE.NO_DATA_VALUE] *= SWE.BAND_VALUE_SCALE_FACTOR
+    return swe
+
+
+def benchmark(name, function, raw_values, repeat):
+    seconds = min(timeit.repeat(
+        lambda: function(raw_values), number=1, repeat=repeat
+    ))
+    print('  {0:<16} {1:10.3f} ms'.format(name, seconds * 1000))
+    return seconds
+
+
+@click.command()
+@click.option('--grid-size',
+              default=GRID_SIZE,
+              help='Rows and columns of the decoded grid')
+@click.option('--hemispheres',
+              default=2,
+              help='Number of hemisphere grids decoded per run')
+@click.option('--repeat',
+              default=20,
+              help='Number of timed runs, the fastest is reported')
+def run_benchmark(**kwargs):
+    raw_values = numpy.random.RandomState(0).randint(
+        0, 256,
+        size=(kwargs['hemispheres'], kwargs['grid_size'], kwargs['grid_size']),
+        dtype=numpy.uint8
+    )
+
+    numpy.testing.assert_equal(
+        SWE.decode_swe(raw_values), masked_decode(raw_values)
+    )
+
+    print('Decoding {0} grid(s) of {1}x{1} pixels'.format(
+        kwargs['hemispheres'], kwargs['grid_size']
+    ))
+    masked = benchmark('masked', masked_decode, raw_values, kwargs['repeat'])
+    lookup = benchmark(
+        'lookup table', SWE.decode_swe, raw_values, kwargs['repeat']
+    )
+    print('  Speedup: {0:.1f}x'.format(masked / lookup))
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmark())
@@ -1,83 +1,403 @@
+import glob
 import os
+import re
 import sys
+from datetime import datetime
+from multiprocessing import Pool
 
 import click
 import numpy as np
 from osgeo import gdal, gdalnumeric, gdalconst
 
+from snowrs import (
+    EarthData, ExecutionProfile, OutputProfile, RemoteGranule, SourceFolder
+)
+from snowrs.amsr2 import RegridPlan
 from snowrs.amsr2.swe import SWE
+from snowrs.script_helpers import output_profile_options, parse_year
 
+SWE_FILE_GLOB = 'AMSR_2_L3_DailySnow_*.he5'
+SWE_FILE_DATE = re.compile(r'_(\d{8})\.he5$')
+SCA_FILE_SUFFIX = '_SCA.tif'
 
-def merge_swe_with_sca(swe_file, sca_file):
+# Upper bound for the rows of SWE and SCA that are merged at once
+WINDOW_MEMORY_BUDGET = 64 * 1024 ** 2  # In Bytes
+# Int16 SWE and SCA, Int32 product and the boolean no data mask
+WINDOW_BYTES_PER_PIXEL = 9
+
+# Regrid plan and profiles of a batch worker process
+worker_plan = None
+worker_profile = None
+worker_output_profile = None
+
+
+def swe_by_sca(swe, sca, swe_no_data, sca_no_data, no_data_value):
+    """
+    SWE scaled by the snow covered area in percent with integer arithmetic.
+    Pixels with no data in either input are set to the no data value.
+
+    :param swe: Numpy array with SWE in mm
+    :param sca: Numpy array with SCA in percent
+    :return: Numpy array with SWE by SCA as Int16
+    """
+    no_data = np.zeros(swe.shape, dtype=bool)
+    if swe_no_data is not None:
+        no_data |= swe == swe_no_data
+    if sca_no_data is not None:
+        no_data |= sca == sca_no_data
+
+    product = swe.astype(np.int32)
+    product *= sca
+    product //= 100
+    product[no_data] = no_data_value
+
+    return product.astype(np.int16)
+
+
+def row_windows(band, budget=WINDOW_MEMORY_BUDGET):
+    """
+    Split given band into full width row windows that are aligned to the
+    natural block height of the band.
+
+    :return: Generator with (y offset, y size)
+    """
+    block_y = band.GetBlockSize()[1]
+    window_y = block_y * max(
+        budget // (band.XSize * block_y * WINDOW_BYTES_PER_PIXEL), 1
+    )
+
+    for y_offset in range(0, band.YSize, window_y):
+        yield y_offset, min(window_y, band.YSize - y_offset)
+
+
+class RunningStatistics:
+    """
+    Minimum, maximum, mean and standard deviation of the valid values of a
+    band, collected while the windows are written.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, values):
+        if values.size == 0:
+            return
+
+        values = values.astype(np.int64)
+        self.count += values.size
+        self.total += int(values.sum())
+        self.total_squares += int((values * values).sum())
+
+        minimum, maximum = int(values.min()), int(values.max())
+        self.minimum = minimum if self.minimum is None \
+            else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None \
+            else max(self.maximum, maximum)
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    @property
+    def std_dev(self):
+        return max(self.total_squares / self.count - self.mean ** 2, 0) ** 0.5
+
+    def set_on(self, band):
+        if self.count > 0:
+            band.SetStatistics(
+                self.minimum, self.maximum, self.mean, self.std_dev
+            )
+
+
+def merge_swe_with_sca(swe_file, sca_file, profile=None, output_profile=None):
     output_file_name = os.path.join(
         os.path.dirname(sca_file.GetDescription()),
         'SWE_by_SCA.tif'
     )
+    profile = profile or ExecutionProfile()
+    output_profile = output_profile or OutputProfile()
 
-    swe_by_sca = gdal.GetDriverByName('MEM').CreateCopy(
-        output_file_name, sca_file, 0
+    swe_by_sca = gdal.GetDriverByName('GTiff').Create(
+        output_file_name,
+        sca_file.RasterXSize, sca_file.RasterYSize,
+        1, gdalconst.GDT_Int16,
+        options=output_profile.creation_options(profile, OutputProfile.GTIFF)
     )
+    swe_by_sca.SetGeoTransform(sca_file.GetGeoTransform())
+    swe_by_sca.SetProjection(sca_file.GetProjection())
     swe_by_sca_band = swe_by_sca.GetRasterBand(1)
 
     modis_band = sca_file.GetRasterBand(1)
-    sca_data = np.ma.masked_values(
-        modis_band.ReadAsArray(), modis_band.GetNoDataValue(), copy=False
-    )
-    sca_data = sca_data / 100
-
     swe_band = swe_file.GetRasterBand(1)
-    swe_data = np.ma.masked_values(
-        swe_band.ReadAsArray(), swe_band.GetNoDataValue(), copy=False
-    )
 
-    gdalnumeric.BandWriteArray(
-        swe_by_sca_band,
-        (sca_data * swe_data).astype(np.int16)
-    )
+    no_data_value = modis_band.GetNoDataValue()
+    if no_data_value is None:
+        no_data_value = SWE.NO_DATA_VALUE
+    swe_by_sca_band.SetNoDataValue(no_data_value)
+
+    statistics = RunningStatistics()
+
+    # Windows follow the output tiles to compress each tile only once
+    for y_offset, y_size in row_windows(swe_by_sca_band):
+        values = swe_by_sca(
+            gdalnumeric.BandReadAsArray(
+                swe_band, 0, y_offset, swe_band.XSize, y_size
+            ),
+            gdalnumeric.BandReadAsArray(
+                modis_band, 0, y_offset, modis_band.XSize, y_size
+            ),
+            swe_band.GetNoDataValue(),
+            modis_band.GetNoDataValue(),
+            no_data_value,
+        )
+        statistics.add(values[values != no_data_value])
+        gdalnumeric.BandWriteArray(swe_by_sca_band, values, yoff=y_offset)
+
+        del values
 
     swe_by_sca_band.SetMetadata({
         'Description': 'Snow Water Equivalent',
         'Unit': 'mm'
     })
-    swe_by_sca_band.ComputeStatistics(0)
+    statistics.set_on(swe_by_sca_band)
     swe_by_sca_band.FlushCache()
 
-    del modis_band, sca_data
-    del swe_band, swe_data
+    del modis_band
+    del swe_band
     del swe_by_sca_band
+    del swe_by_sca
 
-    # GDAL Translate is more efficient with compression for some unknown reason
-    gdal.Translate(
-        output_file_name,
-        swe_by_sca,
-        format='GTiff',
-        creationOptions=["COMPRESS=LZW", "TILED=YES",
-                         "BIGTIFF=IF_SAFER", "NUM_THREADS=ALL_CPUS"]
-    )
+    output_profile.finish(output_file_name, profile)
+
+
+def open_swe(kwargs):
+    """
+    Local SWE file or a remote granule read without writing it to disk.
+
+    :return: Tuple with SWE and the RemoteGranule or None
+    """
+    if kwargs['swe_file']:
+        return SWE(kwargs['swe_file']), None
+
+    session = EarthData(kwargs['username'], kwargs['password'], 'AMSR2')
+    granule = RemoteGranule(session, kwargs['swe_url'], kwargs['stream_mode'])
+
+    try:
+        return SWE(granule.path), granule
+    except Exception:
+        granule.close()
+        raise
 
-    del swe_by_sca
 
+def swe_file_pairs(swe_folder, sca_folder):
+    """
+    Pair the AMSR2 daily files with the MODIS SCA files of the same day.
+    AMSR2 files carry the date as YYYYMMDD and the SCA files as YYYYDDD.
 
-@click.command()
+    :param swe_folder: Folder with the AMSR2 daily files
+    :param sca_folder: SourceFolder for the snow fraction of a year
+    :return: Sorted list of tuples with day (YYYYDDD), SWE and SCA file
+    """
+    pairs = []
+
+    for swe_file in glob.glob(os.path.join(swe_folder, SWE_FILE_GLOB)):
+        match = SWE_FILE_DATE.search(swe_file)
+        if match is None:
+            continue
+
+        day = datetime.strptime(match.group(1), '%Y%m%d')
+        if day.year != sca_folder.year:
+            continue
+
+        doy = day.strftime('%Y%j')
+        sca_file = os.path.join(
+            sca_folder.type_path, doy, doy + SCA_FILE_SUFFIX
+        )
+        if os.path.exists(sca_file):
+            pairs.append((doy, swe_file, sca_file))
+
+    return sorted(pairs)
+
+
+def regrid_plan(sca_file, plan_file=None):
+    """
+    Plan for the geometry of the SCA files. A plan stored in plan_file is
+    reused when it was built for the same geometry, otherwise a new one is
+    built and stored.
+
+    :param sca_file: Reference SCA file
+    :param plan_file: Optional - Path to a stored plan (.npz)
+    :return: RegridPlan
+    """
+    reference = gdal.Open(sca_file, gdalconst.GA_ReadOnly)
+
+    if plan_file and os.path.exists(plan_file):
+        plan = RegridPlan.load(plan_file)
+        if plan.matches(reference):
+            return plan
+        print('* Stored plan does not match the SCA geometry, rebuilding')
+
+    print('Building regrid plan for: ' + sca_file)
+    plan = RegridPlan.for_reference(reference)
+
+    if plan_file:
+        plan.save(plan_file)
+
+    return plan
+
+
+def init_worker(plan, profile, output_profile):
+    global worker_plan, worker_profile, worker_output_profile
+    worker_plan = plan
+    worker_profile = profile
+    worker_output_profile = output_profile
+    profile.apply()
+
+
+def merge_day(pair):
+    """
+    Merge the SWE and SCA file of one day in a batch worker.
+
+    :return: Tuple with day and 'done' or the error message
+    """
+    doy, swe_file, sca_file = pair
+
+    try:
+        sca = gdal.Open(sca_file, gdalconst.GA_ReadOnly)
+        swe = SWE(swe_file)
+
+        if worker_plan.matches(sca):
+            swe.regrid_to_tif(worker_plan)
+        else:
+            swe.clip_to_tif(sca)
+
+        merge_swe_with_sca(
+            swe.tif_file, sca, worker_profile, worker_output_profile
+        )
+
+        del swe
+        del sca
+    except Exception as error:
+        return doy, str(error)
+
+    return doy, 'done'
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command('single')
 @click.option('--swe-file',
-              prompt=True,
               type=click.Path(exists=True),
               help='Location of LANCE 2 SWE file')
+@click.option('--swe-url',
+              help='URL of LANCE 2 SWE file to read without downloading it')
+@click.option('--stream-mode',
+              type=click.Choice(RemoteGranule.MODES),
+              default=RemoteGranule.VSIMEM,
+              help='Optional - Read the SWE URL in memory (vsimem) or with '
+                   'range requests (vsicurl)')
+@click.option('--username',
+              envvar='EARTHDATA_USERNAME',
+              help='EarthData username for --swe-url')
+@click.option('--password',
+              envvar='EARTHDATA_PASSWORD',
+              hide_input=True,
+              help='EarthData password for --swe-url')
 @click.option('--modis-file',
               prompt=True,
               type=click.Path(exists=True),
               help='Location of MODIS SCA file')
-def process_swe(**kwargs):
+@output_profile_options
+@click.pass_context
+def process_swe(ctx, **kwargs):
+    if not kwargs['swe_file'] and not kwargs['swe_url']:
+        ctx.fail('Either --swe-file or --swe-url is required')
+
     sca = gdal.Open(kwargs['modis_file'], gdalconst.GA_ReadOnly)
 
-    swe = SWE(kwargs['swe_file'])
-    swe.clip_to_tif(sca)
+    swe, granule = open_swe(kwargs)
+    try:
+        swe.clip_to_tif(sca)
+
+        merge_swe_with_sca(
+            swe.tif_file, sca, output_profile=kwargs['output_profile']
+        )
+    finally:
+        del swe
+        del sca
+
+        if granule is not None:
+            granule.close()
+
+
+@cli.command('batch')
+@click.option('--swe-folder',
+              prompt=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='Location of the LANCE 2 SWE files')
+@click.option('--modis-folder',
+              prompt=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='Base folder of the MODIS SCA files, with a snow_fraction '
+                   'folder for each year')
+@click.option('--year',
+              prompt=False,
+              type=int,
+              callback=parse_year,
+              help='Optional - Process specific year')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=1,
+              help='Optional - Number of days merged in parallel')
+@click.option('--plan-file',
+              prompt=False,
+              type=click.Path(dir_okay=False),
+              help='Optional - File to store and reuse the regrid plan (.npz)')
+@output_profile_options
+def process_batch(**kwargs):
+    profile = ExecutionProfile.for_workers(kwargs['workers'])
+    failed_days = 0
+    sca_folder = SourceFolder(kwargs['modis_folder'], source_type='fraction')
+
+    for year in kwargs['year']:
+        sca_folder.year = year
+        pairs = swe_file_pairs(kwargs['swe_folder'], sca_folder)
+
+        if len(pairs) == 0:
+            continue
+
+        print('Processing year: {0} ({1} days)'.format(year, len(pairs)))
+        plan = regrid_plan(pairs[0][2], kwargs['plan_file'])
+
+        with Pool(
+                kwargs['workers'],
+                initializer=init_worker,
+                initargs=(plan, profile, kwargs['output_profile'])
+        ) as pool:
+            failed = [
+                (doy, status)
+                for doy, status in pool.imap_unordered(merge_day, pairs)
+                if status != 'done'
+            ]
+
+        for doy, status in sorted(failed):
+            print('* Failed to process day {0}: {1}'.format(doy, status))
 
-    merge_swe_with_sca(swe.tif_file, sca)
+        print('Done processing year: {0}'.format(year))
+        failed_days += len(failed)
 
-    del swe
-    del sca
+    if failed_days > 0:
+        print('* Failed to process {0} days'.format(failed_days))
+        sys.exit(1)
 
 
 if __name__ == '__main__':
-    sys.exit(process_swe())
+    sys.exit(cli())
@@ -2,11 +2,78 @@
 
 import os
 import sys
+from functools import partial
+from multiprocessing import Pool
 
 import click
 
-from snowrs import SourceFolder, TileMerger
-from snowrs.script_helpers import parse_year, validate_types
+from snowrs import (
+    ExecutionProfile, MergeManifest, SourceFolder, TileMerger
+)
+from snowrs.download_ledger import DownloadLedger
+from snowrs.script_helpers import (
+    output_profile_options, parse_year, validate_types
+)
+
+
+def init_worker(profile):
+    """
+    Give each worker process its own GDAL block cache budget.
+
+    :param profile: ExecutionProfile for the worker
+    """
+    profile.apply()
+
+
+def day_merger(options, doy_folder):
+    """
+    TileMerger for one day folder, which also gives the fingerprint that is
+    recorded in the merge manifest.
+
+    :param options: Parsed command line options
+    :param doy_folder: Day folder to process
+    :return: TileMerger
+    """
+    return TileMerger(
+        doy_folder, options['source_type'],
+        window_budget=options['window_budget'] * 1024 ** 2,
+        profile=options['profile'],
+        output_profile=options['output_profile'],
+        single_pass=options['single_pass'],
+    )
+
+
+def merge_folder(options, doy_folder):
+    """
+    Mosaic and project all tiles of one day folder.
+
+    :param options: Parsed command line options
+    :param doy_folder: Day folder to process
+    :return: Tuple with day folder and one of 'done', 'empty' or an error
+    """
+    print('  Processing folder: ' + doy_folder)
+
+    return doy_folder, day_merger(options, doy_folder).run()
+
+
+def process_doy_folders(doy_folders, options):
+    """
+    Process given day folders serially or with a pool of worker processes.
+
+    :return: List of (day folder, status) tuples
+    """
+    if options['workers'] > 1:
+        with Pool(
+                options['workers'],
+                initializer=init_worker,
+                initargs=(options['profile'],)
+        ) as pool:
+            return list(pool.imap_unordered(
+                partial(merge_folder, options), doy_folders
+            ))
+
+    init_worker(options['profile'])
+    return [merge_folder(options, doy_folder) for doy_folder in doy_folders]
 
 
 @click.command()
@@ -26,10 +93,47 @@ from snowrs.script_helpers import parse_year, validate_types
 @click.option('--scan-folder',
               is_flag=True,
               help='Scan the source folder for newly downloaded files')
+@click.option('--single-pass',
+              is_flag=True,
+              help='Filter and project each mosaic in one pass without '
+                   'in-memory copies')
+@click.option('--force',
+              is_flag=True,
+              help='Rebuild all outputs, including the ones that are up to '
+                   'date')
+@click.option('--window-budget',
+              prompt=False,
+              type=int,
+              default=TileMerger.WINDOW_MEMORY_BUDGET // 1024 ** 2,
+              help='Optional - Memory budget in MB for each mosaic read '
+                   'window')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=1,
+              help='Optional - Number of day folders processed in parallel')
+@click.option('--gdal-cache',
+              prompt=False,
+              type=int,
+              default=None,
+              help='Optional - GDAL block cache size in MB for each worker')
+@click.option('--warp-memory',
+              prompt=False,
+              type=int,
+              default=ExecutionProfile.WARP_MEMORY_LIMIT,
+              help='Optional - GDAL warp memory limit in MB for each worker')
+@output_profile_options
 def process_folder(**kwargs):
     source_folder = SourceFolder(
         kwargs['source_folder'], source_type=kwargs['source_type']
     )
+    # Cores are shared between the workers
+    kwargs['profile'] = ExecutionProfile.for_workers(
+        kwargs['workers'],
+        cache_size=kwargs['gdal_cache'],
+        warp_memory_limit=kwargs['warp_memory'],
+    )
+    failed_years = []
 
     for year in kwargs['year']:
         print('Processing year: ' + str(year))
@@ -42,21 +146,49 @@ def process_folder(**kwargs):
         if 'scan_folder' in kwargs and kwargs['scan_folder'] is True:
             print('* Scanning folder for new files and move to folder:\n')
             print('  {0}'.format(source_folder.type_path))
-            source_folder.process_new_files()
-
-        for doy_folder in source_folder.doy_folders():
-            print('  Processing folder: ' + doy_folder)
+            source_folder.process_new_files(
+                ledger=DownloadLedger(source_folder.type_path)
+            )
 
-            merger = TileMerger(doy_folder, kwargs['source_type'])
+        manifest = MergeManifest(source_folder.type_path)
+        doy_folders = source_folder.doy_folders()
+        pending = {}
 
-            if merger.create_mosaic() == -1:
+        for doy_folder in doy_folders:
+            merger = day_merger(kwargs, doy_folder)
+            if not kwargs['force'] and merger.is_up_to_date(manifest):
                 continue
+            pending[doy_folder] = (merger.output_file_name, merger.fingerprint)
+
+        print('  {0} folders to process, {1} are up to date'.format(
+            len(pending), len(doy_folders) - len(pending)
+        ))
+
+        results = process_doy_folders(list(pending), kwargs)
+
+        for doy_folder, status in results:
+            if status == 'done':
+                manifest.update(*pending[doy_folder])
+        manifest.save()
+
+        failed = [
+            (doy_folder, status) for doy_folder, status in results
+            if status not in ['done', 'empty']
+        ]
 
-            merger.project()
+        print('Done processing source folder: ' + source_folder.type_path)
 
-            del merger
+        if len(failed) > 0:
+            print('* Failed to process {0} of {1} folders:'.format(
+                len(failed), len(results))
+            )
+            for doy_folder, error in sorted(failed):
+                print('  {0}: {1}'.format(doy_folder, error))
+            failed_years.append(year)
 
-            print('Done processing source folder: ' + source_folder.type_path)
+    if len(failed_years) > 0:
+        # Signal the failures to the caller, e.g. cron
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,16 +1,12 @@
 #!/usr/bin/python
 
 import os
-from multiprocessing import Pool
 
 import click
 
-from snowrs import JPLData, SourceFolder
-from snowrs.script_helpers import download_file, parse_year
-
-
-def to_array(_ctx, _param, value):
-    return value.split(',')
+from snowrs import JPLData, ListingCache, SourceFolder
+from snowrs.download_engine import DownloadEngine
+from snowrs.script_helpers import mb_per_second, parse_year, to_array
 
 
 def validate_type(ctx, _param, value):
@@ -21,10 +17,6 @@ def validate_type(ctx, _param, value):
         return value
 
 
-def get_from_jpl(kwargs, name, url, download_folder):
-    return download_file(JPLData(**kwargs), name, url, download_folder)
-
-
 @click.command()
 @click.option('--username',
               prompt='Your username',
@@ -61,8 +53,57 @@ def get_from_jpl(kwargs, name, url, download_folder):
               prompt=True,
               callback=to_array,
               help='Pattern of file to look for')
+@click.option('--index-workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=JPLData.INDEX_WORKERS,
+              help='Optional - Number of day indexes requested concurrently')
+@click.option('--cache-folder',
+              prompt=False,
+              type=click.Path(file_okay=False),
+              help='Optional - Folder to cache the remote index listings')
+@click.option('--listing-ttl',
+              prompt=False,
+              type=int,
+              default=JPLData.LISTING_TTL,
+              help='Optional - Seconds a cached index listing is used before '
+                   'it is revalidated. Historic years are cached forever')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.WORKERS,
+              help='Optional - Number of parallel downloads')
+@click.option('--host-connections',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.HOST_CONNECTIONS,
+              help='Optional - Maximum concurrent downloads per host')
+@click.option('--bandwidth',
+              prompt=False,
+              type=float,
+              default=None,
+              help='Optional - Total bandwidth limit in MB/s')
+@click.option('--retries',
+              prompt=False,
+              type=click.IntRange(min=0),
+              default=DownloadEngine.RETRIES,
+              help='Optional - Retries for server errors and timeouts')
+@click.option('--revalidate',
+              is_flag=True,
+              help='Optional - Check downloaded files for changes on the '
+                   'server and download changed files again')
 def data_download(**kwargs):
+    if kwargs['cache_folder']:
+        kwargs['listing_cache'] = ListingCache(kwargs['cache_folder'])
+
     session = JPLData(**kwargs)
+    engine = DownloadEngine(
+        lambda: JPLData(**kwargs),
+        workers=kwargs['workers'],
+        host_connections=kwargs['host_connections'],
+        bandwidth=mb_per_second(kwargs['bandwidth']),
+        retries=kwargs['retries'],
+    )
 
     days = range(kwargs['day_from'], kwargs['day_to'] + 1)
 
@@ -85,19 +126,21 @@ def data_download(**kwargs):
               '\n in day range ' + str(kwargs['day_from']) +
               ' to ' + str(kwargs['day_to']))
 
-        file_list = session.files_for_date_range(
-            kwargs['tiles'], year, days, kwargs['file_names'],
+        downloads = engine.download(
+            session.iter_files_for_date_range(
+                kwargs['tiles'], year, days, kwargs['file_names'],
+            ),
+            download_folder,
+            revalidate=kwargs['revalidate'],
         )
 
-        print('Found ' + str(len(file_list)) + ' files to download')
-
-        p = Pool(4)
-        p_res = [
-            p.apply_async(get_from_jpl, (kwargs, name, url, download_folder))
-            for name, url in file_list.items()
-        ]
-
-        [res.get() for res in p_res]
+        print('Downloaded {0} of {1} found files'.format(
+            sum(downloads.values()), len(downloads)
+        ))
+        if session.failed_days:
+            print('* Could not read the index of {0} days'.format(
+                len(session.failed_days)
+            ))
 
 
 if __name__ == '__main__':
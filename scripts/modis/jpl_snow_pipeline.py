@@ -0,0 +1,293 @@
+#!/usr/bin/python
+
+import os
+import sys
+from collections import defaultdict
+from multiprocessing import Pool
+
+import click
+
+from scripts.modis.gdal_merge import day_merger, init_worker, merge_folder
+from scripts.modis.jpl_snow_download import validate_type
+from snowrs import (
+    ExecutionProfile, JPLData, ListingCache, MergeManifest, SourceFolder,
+    TileMerger
+)
+from snowrs.download_engine import DownloadEngine
+from snowrs.download_ledger import DownloadLedger
+from snowrs.script_helpers import (
+    mb_per_second, output_profile_options, parse_year, to_array
+)
+
+
+def doy_folder_for(source_folder, doy):
+    return os.path.join(source_folder.type_path, doy, '')
+
+
+def is_day_complete(source_folder, doy, file_regex, files_per_day,
+                    manifest, options):
+    """
+    Check whether the day folder has a file for each requested tile and its
+    output was created from these files with the same options.
+
+    :param source_folder: SourceFolder with set year
+    :param doy: Day (YYYYDDD)
+    :param file_regex: Compiled regex of the requested files
+    :param files_per_day: Number of requested files per day
+    :param manifest: MergeManifest of the type path
+    :param options: Options for gdal_merge.merge_folder
+    :return: Boolean
+    """
+    doy_folder = doy_folder_for(source_folder, doy)
+    if not os.path.isdir(doy_folder):
+        return False
+
+    merger = day_merger(options, doy_folder)
+    requested = [
+        file for file in merger.file_queue
+        if file_regex.search(os.path.basename(file))
+    ]
+
+    return len(requested) >= files_per_day and merger.is_up_to_date(manifest)
+
+
+class DayQueue:
+    """
+    Collects the downloaded files of each day and queues the day for the
+    mosaic as soon as the files for all requested tiles arrived.
+    """
+
+    def __init__(self, source_folder, files_per_day, pool, options,
+                 manifest, ledger):
+        """
+        :param source_folder: SourceFolder with set year
+        :param files_per_day: Number of requested files per day
+        :param pool: Pool to run the mosaics with
+        :param options: Options for gdal_merge.merge_folder
+        :param manifest: MergeManifest of the type path
+        :param ledger: DownloadLedger of the type path
+        """
+        self.source_folder = source_folder
+        self.files_per_day = files_per_day
+        self.pool = pool
+        self.options = options
+        self.manifest = manifest
+        self.ledger = ledger
+        self.arrived = defaultdict(set)
+        self.merges = {}
+        self.up_to_date = set()
+
+    def file_complete(self, name, success):
+        if not success:
+            return
+
+        doy = SourceFolder.doy_from_file_name(name)
+        self.arrived[doy].add(name)
+
+        if len(self.arrived[doy]) == self.files_per_day:
+            self.queue(doy)
+
+    def queue(self, doy):
+        if doy in self.merges or doy in self.up_to_date:
+            return
+
+        self.source_folder.process_new_files(doy, self.ledger)
+
+        doy_folder = doy_folder_for(self.source_folder, doy)
+        merger = day_merger(self.options, doy_folder)
+
+        if merger.is_up_to_date(self.manifest):
+            self.up_to_date.add(doy)
+            return
+
+        print('* Queue day {0} for mosaic'.format(doy))
+        self.merges[doy] = (
+            merger.output_file_name,
+            merger.fingerprint,
+            self.pool.apply_async(merge_folder, (self.options, doy_folder))
+        )
+
+    def queue_incomplete(self):
+        """
+        Queue days where the server did not have all requested tiles
+        """
+        [self.queue(doy) for doy in list(self.arrived)]
+
+
+@click.command()
+@click.option('--username',
+              prompt='Your username',
+              help='Your EarthData username')
+@click.password_option(confirmation_prompt=False,
+                       help='Your EarthData password')
+@click.option('--download-folder',
+              type=click.Path(exists=True),
+              prompt=True,
+              help='The destination folder to store the files')
+@click.option('--year',
+              prompt=False,
+              type=int,
+              callback=parse_year,
+              help='The year (YYYY) to download data from.'
+                   'Leave blank to download all data starting from 2000')
+@click.option('--day-from',
+              prompt=True,
+              type=int,
+              help='The starting day to download data from')
+@click.option('--day-to',
+              prompt=True,
+              type=int,
+              help='The ending day to download data from')
+@click.option('--source-type',
+              prompt='The type of data - fraction or forcing',
+              callback=validate_type,
+              help='The type of data - fraction or forcing')
+@click.option('--tiles',
+              prompt=True,
+              callback=to_array,
+              help='List of tiles separated by comma (,)')
+@click.option('--file-names',
+              prompt=True,
+              callback=to_array,
+              help='Pattern of file to look for')
+@click.option('--index-workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=JPLData.INDEX_WORKERS,
+              help='Optional - Number of day indexes requested concurrently')
+@click.option('--cache-folder',
+              prompt=False,
+              type=click.Path(file_okay=False),
+              help='Optional - Folder to cache the remote index listings')
+@click.option('--listing-ttl',
+              prompt=False,
+              type=int,
+              default=JPLData.LISTING_TTL,
+              help='Optional - Seconds a cached index listing is used before '
+                   'it is revalidated. Historic years are cached forever')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.WORKERS,
+              help='Optional - Number of parallel downloads')
+@click.option('--host-connections',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=DownloadEngine.HOST_CONNECTIONS,
+              help='Optional - Maximum concurrent downloads per host')
+@click.option('--bandwidth',
+              prompt=False,
+              type=float,
+              default=None,
+              help='Optional - Total bandwidth limit in MB/s')
+@click.option('--retries',
+              prompt=False,
+              type=click.IntRange(min=0),
+              default=DownloadEngine.RETRIES,
+              help='Optional - Retries for server errors and timeouts')
+@click.option('--merge-workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=2,
+              help='Optional - Number of days mosaicked in parallel')
+@output_profile_options
+def data_pipeline(**kwargs):
+    if kwargs['cache_folder']:
+        kwargs['listing_cache'] = ListingCache(kwargs['cache_folder'])
+
+    session = JPLData(**kwargs)
+    engine = DownloadEngine(
+        lambda: JPLData(**kwargs),
+        workers=kwargs['workers'],
+        host_connections=kwargs['host_connections'],
+        bandwidth=mb_per_second(kwargs['bandwidth']),
+        retries=kwargs['retries'],
+    )
+    # Options for gdal_merge.merge_folder
+    options = {
+        'source_type': kwargs['source_type'],
+        'window_budget': TileMerger.WINDOW_MEMORY_BUDGET // 1024 ** 2,
+        'single_pass': False,
+        'profile': ExecutionProfile.for_workers(kwargs['merge_workers']),
+        'output_profile': kwargs['output_profile'],
+    }
+
+    file_regex = session.requested_files_regex(
+        kwargs['tiles'], kwargs['file_names']
+    )
+    files_per_day = len(kwargs['tiles']) * len(kwargs['file_names'])
+    failed_days = 0
+
+    source_folder = SourceFolder(
+        base_path=kwargs['download_folder'],
+        source_type=kwargs['source_type']
+    )
+
+    for year in kwargs['year']:
+        print('Processing year: ' + str(year))
+        source_folder.year = year
+
+        download_folder = source_folder.type_path
+
+        if not os.path.exists(download_folder):
+            os.makedirs(download_folder)
+
+        manifest = MergeManifest(source_folder.type_path)
+        ledger = DownloadLedger(download_folder)
+
+        days = [
+            day for day in range(kwargs['day_from'], kwargs['day_to'] + 1)
+            if not is_day_complete(
+                source_folder, '{0}{1:03d}'.format(year, day), file_regex,
+                files_per_day, manifest, options
+            )
+        ]
+        print('  {0} days to download, {1} are up to date'.format(
+            len(days), kwargs['day_to'] + 1 - kwargs['day_from'] - len(days)
+        ))
+
+        # Start the workers before the download threads
+        with Pool(
+                kwargs['merge_workers'],
+                initializer=init_worker,
+                initargs=(options['profile'],)
+        ) as pool:
+            day_queue = DayQueue(
+                source_folder, files_per_day, pool, options, manifest,
+                ledger
+            )
+
+            engine.download(
+                session.iter_files_for_date_range(
+                    kwargs['tiles'], year, days, kwargs['file_names'],
+                ),
+                download_folder,
+                ledger=ledger,
+                on_complete=day_queue.file_complete,
+            )
+            day_queue.queue_incomplete()
+            # Days without index are downloaded on the next run
+            failed_days += len(session.failed_days)
+
+            for doy, (output_file, fingerprint, merge) in sorted(
+                    day_queue.merges.items()
+            ):
+                _doy_folder, status = merge.get()
+                if status == 'done':
+                    manifest.update(output_file, fingerprint)
+                elif status != 'empty':
+                    failed_days += 1
+                    print('* Failed to process day {0}: {1}'.format(
+                        doy, status
+                    ))
+            manifest.save()
+
+        print('Done processing source folder: ' + source_folder.type_path)
+
+    if failed_days > 0:
+        # Signal the failures to the caller, e.g. cron
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    sys.exit(data_pipeline())
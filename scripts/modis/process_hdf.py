@@ -1,20 +1,155 @@
 #!/usr/bin/python
 import os
 import sys
+from functools import partial
+from multiprocessing import Pool
 
 import click
 from osgeo import gdal
 
-from snowrs import SourceFolder, ReferenceInfo
-from snowrs.script_helpers import parse_year
+from snowrs import (
+    ExecutionProfile, LayerReader, OutputProfile, SourceFolder, ReferenceInfo
+)
+from snowrs.script_helpers import (
+    PART_FILE_SUFFIX, output_profile_options, parse_year
+)
 
-GDAL_MEM = gdal.GetDriverByName('MEM')
-GDAL_TIFF = gdal.GetDriverByName('GTiff')
+OUTPUT_FILE_SUFFIX = '_{0}.tif'
+# All layers of a file as bands of one GeoTiff
+STACKED_FILE_SUFFIX = '_stack.tif'
+STACKED_OPTIONS = ["INTERLEAVE=BAND"]
+
+# Reference and profiles of a worker process, set by the pool initializer
+worker_reference = None
+worker_profile = None
+worker_output_profile = None
+
+
+def init_worker(reference_file, profile, output_profile):
+    """
+    Build the reference information once for each worker process.
+
+    :param reference_file: Path to the reference file
+    :param profile: ExecutionProfile for the worker
+    :param output_profile: OutputProfile for the written files
+    """
+    global worker_reference, worker_profile, worker_output_profile
+    worker_reference = ReferenceInfo(reference_file)
+    worker_profile = profile
+    worker_output_profile = output_profile
+    profile.apply()
+
+
+def output_file_name(file, layer_name):
+    return file.replace('.h5', OUTPUT_FILE_SUFFIX.format(layer_name))
+
+
+def write_output(warped, output_file, extra_options=None, **kwargs):
+    """
+    Write the warped layers to a GeoTiff. The output is written to a part
+    file first and moved in place when complete.
+
+    :param warped: GDAL dataset with the warped layers
+    :param output_file: Path of the GeoTiff
+    :param extra_options: Optional - Additional creation options
+    :param kwargs: Optional - Keyword arguments for gdal.Translate, e.g. to
+                   select bands
+    """
+    part_file = output_file + PART_FILE_SUFFIX
+
+    kwargs.update(worker_output_profile.translate_options(
+        worker_profile, extra_options
+    ))
+
+    try:
+        output = gdal.Translate(part_file, warped, **kwargs)
+        if output is None:
+            raise IOError('Could not write: ' + part_file)
+        del output
+
+        os.replace(part_file, output_file)
+    except Exception:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        raise
+
+
+def process_file(stacked, file):
+    """
+    Geo reference and project all layers of one file with a single warp and
+    write each layer to a GeoTiff, or all layers as bands of one GeoTiff.
+
+    :param stacked: Write one GeoTiff with a band per layer
+    :param file: Path to the source file
+    :return: Tuple with file and 'done' or the error message
+    """
+    print('Processing file:\n   {0} \n'.format(file))
+
+    try:
+        with LayerReader(file) as reader:
+            layer_names = reader.layer_names
+            data_types = [
+                reader.layer(name).GetRasterBand(1).DataType
+                for name in layer_names
+            ]
+            layers = reader.to_dataset(layer_names)
+        worker_reference.copy_to_file(layers)
+
+        warp_options = worker_reference.warp_options()
+        warp_options.update(worker_profile.warp_options())
+        warped = gdal.Warp('', layers, format='MEM', **warp_options)
+        del layers
+
+        for index, layer_name in enumerate(layer_names):
+            warped.GetRasterBand(index + 1).SetDescription(layer_name)
+
+        if stacked:
+            write_output(
+                warped, file.replace('.h5', STACKED_FILE_SUFFIX),
+                STACKED_OPTIONS
+            )
+        else:
+            for index, layer_name in enumerate(layer_names):
+                write_output(
+                    warped, output_file_name(file, layer_name),
+                    bandList=[index + 1], outputType=data_types[index],
+                )
 
-GDAL_OPTIONS = ["COMPRESS=LZW", "TILED=YES",
-                "BIGTIFF=IF_SAFER", "NUM_THREADS=ALL_CPUS"]
+        del warped
+    except Exception as error:
+        return file, str(error)
 
-OUTPUT_FILE_SUFFIX = '_{0}.tif'
+    return file, 'done'
+
+
+def process_files(files, reference_file, workers, **kwargs):
+    """
+    Process given files serially or with a pool of worker processes.
+
+    :param stacked: Optional - Write one GeoTiff with a band per layer
+    :param output_profile: Optional - OutputProfile for the written files
+
+    :return: List of (file, status) tuples
+    """
+    profile = ExecutionProfile.for_workers(workers)
+    output_profile = kwargs.get('output_profile', OutputProfile())
+    stacked = kwargs.get('stacked', False)
+
+    # Solve the warp grid once and store it for the workers
+    ReferenceInfo(reference_file).warp_grid
+
+    if workers > 1:
+        with Pool(
+                workers,
+                initializer=init_worker,
+                initargs=(reference_file, profile, output_profile)
+        ) as pool:
+            return list(pool.imap_unordered(
+                partial(process_file, stacked), files
+            ))
+
+    init_worker(reference_file, profile, output_profile)
+    return [process_file(stacked, file) for file in files]
 
 
 @click.command()
@@ -35,11 +170,21 @@ OUTPUT_FILE_SUFFIX = '_{0}.tif'
               type=int,
               callback=parse_year,
               help='Optional - Process specific year')
+@click.option('--workers',
+              prompt=False,
+              type=click.IntRange(min=1),
+              default=1,
+              help='Optional - Number of files processed in parallel')
+@click.option('--stacked',
+              is_flag=True,
+              help='Optional - Write all layers of a file as bands of one '
+                   'GeoTiff')
+@output_profile_options
 def process_folder(**kwargs):
     source_folder = SourceFolder(
         kwargs['source_folder'], source_file_type='*.h5'
     )
-    reference = ReferenceInfo(kwargs['reference_file'])
+    failed = 0
 
     for year in kwargs['year']:
         print('Processing year: ' + str(year))
@@ -49,28 +194,18 @@ def process_folder(**kwargs):
             print('* No path found for year: {0} *\n'.format(year))
             continue
 
-        for file in source_folder.files:
-            source = gdal.Open(file)
-
-            print('Processing file:\n   {0} \n'.format(file))
-
-            for index, layer in enumerate(source.GetSubDatasets()):
-                layer_file = GDAL_MEM.CreateCopy('', gdal.Open(layer[0]), 0)
-                reference.copy_to_file(layer_file)
-
-                layer_file = gdal.Warp(
-                    '', layer_file, dstSRS='EPSG:4326', format='MEM'
-                )
-
-                output_file_name = source.GetDescription()
-                output_file_name = output_file_name.replace(
-                    '.h5', OUTPUT_FILE_SUFFIX.format(layer[0].split('/')[-1])
-                )
-                GDAL_TIFF.CreateCopy(
-                    output_file_name, layer_file, strict=0, options=GDAL_OPTIONS
-                )
-
-                del layer_file
+        for file, status in sorted(process_files(
+                source_folder.files, kwargs['reference_file'],
+                kwargs['workers'], stacked=kwargs['stacked'],
+                output_profile=kwargs['output_profile'],
+        )):
+            if status != 'done':
+                print('* Failed to process: {0}\n  {1}'.format(file, status))
+                failed += 1
+
+    if failed > 0:
+        print('* Failed to process {0} files'.format(failed))
+        sys.exit(1)
 
 
 if __name__ == '__main__':
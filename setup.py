@@ -9,6 +9,6 @@ setup(
     author_email='j.meyer@utah.edu',
     description='Library to process MODIS tiles',
     install_requires=[
-        'click', 'beautifulsoup4', 'gdal', 'numpy',  'pyproj', 'requests'
+        'click', 'gdal', 'numpy',  'pyproj', 'requests'
     ]
 )
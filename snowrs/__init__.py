@@ -1,13 +1,25 @@
 from .earth_data import EarthData
+from .execution_profile import ExecutionProfile
 from .jpl_data import JPLData
+from .layer_reader import LayerReader
+from .listing_cache import ListingCache
+from .merge_manifest import MergeManifest
+from .output_profile import OutputProfile
 from .reference_info import ReferenceInfo
+from .remote_granule import RemoteGranule
 from .source_folder import SourceFolder
 from .tile_merger import TileMerger
 
 __all__ = [
     'EarthData',
+    'ExecutionProfile',
     'JPLData',
+    'LayerReader',
+    'ListingCache',
+    'MergeManifest',
+    'OutputProfile',
     'ReferenceInfo',
+    'RemoteGranule',
     'SourceFolder',
     'TileMerger'
 ]
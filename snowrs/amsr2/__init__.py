@@ -1,5 +1,9 @@
+from .ease_grid import EaseGrid
+from .regrid_plan import RegridPlan
 from .swe import SWE
 
 __all__ = [
+    'EaseGrid',
+    'RegridPlan',
     'SWE'
 ]
@@ -0,0 +1,56 @@
+from osgeo import osr
+from pyproj import Transformer
+
+
+class EaseGrid:
+    """
+    NSIDC EASE-Grid of one hemisphere. Use EaseGrid.for_hemisphere to share
+    the projection setup between all files of a run.
+    """
+    SOURCE_SPAT_RES = 25000  # In Meters
+
+    HEMISPHERES = {
+        'north': {
+            'epsg': 3408,
+            # These are approximate degree values
+            # Source: NSIDC
+            'upper_left': (-135, -86.5),
+        },
+        'south': {
+            'epsg': 3409,
+            'upper_left': (-45, 86.5),
+        },
+    }
+
+    _grids = {}
+
+    def __init__(self, hemisphere):
+        grid = self.HEMISPHERES[hemisphere]
+
+        self.hemisphere = hemisphere
+        self.spatial_reference = osr.SpatialReference()
+        self.spatial_reference.ImportFromEPSG(grid['epsg'])
+        self.projection = self.spatial_reference.ExportToWkt()
+
+        self.ul_x, self.ul_y = Transformer.from_crs(
+            'EPSG:4326', 'EPSG:{0}'.format(grid['epsg']), always_xy=True
+        ).transform(*grid['upper_left'])
+
+    @classmethod
+    def for_hemisphere(cls, hemisphere):
+        """
+        Cached grid for given hemisphere
+
+        :param hemisphere: Either 'north' or 'south'
+        :return: EaseGrid
+        """
+        if hemisphere not in cls._grids:
+            cls._grids[hemisphere] = cls(hemisphere)
+        return cls._grids[hemisphere]
+
+    @property
+    def geo_transform(self):
+        return [
+            self.ul_x, self.SOURCE_SPAT_RES, 0,
+            self.ul_y, 0, -self.SOURCE_SPAT_RES
+        ]
@@ -0,0 +1,228 @@
+import numpy
+from pyproj import CRS, Transformer
+
+from .ease_grid import EaseGrid
+
+
+class RegridPlan:
+    """
+    Bilinear resampling from an EASE-Grid to the grid of a reference file.
+    The source pixel indices and weights for every target pixel are computed
+    once, after which each daily array is regridded with a NumPy gather.
+
+    The plan holds four Int32 indices and four Float32 weights per target
+    pixel, which is 32 bytes per pixel of the reference file.
+    """
+    # EASE-Grid 25 km rows and columns
+    SOURCE_SHAPE = (721, 721)
+    # Target rows that are transformed at once when building a plan
+    ROW_CHUNK = 256
+
+    def __init__(self, indices, weights, shape, **kwargs):
+        """
+        :param indices: Flat source indices of the four neighbours, (4, N)
+        :param weights: Bilinear weights of the four neighbours, (4, N)
+        :param shape: Target shape (rows, columns)
+        :param hemisphere: Optional - Hemisphere of the source EASE-Grid
+        :param geo_transform: Optional - Geo transform of target grid
+        :param projection: Optional - Projection of target grid
+        """
+        self.indices = indices
+        self.weights = weights
+        self.shape = tuple(int(size) for size in shape)
+        self.hemisphere = kwargs.get('hemisphere', 'north')
+        self.geo_transform = kwargs.get('geo_transform')
+        self.projection = kwargs.get('projection')
+        self._nearest = None
+
+    @staticmethod
+    def bilinear(columns, rows, source_shape):
+        """
+        Neighbour indices and weights for fractional source pixel positions,
+        where 0.0 is the center of the first pixel. Neighbours outside of the
+        source get a weight of 0.
+
+        :param columns: Numpy array with fractional source columns
+        :param rows: Numpy array with fractional source rows
+        :param source_shape: Shape of source grid (rows, columns)
+        :return: Tuple with indices and weights, both of shape (4, N)
+        """
+        columns = numpy.asarray(columns, dtype=numpy.float64).ravel()
+        rows = numpy.asarray(rows, dtype=numpy.float64).ravel()
+
+        column_0 = numpy.floor(columns)
+        row_0 = numpy.floor(rows)
+        fraction_x = columns - column_0
+        fraction_y = rows - row_0
+
+        indices = numpy.empty((4, columns.size), dtype=numpy.int32)
+        weights = numpy.empty((4, columns.size), dtype=numpy.float32)
+
+        neighbours = [
+            (0, 0, (1 - fraction_x) * (1 - fraction_y)),
+            (0, 1, fraction_x * (1 - fraction_y)),
+            (1, 0, (1 - fraction_x) * fraction_y),
+            (1, 1, fraction_x * fraction_y),
+        ]
+        for index, (row_offset, column_offset, weight) in \
+                enumerate(neighbours):
+            row = row_0 + row_offset
+            column = column_0 + column_offset
+            inside = (row >= 0) & (row < source_shape[0]) & \
+                     (column >= 0) & (column < source_shape[1])
+
+            indices[index] = numpy.where(
+                inside, row * source_shape[1] + column, 0
+            )
+            weights[index] = numpy.where(inside, weight, 0)
+
+        return indices, weights
+
+    @classmethod
+    def for_reference(cls, reference_file, hemisphere='north',
+                      source_shape=SOURCE_SHAPE):
+        """
+        Build plan from the EASE-Grid of given hemisphere to the grid of the
+        reference file.
+
+        :param reference_file: GDAL dataset of reference grid
+        :param hemisphere: Optional - Either 'north' or 'south'
+        :param source_shape: Optional - Shape of source grid
+        :return: RegridPlan
+        """
+        grid = EaseGrid.for_hemisphere(hemisphere)
+        geo_transform = reference_file.GetGeoTransform()
+        projection = reference_file.GetProjection()
+        shape = (reference_file.RasterYSize, reference_file.RasterXSize)
+
+        transformer = Transformer.from_crs(
+            CRS.from_user_input(projection),
+            'EPSG:{0}'.format(grid.HEMISPHERES[hemisphere]['epsg']),
+            always_xy=True
+        )
+
+        indices = numpy.empty((4, shape[0] * shape[1]), dtype=numpy.int32)
+        weights = numpy.empty((4, shape[0] * shape[1]), dtype=numpy.float32)
+        # Target pixel centers
+        columns = numpy.arange(shape[1]) + 0.5
+
+        for row_start in range(0, shape[0], cls.ROW_CHUNK):
+            rows = numpy.arange(
+                row_start, min(row_start + cls.ROW_CHUNK, shape[0])
+            ) + 0.5
+            column_grid, row_grid = numpy.meshgrid(columns, rows)
+
+            x, y = transformer.transform(
+                geo_transform[0] + column_grid * geo_transform[1] +
+                row_grid * geo_transform[2],
+                geo_transform[3] + column_grid * geo_transform[4] +
+                row_grid * geo_transform[5],
+            )
+
+            chunk = slice(row_start * shape[1], (row_start + len(rows)) *
+                          shape[1])
+            indices[:, chunk], weights[:, chunk] = cls.bilinear(
+                (x - grid.ul_x) / grid.SOURCE_SPAT_RES - 0.5,
+                (grid.ul_y - y) / grid.SOURCE_SPAT_RES - 0.5,
+                source_shape
+            )
+
+        return cls(
+            indices, weights, shape,
+            hemisphere=hemisphere,
+            geo_transform=geo_transform,
+            projection=projection,
+        )
+
+    @property
+    def nearest(self):
+        """
+        Flat source index of the neighbour with the largest weight for each
+        target pixel.
+        """
+        if self._nearest is None:
+            self._nearest = self.indices[
+                self.weights.argmax(axis=0),
+                numpy.arange(self.indices.shape[1])
+            ]
+        return self._nearest
+
+    def matches(self, reference_file):
+        """
+        Check whether the plan was built for the grid of the reference file.
+        """
+        return self.shape == (reference_file.RasterYSize,
+                              reference_file.RasterXSize) and \
+            tuple(self.geo_transform) == \
+            tuple(reference_file.GetGeoTransform()) and \
+            self.projection == reference_file.GetProjection()
+
+    def regrid(self, values, no_data_value):
+        """
+        Bilinear resampling of source values to the target grid. Neighbours
+        with no data are excluded and the weights of the remaining ones are
+        normalized. Target pixels without any valid neighbour are no data.
+
+        :param values: Numpy array on the source grid
+        :param no_data_value: No data value of source and target
+        :return: Numpy array on the target grid with the source data type
+        """
+        neighbours = values.ravel()[self.indices]
+        weights = numpy.where(neighbours == no_data_value, 0, self.weights)
+
+        total_weight = weights.sum(axis=0)
+        weighted_sum = (neighbours * weights).sum(axis=0)
+
+        regridded = numpy.full(
+            total_weight.shape, no_data_value, dtype=values.dtype
+        )
+        valid = total_weight > 0
+        regridded[valid] = numpy.floor(
+            weighted_sum[valid] / total_weight[valid] + 0.5
+        )
+
+        return regridded.reshape(self.shape)
+
+    def regrid_nearest(self, values, no_data_value):
+        """
+        Nearest neighbour resampling of source values to the target grid,
+        used for categories like quality flags.
+
+        :param values: Numpy array on the source grid
+        :param no_data_value: Value for target pixels outside of the source
+        :return: Numpy array on the target grid with the source data type
+        """
+        regridded = values.ravel()[self.nearest]
+        regridded[self.weights.sum(axis=0) == 0] = no_data_value
+
+        return regridded.reshape(self.shape)
+
+    def save(self, file_name):
+        """
+        Store the plan as a NumPy .npz file to reuse it across runs.
+        """
+        numpy.savez(
+            file_name,
+            indices=self.indices,
+            weights=self.weights,
+            shape=self.shape,
+            hemisphere=self.hemisphere,
+            geo_transform=self.geo_transform,
+            projection=self.projection,
+        )
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load a plan stored with save.
+
+        :param file_name: Path to the .npz file
+        :return: RegridPlan
+        """
+        with numpy.load(file_name) as plan:
+            return cls(
+                plan['indices'], plan['weights'], plan['shape'],
+                hemisphere=str(plan['hemisphere']),
+                geo_transform=tuple(plan['geo_transform'].tolist()),
+                projection=str(plan['projection']),
+            )
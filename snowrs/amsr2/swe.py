@@ -1,26 +1,39 @@
 import os
 
-from osgeo import gdal, gdalconst, gdalnumeric, osr
-from pyproj import Proj, transform
+import numpy
+from osgeo import gdal, gdalconst, gdalnumeric
+
+from .ease_grid import EaseGrid
 
 
 class SWE:
-    SOURCE_SPAT_RES = 25000  # In Meters
+    SOURCE_SPAT_RES = EaseGrid.SOURCE_SPAT_RES
 
     BAND_MAX_DATA_VALUE = 240
     BAND_VALUE_SCALE_FACTOR = 2
 
     NO_DATA_VALUE = -999
 
-    NSIDC_EASE_GRID_NORTH = osr.SpatialReference()
-    NSIDC_EASE_GRID_NORTH.ImportFromEPSG(3408)
-    NSIDC_EASE_GRID_NORTH_PROJ = Proj(NSIDC_EASE_GRID_NORTH.ExportToProj4())
-    NSIDC_NORTH_UL_X, NSIDC_NORTH_UL_Y = transform(
-        Proj(init='epsg:4326'),
-        NSIDC_EASE_GRID_NORTH_PROJ,
-        -135,  # These are approximate degree values
-        -86.5  # Source: NSIDC
-    )
+    # Decoded SWE for every raw value (0 - 255). Values above 240 are flags
+    # and decode to no data, valid values are scaled by factor 2.
+    SWE_DECODE_TABLE = numpy.where(
+        numpy.arange(256) > BAND_MAX_DATA_VALUE,
+        NO_DATA_VALUE,
+        numpy.arange(256) * BAND_VALUE_SCALE_FACTOR
+    ).astype(numpy.int16)
+
+    HEMISPHERES = {
+        'north': 'North',
+        'south': 'South',
+    }
+
+    # Subdatasets of the daily snow file with hemisphere and name keyword
+    PRODUCTS = {
+        'north_swe': ('north', 'SWE'),
+        'south_swe': ('south', 'SWE'),
+        'north_flags': ('north', 'Flags'),
+        'south_flags': ('south', 'Flags'),
+    }
 
     GDAL_DRIVER_TYPE = 'MEM'
     GDAL_DRIVER = gdal.GetDriverByName(GDAL_DRIVER_TYPE)
@@ -43,45 +56,114 @@ class SWE:
     def tif_file(self):
         return self._tif_file
 
-    def northern_swe(self):
+    @classmethod
+    def decode_swe(cls, raw_values):
+        """
+        Decode raw SWE values with a single lookup in SWE_DECODE_TABLE.
+
+        :param raw_values: Numpy array with raw values as unsigned bytes
+        :return: Numpy array with SWE values in mm as Int16
+        """
+        return numpy.take(cls.SWE_DECODE_TABLE, raw_values)
+
+    @classmethod
+    def product_keywords(cls, product):
+        """
+        :param product: One of PRODUCTS
+        :return: Tuple with hemisphere and name keyword of the product
+        :raises ValueError: For an unknown product
+        """
+        if product not in cls.PRODUCTS:
+            raise ValueError(
+                'Unknown product: ' + product + ', possible options: ' +
+                ', '.join(sorted(cls.PRODUCTS))
+            )
+        return cls.PRODUCTS[product]
+
+    def subdataset(self, *keywords):
+        """
+        Name of the first subdataset where the data set path contains all
+        given keywords.
+
+        :return: Subdataset name for gdal.Open
         """
-        Read northern hemisphere SWE data and filter all values above 240 and
-        scale values by factor 2.
+        for name, _description in self.hdf_file.GetSubDatasets():
+            # Skip the file name part
+            data_set_path = name.split(':')[-1]
+            if all(keyword in data_set_path for keyword in keywords):
+                return name
+
+        raise ValueError(
+            'No subdataset with: ' + ', '.join(keywords) +
+            ' in ' + self._hdf_file_name
+        )
+
+    def read_product(self, product):
+        """
+        Read given product from the daily snow file. SWE values above 240
+        are filtered and valid values scaled by factor 2. Quality flags are
+        returned unchanged.
 
         Data Parameters description:
         https://lance.nsstc.nasa.gov/amsr2-science/doc/LANCE_A2_DySno_NRT_dataset.pdf
 
-        :return: Numpy array with SWE values
+        :param product: One of PRODUCTS
+        :return: Numpy array with product values as Int16
         """
-        northern_swe = self.hdf_file.GetSubDatasets()[0]
+        hemisphere, keyword = self.product_keywords(product)
+        subdataset = gdal.Open(
+            self.subdataset(keyword, self.HEMISPHERES[hemisphere]),
+            gdalconst.GA_ReadOnly
+        )
+        raw_values = subdataset.ReadAsArray(buf_type=gdalconst.GDT_Byte)
 
-        northern_swe = gdal.Open(northern_swe[0], gdalconst.GA_ReadOnly)
-        northern_swe = northern_swe.ReadAsArray(buf_type=gdalconst.GDT_Int16)
+        if keyword == 'SWE':
+            return self.decode_swe(raw_values)
+        return raw_values.astype(numpy.int16)
 
-        northern_swe[
-            northern_swe > self.BAND_MAX_DATA_VALUE
-            ] = self.NO_DATA_VALUE
-        northern_swe[
-            northern_swe > self.NO_DATA_VALUE
-            ] *= self.BAND_VALUE_SCALE_FACTOR
+    def hemisphere_swe(self, hemisphere):
+        return self.read_product(hemisphere + '_swe')
 
-        return northern_swe
+    def northern_swe(self):
+        return self.hemisphere_swe('north')
 
-    def __hdf_to_tif(self):
-        data = self.northern_swe()
+    def southern_swe(self):
+        return self.hemisphere_swe('south')
 
-        self._tif_file = self.GDAL_DRIVER.Create(
-            os.path.join(self._file_dir, 'North_SWE_25k_nsidc.tif'),
+    def available_products(self):
+        """
+        :return: List of PRODUCTS contained in the daily snow file
+        """
+        available = []
+        for product, (hemisphere, keyword) in sorted(self.PRODUCTS.items()):
+            try:
+                self.subdataset(keyword, self.HEMISPHERES[hemisphere])
+                available.append(product)
+            except ValueError:
+                continue
+        return available
+
+    def product_to_tif(self, product):
+        """
+        Create an in-memory GeoTiff of given product on its EASE-Grid. All
+        products use NO_DATA_VALUE as no data, which marks pixels outside
+        the EASE-Grid once the product is warped.
+
+        :param product: One of PRODUCTS
+        :return: GDAL dataset
+        """
+        data = self.read_product(product)
+        grid = EaseGrid.for_hemisphere(self.product_keywords(product)[0])
+
+        tif_file = self.GDAL_DRIVER.Create(
+            os.path.join(self._file_dir, product + '_25k_nsidc.tif'),
             data.shape[1], data.shape[0],
             1, gdalconst.GDT_Int16,
         )
-        self.tif_file.SetGeoTransform(
-            [self.NSIDC_NORTH_UL_X, self.SOURCE_SPAT_RES, 0,
-             self.NSIDC_NORTH_UL_Y, 0, -self.SOURCE_SPAT_RES]
-        )
-        self.tif_file.SetProjection(self.NSIDC_EASE_GRID_NORTH.ExportToWkt())
+        tif_file.SetGeoTransform(grid.geo_transform)
+        tif_file.SetProjection(grid.projection)
 
-        band = self.tif_file.GetRasterBand(1)
+        band = tif_file.GetRasterBand(1)
         band.SetNoDataValue(self.NO_DATA_VALUE)
         gdalnumeric.BandWriteArray(band, data)
 
@@ -90,6 +172,18 @@ class SWE:
         del data
         del band
 
+        return tif_file
+
+    def products_to_tif(self):
+        """
+        :return: Dictionary with an in-memory GeoTiff for each available
+                 product
+        """
+        return {
+            product: self.product_to_tif(product)
+            for product in self.available_products()
+        }
+
     def __project(self, projection):
         self._tif_file = gdal.Warp(
             os.path.join(self._file_dir, 'North_SWE_25k_warp.tif'),
@@ -98,16 +192,22 @@ class SWE:
             dstSRS=projection,
         )
 
-    def clip_to_tif(self, reference_file):
+    def clip_to_tif(self, reference_file, product='north_swe'):
         """
         Method converts initialized HDF file to a GeoTiff with data from the
-        northern hemisphere. Given tif_file is used to transform the HDF file to
+        given product. Given tif_file is used to transform the HDF file to
         identical extent, resolution, and projection
 
         :param reference_file: Reference GeoTiff file
+        :param product: Optional - One of PRODUCTS, default: north_swe
         """
-        self.__hdf_to_tif()
+        self._tif_file = self.product_to_tif(product)
         self.__project(reference_file.GetProjection())
+        if self.product_keywords(product)[1] == 'SWE':
+            resample_algorithm = gdalconst.GRA_Bilinear
+        else:
+            # Quality flags are categories
+            resample_algorithm = gdalconst.GRA_NearestNeighbour
         geo_transform = reference_file.GetGeoTransform()
 
         ul_x = geo_transform[0]
@@ -123,5 +223,50 @@ class SWE:
             projWinSRS=reference_file.GetProjection(),
             outputSRS=reference_file.GetProjection(),
             format=self.GDAL_DRIVER_TYPE,
-            resampleAlg=gdalconst.GRA_Bilinear,
+            resampleAlg=resample_algorithm,
         )
+
+    def regrid_to_tif(self, plan, product='north_swe'):
+        """
+        Creates the same grid as clip_to_tif, but uses a RegridPlan that was
+        built once for the reference grid instead of warping and clipping
+        with GDAL for every file.
+
+        Values are not identical to clip_to_tif. The plan interpolates the
+        EASE-Grid once at the reference pixel centers. clip_to_tif warps with
+        nearest neighbour first and resamples the warped grid again, which
+        differs by up to the change of the values across one EASE-Grid
+        cell.
+
+        :param plan: RegridPlan for the reference grid
+        :param product: Optional - One of PRODUCTS, default: north_swe
+        """
+        hemisphere, keyword = self.product_keywords(product)
+        if hemisphere != plan.hemisphere:
+            raise ValueError(
+                'Plan is for the ' + plan.hemisphere + ' hemisphere, got '
+                + product
+            )
+
+        data = self.read_product(product)
+        if keyword == 'SWE':
+            data = plan.regrid(data, self.NO_DATA_VALUE)
+        else:
+            # Quality flags are categories
+            data = plan.regrid_nearest(data, self.NO_DATA_VALUE)
+
+        self._tif_file = self.GDAL_DRIVER.Create(
+            os.path.join(self._file_dir, product + '_regrid.tif'),
+            plan.shape[1], plan.shape[0],
+            1, gdalconst.GDT_Int16,
+        )
+        self._tif_file.SetGeoTransform(plan.geo_transform)
+        self._tif_file.SetProjection(plan.projection)
+
+        band = self._tif_file.GetRasterBand(1)
+        band.SetNoDataValue(self.NO_DATA_VALUE)
+        gdalnumeric.BandWriteArray(band, data)
+        band.FlushCache()
+
+        del data
+        del band
@@ -0,0 +1,285 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.compat import urlparse
+
+from .download_ledger import DownloadLedger
+from .script_helpers import download_file
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by all download threads. Threads that consumed more
+    than the allowed rate sleep until the bucket is refilled.
+    """
+
+    def __init__(self, rate=None):
+        """
+        :param rate: Bytes per second, None for no limit
+        """
+        self.rate = rate
+        self._tokens = rate or 0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        if self.rate is None:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate,
+                self._tokens + (now - self._last_refill) * self.rate
+            )
+            self._last_refill = now
+            self._tokens -= size
+            wait = -self._tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ProgressMonitor:
+    """
+    Aggregate throughput and estimated time left of all downloads.
+    """
+
+    def __init__(self):
+        self.files_queued = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes += size
+
+    def file_queued(self):
+        self.files_queued += 1
+
+    def file_finished(self, success):
+        if success:
+            self.files_done += 1
+        else:
+            self.files_failed += 1
+
+    @property
+    def throughput(self):
+        """
+        Bytes per second since the start
+        """
+        return self.bytes / max(time.monotonic() - self.start, 1e-6)
+
+    @property
+    def eta(self):
+        """
+        Seconds left based on the average size of the finished files
+        """
+        finished = self.files_done + self.files_failed
+        if finished == 0 or self.throughput == 0:
+            return None
+
+        remaining_files = self.files_queued - finished
+        return remaining_files * (self.bytes / finished) / self.throughput
+
+    def status(self):
+        eta = self.eta
+        return 'Downloaded {0} of {1} files ({2} failed), ' \
+               '{3:.1f} MB at {4:.2f} MB/s, ETA: {5}'.format(
+                    self.files_done, self.files_queued, self.files_failed,
+                    self.bytes / 1024 ** 2, self.throughput / 1024 ** 2,
+                    'unknown' if eta is None else
+                    time.strftime('%H:%M:%S', time.gmtime(eta))
+                )
+
+
+class DownloadEngine:
+    """
+    Schedules downloads on an asyncio event loop. The transfers run on a
+    pool of worker threads, where each worker keeps one long lived session,
+    created by the given session factory, for all of its files.
+
+    Concurrent downloads are capped per host, the total bandwidth can be
+    limited, and server errors and timeouts are retried with a jittered
+    exponential backoff. Any other error fails only the affected file.
+    """
+    WORKERS = 4
+    HOST_CONNECTIONS = 4
+    RETRIES = 3
+    BACKOFF = 2  # In seconds
+    BACKOFF_MAX = 60  # In seconds
+    TIMEOUT = 60  # In seconds
+    REPORT_INTERVAL = 10  # In seconds
+
+    # Errors of the server or the connection, including a response that
+    # broke off while its content was read
+    RETRY_ERRORS = (
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.ContentDecodingError,
+        requests.exceptions.HTTPError,
+        requests.exceptions.Timeout,
+    )
+
+    def __init__(self, session_factory, **kwargs):
+        """
+        :param session_factory: Callable returning an authenticated
+                                requests.Session
+        :param workers: Optional - Number of worker threads
+        :param host_connections: Optional - Concurrent downloads per host
+        :param bandwidth: Optional - Total bandwidth in bytes per second
+        :param retries: Optional - Retries for server errors and timeouts
+        :param timeout: Optional - Request timeout in seconds
+        """
+        self.session_factory = session_factory
+        self.workers = kwargs.get('workers') or self.WORKERS
+        self.host_connections = \
+            kwargs.get('host_connections') or self.HOST_CONNECTIONS
+        self.retries = kwargs.get('retries', self.RETRIES)
+        self.timeout = kwargs.get('timeout', self.TIMEOUT)
+        self.report_interval = \
+            kwargs.get('report_interval', self.REPORT_INTERVAL)
+        self.limiter = BandwidthLimiter(kwargs.get('bandwidth'))
+        self.progress = ProgressMonitor()
+        self.revalidate = False
+        self._worker = threading.local()
+        self._host_limits = {}
+
+    @property
+    def session(self):
+        """
+        Session of the current worker thread
+        """
+        if getattr(self._worker, 'session', None) is None:
+            self._worker.session = self.session_factory()
+        return self._worker.session
+
+    def host_limit(self, url):
+        host = urlparse(url).hostname
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.host_connections)
+        return self._host_limits[host]
+
+    def backoff(self, attempt):
+        """
+        Exponential backoff with full jitter
+        """
+        return random.uniform(
+            0, min(self.BACKOFF_MAX, self.BACKOFF * 2 ** attempt)
+        )
+
+    def __on_chunk(self, size):
+        self.limiter.consume(size)
+        self.progress.add_bytes(size)
+
+    def __transfer(self, name, url, download_folder, ledger, segments):
+        return download_file(
+            self.session, name, url, download_folder, ledger, segments,
+            timeout=self.timeout, on_chunk=self.__on_chunk,
+            revalidate=self.revalidate,
+        )
+
+    async def __download(self, executor, name, url, download_folder, ledger,
+                         segments, on_complete):
+        loop = asyncio.get_event_loop()
+        success = False
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.host_limit(url):
+                    success = await loop.run_in_executor(
+                        executor, self.__transfer,
+                        name, url, download_folder, ledger, segments
+                    )
+                break
+            except self.RETRY_ERRORS as error:
+                if attempt == self.retries:
+                    print('Download for: ' + name + ' failed: ' + str(error))
+                    break
+                delay = self.backoff(attempt)
+                print('Retrying: {0} in {1:.1f}s ({2})'.format(
+                    name, delay, error
+                ))
+                await asyncio.sleep(delay)
+            except Exception as error:
+                # Failure of this file only, e.g. a full disk, which must not
+                # cancel the other downloads
+                print('Download for: ' + name + ' failed: ' + str(error))
+                break
+
+        self.progress.file_finished(success)
+        if on_complete is not None:
+            on_complete(name, success)
+
+        return name, success
+
+    async def __report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(self.progress.status())
+
+    async def __run(self, files, download_folder, ledger, segments,
+                    on_complete):
+        loop = asyncio.get_event_loop()
+        reporter = loop.create_task(self.__report())
+        downloads = []
+        files = iter(files)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            while True:
+                # Files can come from a blocking generator, like an index crawl
+                file = await loop.run_in_executor(None, next, files, None)
+                if file is None:
+                    break
+
+                self.progress.file_queued()
+                downloads.append(loop.create_task(self.__download(
+                    executor, file[0], file[1], download_folder, ledger,
+                    segments, on_complete
+                )))
+
+            results = await asyncio.gather(*downloads)
+
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+        print(self.progress.status())
+
+        return dict(results)
+
+    def download(self, files, download_folder, **kwargs):
+        """
+        Download given files. Downloads start while the files are still
+        consumed, which allows passing a generator of a running index crawl.
+
+        :param files: Iterable of (file name, url) tuples
+        :param download_folder: Destination folder
+        :param ledger: Optional - DownloadLedger of the download folder
+        :param segments: Optional - Byte range segments for large files
+        :param on_complete: Optional - Called with the file name and success
+                            after each file, on the thread calling download
+        :param revalidate: Optional - Check completed files for remote
+                           changes, default: False
+        :return: Dictionary with file name and download success
+        """
+        ledger = kwargs.get('ledger') or DownloadLedger(download_folder)
+        self.revalidate = kwargs.get('revalidate', False)
+        self.progress = ProgressMonitor()
+        self._host_limits = {}
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(self.__run(
+                files, download_folder, ledger, kwargs.get('segments', 1),
+                kwargs.get('on_complete')
+            ))
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
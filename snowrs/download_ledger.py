@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+
+class DownloadLedger:
+    """
+    Record of completed downloads for one download folder. Each completed
+    file is appended as one JSON line, which allows multiple processes to
+    write to the same ledger.
+    """
+    FILE_NAME = '.download_ledger.jsonl'
+
+    def __init__(self, download_folder):
+        self.download_folder = download_folder
+        self._entries = None
+
+    @property
+    def file_name(self):
+        return os.path.join(self.download_folder, self.FILE_NAME)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self.__load()
+        return self._entries
+
+    def __load(self):
+        entries = {}
+
+        if not os.path.isfile(self.file_name):
+            return entries
+
+        with open(self.file_name) as ledger:
+            for line in ledger:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Line of an interrupted write
+                    continue
+                entries[entry['name']] = entry
+
+        return entries
+
+    @staticmethod
+    def md5(file_name):
+        """
+        :return: hashlib md5 object updated with the content of given file,
+                 which can be updated further with appended content
+        """
+        md5 = hashlib.md5()
+        with open(file_name, 'rb') as file:
+            for chunk in iter(lambda: file.read(2000000), b''):
+                md5.update(chunk)
+        return md5
+
+    @classmethod
+    def checksum(cls, file_name):
+        return cls.md5(file_name).hexdigest()
+
+    def entry(self, name):
+        return self.entries.get(name)
+
+    def file_path(self, name):
+        """
+        :return: Path of given file, which is the recorded location when the
+                 file was moved after the download
+        """
+        entry = self.entry(name) or {}
+        return os.path.join(self.download_folder, entry.get('path', name))
+
+    def is_complete(self, name):
+        """
+        Check whether given file was completely downloaded and still has the
+        recorded size on disk, at its recorded location.
+
+        :param name: File name
+        :return: Boolean
+        """
+        entry = self.entry(name)
+        file_name = self.file_path(name)
+
+        return entry is not None and os.path.isfile(file_name) and \
+            os.path.getsize(file_name) == entry['size']
+
+    def record_move(self, name, file_name):
+        """
+        Record the new location of a downloaded file, e.g. after it was moved
+        into its day folder.
+
+        :param name: File name
+        :param file_name: New path of the file inside the download folder
+        """
+        if self.entry(name) is None:
+            return
+
+        entry = dict(self.entry(name))
+        entry['path'] = os.path.relpath(file_name, self.download_folder)
+        self.__append(entry)
+
+    def conditional_headers(self, name):
+        """
+        :return: If-None-Match and If-Modified-Since headers with the
+                 validators recorded for given file
+        """
+        entry = self.entry(name) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, name, size, etag=None, checksum=None,
+               last_modified=None):
+        entry = {
+            'name': name,
+            'size': size,
+            'etag': etag,
+            'checksum': checksum,
+            'last_modified': last_modified,
+        }
+        self.__append(entry)
+
+    def __append(self, entry):
+        self.entries[entry['name']] = entry
+
+        with open(self.file_name, 'a') as ledger:
+            ledger.write(json.dumps(entry) + '\n')
@@ -1,9 +1,11 @@
 import re
 
 import requests
-from bs4 import BeautifulSoup
 from requests.compat import urlparse
 
+from .link_extractor import find_links
+from .listing_cache import ListingCache
+
 
 class EarthData(requests.Session):
     AUTH_HOST = 'urs.earthdata.nasa.gov'
@@ -19,10 +21,18 @@ class EarthData(requests.Session):
         'AMSRE': re.compile(r'AMSR_E_L3_DailySnow_V[\d]{2}_.*[.]hdf$'),
     }
 
-    def __init__(self, username, password, source):
+    # Seconds a cached index listing is used before it is revalidated
+    LISTING_TTL = {
+        'AMSR2': 60 * 60,  # Near real time data, updated daily
+        'AMSRE': ListingCache.FOREVER,  # Mission ended in 2011
+    }
+
+    def __init__(self, username, password, source, **kwargs):
         super(EarthData, self).__init__()
         self.auth = (username, password)
         self.source = source
+        self.listing_cache = kwargs.get('listing_cache', None)
+        self.listing_ttl = kwargs.get('listing_ttl', self.LISTING_TTL[source])
 
     # Overrides from the library to keep headers when redirected to or from
     # the NASA auth host.
@@ -44,6 +54,19 @@ class EarthData(requests.Session):
     def get_index(self):
         return self.get(self.SOURCES[self.source])
 
+    def get_listing(self, url):
+        """
+        Return the index listing for given URL, using the listing cache when
+        one is configured.
+
+        :param url: Index URL
+        :return: Listing HTML as text
+        """
+        if self.listing_cache is None:
+            return self.get(url).text
+
+        return self.listing_cache.fetch(self, url, self.listing_ttl)
+
     # For data sources that have each day in a separate folder
     def files_for_date_range(self, date_range):
         files = {}
@@ -51,18 +74,20 @@ class EarthData(requests.Session):
         for date in date_range:
             folder_name = date.strftime("%Y.%m.%d")
             index_dir_url = self.SOURCES[self.source] + folder_name + '/'
-            dir_index = BeautifulSoup(self.get(index_dir_url).text, 'html.parser')
-            file_link = dir_index.find('a', text=self.FILE_REGEX[self.source])
-            files[file_link.attrs['href']] =\
-                index_dir_url + file_link.attrs['href']
+            href, _text = find_links(
+                self.get_listing(index_dir_url), self.FILE_REGEX[self.source]
+            )[0]
+            files[href] = index_dir_url + href
 
         return files
 
     # For data sources that have all files in one directory
     def list_datafiles(self):
-        files = BeautifulSoup(self.get_index().text, 'html.parser')
-        links = files.find_all(href=self.FILE_REGEX[self.source])
+        links = find_links(
+            self.get_listing(self.SOURCES[self.source]),
+            self.FILE_REGEX[self.source],
+            attribute='href'
+        )
         return {
-            link.attrs['href']: self.SOURCES[self.source] + link.attrs['href']
-            for link in links if link is not None
+            href: self.SOURCES[self.source] + href for href, _text in links
         }
@@ -0,0 +1,66 @@
+import multiprocessing
+
+from osgeo import gdal
+
+
+class ExecutionProfile:
+    """
+    Threading and memory settings for GDAL warp and compression calls.
+    """
+    ALL_CPUS = 'ALL_CPUS'
+    WARP_MEMORY_LIMIT = 512  # In MB
+
+    def __init__(self, **kwargs):
+        self.warp_threads = kwargs.get('warp_threads', self.ALL_CPUS)
+        self.warp_memory_limit = kwargs.get(
+            'warp_memory_limit', self.WARP_MEMORY_LIMIT
+        )
+        # None keeps the GDAL default of 5% of the available RAM
+        self.cache_size = kwargs.get('cache_size', None)
+        self.compression_threads = kwargs.get(
+            'compression_threads', self.ALL_CPUS
+        )
+
+    @classmethod
+    def for_workers(cls, workers, **kwargs):
+        """
+        Profile that shares the available cores between given number of
+        worker processes.
+
+        :param workers: Number of parallel worker processes
+        :return: ExecutionProfile
+        """
+        if workers > 1:
+            threads = max(multiprocessing.cpu_count() // workers, 1)
+            kwargs.setdefault('warp_threads', threads)
+            kwargs.setdefault('compression_threads', threads)
+
+        return cls(**kwargs)
+
+    def apply(self):
+        """
+        Set the GDAL block cache size for the current process.
+        """
+        if self.cache_size is not None:
+            gdal.SetCacheMax(self.cache_size * 1024 ** 2)
+
+    def warp_options(self):
+        """
+        :return: Keyword arguments for gdal.Warp
+        """
+        return {
+            'multithread': self.warp_threads != 1,
+            'warpMemoryLimit': self.warp_memory_limit,
+            'warpOptions': ['NUM_THREADS={0}'.format(self.warp_threads)],
+        }
+
+    def creation_options(self, options):
+        """
+        Add compression threads to given driver creation options.
+
+        :param options: List of creation options
+        :return: List of creation options
+        """
+        return options + [
+            'NUM_THREADS={0}'.format(self.compression_threads)
+        ]
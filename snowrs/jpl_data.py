@@ -1,7 +1,11 @@
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from .link_extractor import find_links
+from .listing_cache import ListingCache
 
 
 class JPLData(requests.Session):
@@ -14,12 +18,28 @@ class JPLData(requests.Session):
 
     FILE_BASE_REGEX = r'MOD09GA[.]A[\d]{7}[.]'
 
+    # Number of day indexes that are requested concurrently
+    INDEX_WORKERS = 8
+
+    # Seconds a cached day index is used before it is revalidated.
+    # Days in the historic archive never change and are cached forever.
+    LISTING_TTL = 24 * 60 * 60
+
     def __init__(self, **kwargs):
         super(JPLData, self).__init__()
         self.auth = requests.auth.HTTPDigestAuth(
             kwargs['username'], kwargs['password']
         )
         self._source_type = kwargs['source_type']
+        self.index_workers = kwargs.get('index_workers') or self.INDEX_WORKERS
+        # Keep one connection per index worker
+        self.mount(self.BASE_URL, HTTPAdapter(pool_maxsize=self.index_workers))
+        self.listing_cache = kwargs.get('listing_cache', None)
+        self.listing_ttl = kwargs.get('listing_ttl')
+        if self.listing_ttl is None:
+            self.listing_ttl = self.LISTING_TTL
+        # Days of the last crawl where the index could not be requested
+        self.failed_days = []
 
     @property
     def source_type(self):
@@ -29,31 +49,82 @@ class JPLData(requests.Session):
         regex = '(' + '|'.join(tiles) + ').*(' + '|'.join(file_types) + ')$'
         return re.compile(self.FILE_BASE_REGEX + regex, re.IGNORECASE)
 
+    @staticmethod
+    def is_archived(year):
+        return year < 2015
+
     def __get_index_url(self, year, day):
         url = self.TYPES[self.source_type]
-        if year < 2015:
+        if self.is_archived(year):
             url += self.ARCHIVE_PATH
         url += '/' + str(year) + '/' + day + '/'
 
         return url
 
-    def files_for_date_range(self, tiles, year, day_range, file_types):
-        files = {}
+    def get_listing(self, url, year):
+        """
+        Return the index listing for given URL, using the listing cache when
+        one is configured.
+
+        :param url: Index URL
+        :param year: Year of the index
+        :return: Listing HTML as text
+        """
+        if self.listing_cache is None:
+            return self.get(url).text
+
+        if self.is_archived(year):
+            ttl = ListingCache.FOREVER
+        else:
+            ttl = self.listing_ttl
+
+        return self.listing_cache.fetch(self, url, ttl)
 
-        for day in day_range:
-            print('Parsing download links for day: ' + str(day))
-            day = str(day).rjust(3, '0')
+    def __files_for_day(self, year, day, file_regex):
+        print('Parsing download links for day: ' + str(day))
+        day = str(day).rjust(3, '0')
 
-            index_dir_url = self.__get_index_url(year, day)
-            file_links = BeautifulSoup(
-                self.get(index_dir_url).text, 'html.parser'
-            ).find_all(
-                'a', text=self.requested_files_regex(tiles, file_types)
-            )
+        index_dir_url = self.__get_index_url(year, day)
+        file_links = find_links(
+            self.get_listing(index_dir_url, year), file_regex
+        )
+
+        return [(text, index_dir_url + href) for href, text in file_links]
+
+    def iter_files_for_date_range(self, tiles, year, day_range, file_types):
+        """
+        Request the day indexes concurrently and return matching files as
+        soon as the index for a day was parsed. The files of a day are in
+        the order of its index, the days in the order their index arrived.
+        Days where the index request failed are skipped and listed in
+        failed_days.
+
+        :return: Generator with (file name, url) tuples
+        """
+        file_regex = self.requested_files_regex(tiles, file_types)
+        self.failed_days = []
 
-            [
-                files.update({link.text: index_dir_url + link.attrs['href']})
-                for link in file_links
-            ]
+        with ThreadPoolExecutor(self.index_workers) as executor:
+            day_indexes = {}
+            for day in day_range:
+                day_indexes[executor.submit(
+                    self.__files_for_day, year, day, file_regex
+                )] = day
 
-        return files
+            for day_index in as_completed(day_indexes):
+                try:
+                    files = day_index.result()
+                except requests.exceptions.RequestException as error:
+                    day = day_indexes[day_index]
+                    print('* Could not read index for day {0}: {1}'.format(
+                        day, error
+                    ))
+                    self.failed_days.append(day)
+                    continue
+
+                yield from files
+
+    def files_for_date_range(self, tiles, year, day_range, file_types):
+        return dict(
+            self.iter_files_for_date_range(tiles, year, day_range, file_types)
+        )
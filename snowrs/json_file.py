@@ -0,0 +1,25 @@
+import json
+import os
+
+
+def write_json(file_name, data, **kwargs):
+    """
+    Write data as JSON to a temporary file first and replace the existing
+    file, which never leaves a partially written file behind. The temporary
+    file carries the process id, so processes writing the same file do not
+    share it.
+
+    :param file_name: Path of the JSON file
+    :param data: JSON serializable data
+    :param kwargs: Optional - Keyword arguments for json.dump
+    """
+    tmp_file = '{0}.{1}.tmp'.format(file_name, os.getpid())
+
+    try:
+        with open(tmp_file, 'w') as json_file:
+            json.dump(data, json_file, **kwargs)
+        os.replace(tmp_file, file_name)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
@@ -0,0 +1,144 @@
+import numpy
+from osgeo import gdal, gdal_array
+
+
+class LayerReader:
+    """
+    Read the layers (subdatasets) of an HDF container. The container is
+    opened once and each layer at most once, no matter how many layers are
+    read.
+    """
+    GDAL_MEM = gdal.GetDriverByName('MEM')
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._container = None
+        self._subdatasets = None
+        self._layers = {}
+
+    @property
+    def container(self):
+        if self._container is None:
+            self._container = gdal.Open(self.file_name, gdal.GA_ReadOnly)
+            if self._container is None:
+                raise IOError('Could not open: ' + self.file_name)
+        return self._container
+
+    @property
+    def subdatasets(self):
+        """
+        Dictionary with layer name and GDAL subdataset name, in the order of
+        the container.
+
+        :raises ValueError: When layers in different groups have the same
+                            name
+        """
+        if self._subdatasets is None:
+            subdatasets = {}
+            for name, _description in self.container.GetSubDatasets():
+                layer_name = self.layer_name(name)
+                if layer_name in subdatasets:
+                    raise ValueError(
+                        'Layer name {0} is not unique in: {1}'.format(
+                            layer_name, self.file_name
+                        )
+                    )
+                subdatasets[layer_name] = name
+            self._subdatasets = subdatasets
+        return self._subdatasets
+
+    @property
+    def layer_names(self):
+        return list(self.subdatasets)
+
+    @staticmethod
+    def layer_name(subdataset):
+        """
+        Last component of the data set path, e.g. 'snow_fraction' for
+        HDF5:"file.h5"://Grid/snow_fraction
+        """
+        return subdataset.split('/')[-1]
+
+    def layer(self, name):
+        """
+        :param name: One of layer_names
+        :return: GDAL dataset of the layer
+        """
+        if name not in self._layers:
+            self._layers[name] = gdal.Open(
+                self.subdatasets[name], gdal.GA_ReadOnly
+            )
+        return self._layers[name]
+
+    def read(self, names=None):
+        """
+        Read given layers into one stacked array.
+
+        :param names: Optional - Layer names, default: all layers
+        :return: Numpy array with shape (layers, rows, columns)
+        """
+        names = names or self.layer_names
+        self.__check_sizes(names)
+
+        return numpy.stack([
+            self.layer(name).GetRasterBand(1).ReadAsArray() for name in names
+        ])
+
+    def to_dataset(self, names=None):
+        """
+        Copy given layers as bands into one in-memory dataset. Band
+        descriptions are the layer names and each band keeps the no data
+        value of its layer.
+
+        A GDAL dataset has one data type for all bands. The bands are widened
+        to the numpy result type of all layers, e.g. a uint8 layer next to a
+        float32 layer is stored as float32 and int16 next to uint16 as int32.
+        Values are kept, but outputs take the size of the widest type. Pass
+        layers of one type to keep their type.
+
+        :param names: Optional - Layer names, default: all layers
+        :return: GDAL dataset
+        """
+        names = names or self.layer_names
+        self.__check_sizes(names)
+
+        bands = [self.layer(name).GetRasterBand(1) for name in names]
+        data_type = gdal_array.NumericTypeCodeToGDALTypeCode(
+            numpy.result_type(*[
+                gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType)
+                for band in bands
+            ])
+        )
+
+        stack = self.GDAL_MEM.Create(
+            '', bands[0].XSize, bands[0].YSize, len(bands), data_type
+        )
+        for index, (name, band) in enumerate(zip(names, bands)):
+            stack_band = stack.GetRasterBand(index + 1)
+            stack_band.SetDescription(name)
+            if band.GetNoDataValue() is not None:
+                stack_band.SetNoDataValue(band.GetNoDataValue())
+            stack_band.WriteArray(band.ReadAsArray())
+
+        return stack
+
+    def __check_sizes(self, names):
+        sizes = set(
+            (self.layer(name).RasterXSize, self.layer(name).RasterYSize)
+            for name in names
+        )
+        if len(sizes) > 1:
+            raise ValueError(
+                'Layers differ in size and can not be stacked: ' +
+                ', '.join(names)
+            )
+
+    def close(self):
+        self._layers = {}
+        self._container = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
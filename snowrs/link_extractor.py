@@ -0,0 +1,86 @@
+import html
+import re
+from html.parser import HTMLParser
+
+# Anchors with a quoted href, which is how the remote index pages list files
+LINK_REGEX = re.compile(
+    r'<a\s[^>]*?href\s*=\s*(["\'])(.*?)\1[^>]*>(.*?)</a\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+ANCHOR_REGEX = re.compile(r'<a[\s>]', re.IGNORECASE)
+TAG_REGEX = re.compile(r'<[^>]*>')
+
+
+class LinkParser(HTMLParser):
+    """
+    Streaming parser that collects the href and text of all anchors.
+    Used for markup the regex scanner can not handle, like unquoted
+    attributes.
+    """
+
+    def __init__(self):
+        super(LinkParser, self).__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._href = dict(attrs).get('href') or ''
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._href is not None:
+            self.links.append((self._href, ''.join(self._text).strip()))
+            self._href = None
+
+
+def parse_links(index_html):
+    parser = LinkParser()
+    parser.feed(index_html)
+    parser.close()
+    return parser.links
+
+
+def scan_links(index_html):
+    return [
+        (html.unescape(href), html.unescape(TAG_REGEX.sub('', text)).strip())
+        for _quote, href, text in LINK_REGEX.findall(index_html)
+    ]
+
+
+def extract_links(index_html):
+    """
+    Extract all links of an index page. Uses a regex scanner and falls back
+    to the streaming parser when the scanner did not find all anchors.
+
+    :param index_html: HTML of index page
+    :return: List of (href, text) tuples
+    """
+    links = scan_links(index_html)
+
+    if len(links) < len(ANCHOR_REGEX.findall(index_html)):
+        links = parse_links(index_html)
+
+    return links
+
+
+def find_links(index_html, regex, attribute='text'):
+    """
+    Find all links where the link text or href matches given regex.
+
+    :param index_html: HTML of index page
+    :param regex: Compiled regular expression searched for
+    :param attribute: Either 'text' or 'href'
+    :return: List of (href, text) tuples
+    """
+    position = 0 if attribute == 'href' else 1
+
+    return [
+        link for link in extract_links(index_html)
+        if regex.search(link[position])
+    ]
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import time
+
+from .json_file import write_json
+
+
+class ListingCache:
+    """
+    On disk cache for remote directory listings, keyed by the index URL.
+    Expired entries are revalidated with the ETag and Last-Modified headers
+    of the previous response.
+    """
+    # TTL for listings that never change, like historic archive folders
+    FOREVER = None
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+
+        if not os.path.exists(self.cache_folder):
+            os.makedirs(self.cache_folder)
+
+    def entry_file(self, url):
+        return os.path.join(
+            self.cache_folder,
+            hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json'
+        )
+
+    def __read(self, url):
+        try:
+            with open(self.entry_file(url)) as entry:
+                return json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def is_fresh(entry, ttl):
+        return ttl is ListingCache.FOREVER or \
+            time.time() - entry['fetched'] < ttl
+
+    def fetch(self, session, url, ttl=FOREVER):
+        """
+        Return the listing for given URL from the cache or request it with
+        the given session.
+
+        :param session: requests.Session to request the listing with
+        :param url: Index URL
+        :param ttl: Seconds a cached listing is used without revalidation
+        :return: Listing HTML as text
+        """
+        entry = self.__read(url)
+
+        if entry is not None and self.is_fresh(entry, ttl):
+            return entry['text']
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = session.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            entry['fetched'] = time.time()
+        elif response.status_code == 200:
+            entry = {
+                'text': response.text,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched': time.time(),
+            }
+        else:
+            # Never cache error pages
+            return response.text
+
+        write_json(self.entry_file(url), entry)
+
+        return entry['text']
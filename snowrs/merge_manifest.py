@@ -0,0 +1,58 @@
+import json
+import os
+
+from .json_file import write_json
+
+
+class MergeManifest:
+    """
+    Sidecar file for one type path that records the fingerprint of the
+    source tiles each output file was created from.
+    """
+    FILE_NAME = '.merge_manifest.json'
+
+    def __init__(self, type_path):
+        self._type_path = type_path
+        self._entries = None
+
+    @property
+    def file_name(self):
+        return os.path.join(self._type_path, self.FILE_NAME)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self.__load()
+        return self._entries
+
+    def __load(self):
+        if not os.path.isfile(self.file_name):
+            return {}
+
+        try:
+            with open(self.file_name) as manifest:
+                return json.load(manifest)
+        except ValueError:
+            # Unreadable manifest, all outputs will be rebuilt
+            return {}
+
+    def __key(self, output_file):
+        return os.path.relpath(output_file, self._type_path)
+
+    def is_current(self, output_file, fingerprint):
+        """
+        Check whether given output file exists and was created from sources
+        with the identical fingerprint.
+
+        :param output_file: Path to output file
+        :param fingerprint: Fingerprint of the current source files
+        :return: Boolean
+        """
+        return os.path.isfile(output_file) and \
+            self.entries.get(self.__key(output_file)) == fingerprint
+
+    def update(self, output_file, fingerprint):
+        self.entries[self.__key(output_file)] = fingerprint
+
+    def save(self):
+        write_json(self.file_name, self.entries, indent=1, sort_keys=True)
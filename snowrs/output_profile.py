@@ -0,0 +1,158 @@
+import os
+
+from osgeo import gdal
+
+from .execution_profile import ExecutionProfile
+
+
+class OutputProfile:
+    """
+    Format and compression of all written GeoTiffs.
+
+    * GTiff: Tiled GeoTiff
+    * COG: Cloud Optimized GeoTiff with internal overviews, requires GDAL 3.1
+      or newer
+
+    The COG driver can only copy a complete dataset. Outputs that are
+    written incrementally are created as tiled GeoTiff and converted with
+    finish.
+    """
+    GTIFF = 'GTiff'
+    COG = 'COG'
+    FORMATS = [GTIFF, COG]
+
+    COMPRESSIONS = ['LZW', 'DEFLATE', 'ZSTD']
+    PREDICTORS = ['none', 'standard', 'floating_point']
+    OVERVIEW_RESAMPLING = 'NEAREST'
+
+    # Creation option names per format
+    PREDICTOR_VALUES = {
+        GTIFF: {'standard': '2', 'floating_point': '3'},
+        COG: {'standard': 'STANDARD', 'floating_point': 'FLOATING_POINT'},
+    }
+    GTIFF_LEVEL_OPTIONS = {
+        'DEFLATE': 'ZLEVEL',
+        'ZSTD': 'ZSTD_LEVEL',
+    }
+
+    def __init__(self, **kwargs):
+        """
+        :param output_format: Optional - One of FORMATS, default: GTiff
+        :param compression: Optional - One of COMPRESSIONS, default: LZW
+        :param compression_level: Optional - Level for DEFLATE (1-9) or
+                                  ZSTD (1-22)
+        :param predictor: Optional - One of PREDICTORS, default: none
+        :param overview_resampling: Optional - Resampling of COG overviews
+        """
+        self.output_format = kwargs.get('output_format') or self.GTIFF
+        self.compression = kwargs.get('compression') or 'LZW'
+        self.compression_level = kwargs.get('compression_level')
+        self.predictor = kwargs.get('predictor') or 'none'
+        self.overview_resampling = kwargs.get(
+            'overview_resampling', self.OVERVIEW_RESAMPLING
+        )
+
+        if self.output_format not in self.FORMATS:
+            raise ValueError('Unknown output format: ' + self.output_format)
+        if self.compression not in self.COMPRESSIONS:
+            raise ValueError('Unknown compression: ' + self.compression)
+        if self.predictor not in self.PREDICTORS:
+            raise ValueError('Unknown predictor: ' + self.predictor)
+
+    @property
+    def is_cog(self):
+        return self.output_format == self.COG
+
+    @property
+    def settings(self):
+        """
+        Dictionary with all settings that change the written files
+        """
+        return {
+            'format': self.output_format,
+            'compression': self.compression,
+            'compression_level': self.compression_level,
+            'predictor': self.predictor,
+            'overview_resampling': self.overview_resampling,
+        }
+
+    def creation_options(self, profile=None, output_format=None, extra=None):
+        """
+        :param profile: Optional - ExecutionProfile for the compression
+                        threads
+        :param output_format: Optional - Format to create, default: the
+                              output format of the profile
+        :param extra: Optional - Additional creation options
+        :return: List of creation options
+        """
+        output_format = output_format or self.output_format
+        profile = profile or ExecutionProfile()
+
+        options = [
+            'COMPRESS=' + self.compression,
+            'BIGTIFF=IF_SAFER',
+        ]
+
+        if self.predictor != 'none':
+            options.append(
+                'PREDICTOR=' +
+                self.PREDICTOR_VALUES[output_format][self.predictor]
+            )
+
+        if output_format == self.COG:
+            options.append('OVERVIEW_RESAMPLING=' + self.overview_resampling)
+            if self.compression_level is not None and \
+                    self.compression != 'LZW':
+                options.append('LEVEL={0}'.format(self.compression_level))
+        else:
+            options.insert(1, 'TILED=YES')
+            if self.compression_level is not None and \
+                    self.compression in self.GTIFF_LEVEL_OPTIONS:
+                options.append('{0}={1}'.format(
+                    self.GTIFF_LEVEL_OPTIONS[self.compression],
+                    self.compression_level
+                ))
+
+        return profile.creation_options(options + (extra or []))
+
+    def translate_options(self, profile=None, extra=None):
+        """
+        :return: Keyword arguments for gdal.Translate to write a complete
+                 dataset in the output format
+        """
+        return {
+            'format': self.output_format,
+            'creationOptions': self.creation_options(profile, extra=extra),
+        }
+
+    def streaming_options(self, profile=None, extra=None):
+        """
+        :return: Keyword arguments for gdal.Warp or Create calls that write
+                 a tiled GeoTiff, which finish converts to the output format
+        """
+        return {
+            'format': self.GTIFF,
+            'creationOptions': self.creation_options(
+                profile, self.GTIFF, extra
+            ),
+        }
+
+    def finish(self, file_name, profile=None, extra=None):
+        """
+        Convert a GeoTiff written with streaming_options to the output
+        format. Does nothing for GeoTiff output.
+
+        :param file_name: Path to the GeoTiff
+        """
+        if not self.is_cog:
+            return
+
+        cog_file = file_name + '.cog'
+        output = gdal.Translate(
+            cog_file, file_name, **self.translate_options(profile, extra)
+        )
+        if output is None:
+            raise IOError('Could not write: ' + cog_file)
+        del output
+
+        os.replace(cog_file, file_name)
@@ -1,5 +1,12 @@
+import json
+import os
+
+import numpy
 from osgeo import gdal
 
+from .json_file import write_json
+from .layer_reader import LayerReader
+
 
 class ReferenceInfo(object):
     # Bounding box for watershed basins in the Himalayas
@@ -12,12 +19,35 @@ class ReferenceInfo(object):
                      '+a=6371007.181 +b=6371007.181 +units=m ' \
                      '+no_defs +nadgrids=@null +wktext'
 
-    def __init__(self, filename):
+    WARP_SRS = 'EPSG:4326'
+
+    # Sidecar next to the reference file with the filtered GCPs and the
+    # output grid of the warp to WARP_SRS
+    CACHE_FILE_SUFFIX = '.warp.json'
+
+    def __init__(self, filename, **kwargs):
+        """
+        :param filename: Path to the reference file
+        :param cache_file: Optional - Path to the warp cache, default is a
+                           sidecar next to the reference file. Set to None
+                           to not cache on disk.
+        """
         self._file_name = filename
+        self.cache_file = kwargs.get(
+            'cache_file', filename + self.CACHE_FILE_SUFFIX
+        )
         self.file = filename
         self._geo_transform = self.file.GetGeoTransform()
         self._projection = self.file.GetProjection()
-        self.gcps = self.file.GetGCPs()
+        self._warp_grid = None
+
+        cache = self.__load_cache()
+        if cache is None:
+            self.gcps = self.file.GetGCPs()
+        else:
+            gcps, self._warp_grid = cache
+            self._gcps = [gdal.GCP(*gcp) for gcp in gcps]
+
         self.gcp_projection = self.file.GetGCPProjection()
 
     @property
@@ -26,9 +56,9 @@ class ReferenceInfo(object):
 
     @file.setter
     def file(self, filename):
-        file = gdal.Open(filename)
-        self._file = gdal.Open(file.GetSubDatasets()[0][0], gdal.GA_ReadOnly)
-        del file
+        reader = LayerReader(filename)
+        self._file = reader.layer(reader.layer_names[0])
+        del reader
 
     @property
     def geo_transform(self):
@@ -44,7 +74,12 @@ class ReferenceInfo(object):
 
     @gcps.setter
     def gcps(self, gcps):
-        self._gcps = [gcp for gcp in gcps if self.within_basin(gcp)]
+        coordinates = numpy.array(
+            [(gcp.GCPX, gcp.GCPY) for gcp in gcps], dtype=numpy.float64
+        ).reshape(-1, 2)
+        within = self.basin_mask(coordinates[:, 0], coordinates[:, 1])
+
+        self._gcps = [gcp for gcp, keep in zip(gcps, within) if keep]
 
     @property
     def gcp_projection(self):
@@ -57,11 +92,18 @@ class ReferenceInfo(object):
         else:
             self._gcp_projection = self.projection
 
+    @classmethod
+    def basin_mask(cls, x, y):
+        """
+        :param x: Numpy array with GCP x coordinates
+        :param y: Numpy array with GCP y coordinates
+        :return: Boolean numpy array, True for coordinates within the basin
+        """
+        return (x >= cls.GCP_X_MIN) & (x <= cls.GCP_X_MAX) & \
+               (y >= cls.GCP_Y_MIN) & (y <= cls.GCP_Y_MAX)
+
     def within_basin(self, gcp):
-        if self.GCP_X_MIN <= gcp.GCPX <= self.GCP_X_MAX and \
-                self.GCP_Y_MIN <= gcp.GCPY <= self.GCP_Y_MAX:
-            return True
-        return False
+        return bool(self.basin_mask(gcp.GCPX, gcp.GCPY))
 
     def copy_to_file(self, file):
         if self.file.GetGCPCount() == 0:
@@ -70,3 +112,117 @@ class ReferenceInfo(object):
             file.SetGCPs(self.gcps, self.gcp_projection)
 
         file.SetProjection(self.projection)
+
+    @property
+    def warp_grid(self):
+        """
+        Output bounds and size of the warp to WARP_SRS. The GCP transform is
+        solved once for the reference and the result reused by every layer.
+        """
+        if self._warp_grid is None:
+            self._warp_grid = self.__solve_warp_grid()
+            self.__save_cache()
+        return self._warp_grid
+
+    def warp_options(self):
+        """
+        :return: Keyword arguments for gdal.Warp of a layer with the
+                 reference geo information to WARP_SRS
+        """
+        return {
+            'dstSRS': self.WARP_SRS,
+            'outputBounds': self.warp_grid['output_bounds'],
+            'width': self.warp_grid['width'],
+            'height': self.warp_grid['height'],
+        }
+
+    def __solve_warp_grid(self):
+        grid_file = gdal.GetDriverByName('MEM').Create(
+            '', self.file.RasterXSize, self.file.RasterYSize, 1, gdal.GDT_Byte
+        )
+        self.copy_to_file(grid_file)
+
+        # A VRT only holds the warp definition, no pixels are transformed
+        warped = gdal.Warp('', grid_file, dstSRS=self.WARP_SRS, format='VRT')
+        geo_transform = warped.GetGeoTransform()
+        width, height = warped.RasterXSize, warped.RasterYSize
+
+        del warped
+        del grid_file
+
+        return {
+            'output_bounds': [
+                geo_transform[0],
+                geo_transform[3] + geo_transform[5] * height,
+                geo_transform[0] + geo_transform[1] * width,
+                geo_transform[3],
+            ],
+            'width': width,
+            'height': height,
+        }
+
+    def __source_fingerprint(self):
+        return {
+            'file': [
+                os.path.basename(self._file_name),
+                os.path.getsize(self._file_name),
+                os.path.getmtime(self._file_name),
+            ],
+            'basin': [
+                self.GCP_X_MIN, self.GCP_X_MAX,
+                self.GCP_Y_MIN, self.GCP_Y_MAX,
+            ],
+        }
+
+    def __load_cache(self):
+        """
+        :return: Tuple with the GCPs and the warp grid of the cache or None
+                 when the cache is missing, outdated, unreadable or
+                 incomplete
+        """
+        if self.cache_file is None or not os.path.isfile(self.cache_file):
+            return None
+
+        try:
+            with open(self.cache_file) as cache_file:
+                cache = json.load(cache_file)
+
+            if cache.get('source') != self.__source_fingerprint():
+                return None
+
+            gcps = [[float(value) for value in gcp] for gcp in cache['gcps']]
+            warp_grid = {
+                'output_bounds': [
+                    float(value)
+                    for value in cache['warp_grid']['output_bounds']
+                ],
+                'width': int(cache['warp_grid']['width']),
+                'height': int(cache['warp_grid']['height']),
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Unreadable or incomplete cache, solved again
+            return None
+
+        if any(len(gcp) != 5 for gcp in gcps) or \
+                len(warp_grid['output_bounds']) != 4:
+            return None
+
+        return gcps, warp_grid
+
+    def __save_cache(self):
+        if self.cache_file is None:
+            return
+
+        cache = {
+            'source': self.__source_fingerprint(),
+            'gcps': [
+                [gcp.GCPX, gcp.GCPY, gcp.GCPZ, gcp.GCPPixel, gcp.GCPLine]
+                for gcp in self.gcps
+            ],
+            'warp_grid': self._warp_grid,
+        }
+
+        try:
+            write_json(self.cache_file, cache, indent=1)
+        except OSError as error:
+            print('* Could not save warp cache: ' + str(error))
@@ -0,0 +1,147 @@
+import os
+import uuid
+
+import requests
+from osgeo import gdal
+from requests.compat import urlparse
+
+
+class RemoteGranule:
+    """
+    Open a remote file with GDAL without writing it to local disk first.
+
+    * vsicurl: GDAL reads the byte ranges it needs directly from the server,
+      using the credentials and cookies of the session. GDAL does not send
+      the credentials to the EarthData login host (URS) it is redirected
+      to. The session therefore requests the granule once to log in and
+      GDAL reuses the session cookies of the granule host. Servers that
+      redirect every request to the login host only work with vsimem.
+    * vsimem: The session downloads the file into the GDAL in-memory file
+      system, which is released again when the granule is closed.
+
+    Reading HDF5 files from a GDAL virtual file system requires GDAL 3.7 or
+    newer.
+    """
+    VSICURL = 'vsicurl'
+    VSIMEM = 'vsimem'
+    MODES = [VSICURL, VSIMEM]
+
+    def __init__(self, session, url, mode=VSIMEM):
+        if mode not in self.MODES:
+            raise ValueError('Unknown mode: ' + str(mode))
+
+        self.session = session
+        self.url = url
+        self.mode = mode
+        self._path = None
+        # GDAL options set for the vsicurl path, reset on close
+        self._options = []
+
+    @property
+    def name(self):
+        return os.path.basename(urlparse(self.url).path)
+
+    @property
+    def path(self):
+        """
+        Path of the granule for gdal.Open
+        """
+        if self._path is None:
+            if self.mode == self.VSIMEM:
+                self._path = self.__to_vsimem()
+            else:
+                self._path = self.__to_vsicurl()
+        return self._path
+
+    @staticmethod
+    def gdal_http_options(session):
+        """
+        GDAL HTTP configuration options with the credentials and cookies of
+        given session. Credentials without username or password are left
+        out.
+
+        :param session: requests.Session
+        :return: Dictionary
+        """
+        options = {}
+        auth_type, credentials = None, []
+
+        if isinstance(session.auth, requests.auth.HTTPDigestAuth):
+            auth_type = 'DIGEST'
+            credentials = [session.auth.username, session.auth.password]
+        elif isinstance(session.auth, tuple):
+            auth_type = 'BASIC'
+            credentials = list(session.auth)
+
+        if len(credentials) == 2 and None not in credentials:
+            options['GDAL_HTTP_AUTH'] = auth_type
+            options['GDAL_HTTP_USERPWD'] = ':'.join(credentials)
+
+        if len(session.cookies) > 0:
+            options['GDAL_HTTP_COOKIE'] = '; '.join(
+                name + '=' + value
+                for name, value in session.cookies.items()
+            )
+
+        return options
+
+    def __login(self):
+        """
+        Follow the redirects of the granule URL with the session, which
+        stores the cookies of a login on the way.
+        """
+        if self.session.auth is None:
+            return
+
+        response = self.session.get(self.url, stream=True)
+        response.close()
+        response.raise_for_status()
+
+    def __set_option(self, prefix, key, value):
+        # Limit the credentials to the host of the granule when the GDAL
+        # version supports it (3.6+). Otherwise they are set for the whole
+        # process until the granule is closed.
+        if hasattr(gdal, 'SetPathSpecificOption'):
+            gdal.SetPathSpecificOption(prefix, key, value)
+        else:
+            gdal.SetConfigOption(key, value)
+
+    def __to_vsicurl(self):
+        path = '/vsicurl/' + self.url
+        url = urlparse(self.url)
+        prefix = '/vsicurl/{0}://{1}/'.format(url.scheme, url.netloc)
+
+        self.__login()
+
+        for key, value in self.gdal_http_options(self.session).items():
+            self.__set_option(prefix, key, value)
+            self._options.append((prefix, key))
+
+        return path
+
+    def __to_vsimem(self):
+        response = self.session.get(self.url)
+        response.raise_for_status()
+
+        path = '/vsimem/{0}/{1}'.format(uuid.uuid4().hex, self.name)
+        gdal.FileFromMemBuffer(path, response.content)
+
+        return path
+
+    def open(self):
+        return gdal.Open(self.path, gdal.GA_ReadOnly)
+
+    def close(self):
+        if self._path is not None and self.mode == self.VSIMEM:
+            gdal.Unlink(self._path)
+        self._path = None
+
+        for prefix, key in self._options:
+            self.__set_option(prefix, key, None)
+        self._options = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
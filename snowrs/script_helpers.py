@@ -1,7 +1,17 @@
+import functools
+import glob
+import hashlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
-from snowrs import SourceFolder
+import click
+import requests
+
+from snowrs import OutputProfile, SourceFolder
+from snowrs.download_ledger import DownloadLedger
+from snowrs.json_file import write_json
 
 
 def validate_types(ctx, _param, value):
@@ -15,6 +25,10 @@ def validate_types(ctx, _param, value):
         return value
 
 
+def to_array(_ctx, _param, value):
+    return value.split(',')
+
+
 def parse_year(_ctx, _param, value):
     if value:
         return range(value, value + 1)
@@ -37,18 +51,371 @@ def dates_in_range(year, from_day, to_day):
     return dates
 
 
-def download_file(session, name, url, download_folder):
-    file_size = int(session.head(url).headers['Content-Length'])
+OUTPUT_PROFILE_OPTIONS = [
+    click.option('--output-format',
+                 prompt=False,
+                 type=click.Choice(OutputProfile.FORMATS),
+                 default=OutputProfile.GTIFF,
+                 help='Optional - GTiff or COG (Cloud Optimized GeoTiff with '
+                      'internal overviews)'),
+    click.option('--compression',
+                 prompt=False,
+                 type=click.Choice(OutputProfile.COMPRESSIONS),
+                 default='LZW',
+                 help='Optional - Compression of the output files'),
+    click.option('--compression-level',
+                 prompt=False,
+                 type=int,
+                 default=None,
+                 help='Optional - Level for DEFLATE (1-9) or ZSTD (1-22)'),
+    click.option('--predictor',
+                 prompt=False,
+                 type=click.Choice(OutputProfile.PREDICTORS),
+                 default='none',
+                 help='Optional - standard for integer or floating_point '
+                      'for float data'),
+]
+
+
+def output_profile_options(command):
+    """
+    Add the output format and compression options to a click command. The
+    command receives them as one OutputProfile in the output_profile
+    keyword argument.
+    """
+    @functools.wraps(command)
+    def with_output_profile(*args, **kwargs):
+        kwargs['output_profile'] = OutputProfile(
+            output_format=kwargs.pop('output_format'),
+            compression=kwargs.pop('compression'),
+            compression_level=kwargs.pop('compression_level'),
+            predictor=kwargs.pop('predictor'),
+        )
+        return command(*args, **kwargs)
+
+    for option in reversed(OUTPUT_PROFILE_OPTIONS):
+        with_output_profile = option(with_output_profile)
+    return with_output_profile
+
+
+def mb_per_second(value):
+    """
+    Convert a bandwidth in MB/s to bytes per second.
+    """
+    if value is None:
+        return None
+    return int(value * 1024 ** 2)
+
+
+CHUNK_SIZE = 2000000  # In Bytes
+PART_FILE_SUFFIX = '.part'
+# Sidecar of a part file with the validator of the remote file it belongs to
+PART_INFO_SUFFIX = '.json'
+# Files above this size are split into byte range segments
+SEGMENT_THRESHOLD = 100 * 1024 ** 2  # In Bytes
+
+
+def file_size(file_name):
+    if os.path.isfile(file_name):
+        return os.path.getsize(file_name)
+    return 0
+
+
+def range_header(start, end=''):
+    return {'Range': 'bytes={0}-{1}'.format(start, end)}
+
+
+def write_response(response, file_name, offset, on_chunk=None, md5=None):
+    """
+    Stream the response content to given file. Appends to the file when an
+    offset is given.
+
+    :param on_chunk: Optional - Called with the size of each written chunk
+    :param md5: Optional - hashlib md5 object updated with each chunk
+    """
+    with open(file_name, 'ab' if offset > 0 else 'wb') as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+            if md5 is not None:
+                md5.update(chunk)
+            if on_chunk is not None:
+                on_chunk(len(chunk))
+
+
+def response_validator(response):
+    """
+    :return: Dictionary with ETag and Last-Modified of the response
+    """
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def load_part_validator(part_file):
+    """
+    :return: Validator saved for given part file or None when unknown
+    """
+    try:
+        with open(part_file + PART_INFO_SUFFIX) as part_info:
+            return json.load(part_info)
+    except (OSError, ValueError):
+        return None
+
+
+def save_part_validator(part_file, validator):
+    write_json(part_file + PART_INFO_SUFFIX, validator)
+
+
+def remove_part(part_file):
+    """
+    Remove a part file together with its validator and segment files.
+    """
+    segment_files = glob.glob(glob.escape(part_file) + '.[0-9]*')
+    for file_name in [part_file, part_file + PART_INFO_SUFFIX] + segment_files:
+        if os.path.isfile(file_name):
+            os.remove(file_name)
+
+
+def resume_headers(start, validator, end=''):
+    """
+    Range request for the rest of a part file or segment. With a known
+    validator the server only sends the range when the remote file did not
+    change and the complete file otherwise.
+    """
+    headers = range_header(start, end)
+    if validator is not None:
+        if_range = validator.get('etag') or validator.get('last_modified')
+        if if_range:
+            headers['If-Range'] = if_range
+    return headers
+
+
+def check_server_error(response):
+    """
+    Raise an HTTPError for server side errors, which are worth a retry.
+    """
+    if response.status_code >= 500:
+        response.close()
+        raise requests.exceptions.HTTPError(
+            'Server error {0} for {1}'.format(
+                response.status_code, response.url
+            ),
+            response=response
+        )
+
+
+def download_segment(session, url, segment_file, start, end, validator=None,
+                     **kwargs):
+    """
+    Download the byte range from start to end (inclusive) into its own
+    segment file, resuming an already started segment.
+
+    :param validator: Optional - ETag and Last-Modified of the remote file
+                      the segments belong to, sent as If-Range
+    :return: True when the segment is complete, False when it is incomplete
+             and None when the remote file changed
+    """
+    offset = file_size(segment_file)
+
+    if start + offset <= end:
+        response = session.get(
+            url, stream=True,
+            headers=resume_headers(start + offset, validator, end),
+            timeout=kwargs.get('timeout'),
+        )
+        check_server_error(response)
+        if response.status_code == 200:
+            # Server sends the complete file for a changed remote file
+            response.close()
+            return None
+        if response.status_code != 206:
+            response.close()
+            return False
+        write_response(
+            response, segment_file, offset, kwargs.get('on_chunk')
+        )
+
+    return file_size(segment_file) == end - start + 1
+
+
+def download_segments(session, url, part_file, total_size, segments,
+                      md5=None, validator=None, **kwargs):
+    """
+    Download the file in parallel byte range segments and join them into the
+    part file once all segments are complete. All segments are removed when
+    the remote file changed, which starts the download again.
+
+    :param md5: Optional - hashlib md5 object updated with the joined content
+    :param validator: Optional - Validator of the remote file for If-Range
+    """
+    segment_size = -(-total_size // segments)
+    ranges = [
+        (part_file + '.' + str(index), start,
+         min(start + segment_size, total_size) - 1)
+        for index, start in enumerate(range(0, total_size, segment_size))
+    ]
+
+    with ThreadPoolExecutor(len(ranges)) as executor:
+        completed = list(executor.map(
+            lambda segment: download_segment(
+                session, url, *segment, validator=validator, **kwargs
+            ),
+            ranges
+        ))
+
+    if None in completed:
+        print('Remote file changed during the download, starting again')
+        remove_part(part_file)
+        return
+
+    if not all(completed):
+        return
+
+    with open(part_file, 'wb') as part:
+        for segment_file, _start, _end in ranges:
+            with open(segment_file, 'rb') as segment:
+                for chunk in iter(lambda: segment.read(CHUNK_SIZE), b''):
+                    part.write(chunk)
+                    if md5 is not None:
+                        md5.update(chunk)
+    for segment_file, _start, _end in ranges:
+        os.remove(segment_file)
+
+
+def download_file(session, name, url, download_folder, ledger=None,
+                  segments=1, **kwargs):
+    """
+    Download given URL to the download folder. Files that are recorded as
+    complete in the download ledger are skipped without a request. With
+    revalidate they are requested with the recorded ETag and Last-Modified
+    instead and only downloaded again when the server reports a change.
+    Files on disk without a ledger entry are compared to the size of the GET
+    response before the content is read.
+
+    Content is written to a '.part' file first, which is resumed with a
+    range request on the next run and renamed once the download completed.
+    The ETag or Last-Modified of the remote file is kept next to the part
+    file and sent as If-Range, a changed remote file is downloaded again
+    from the start. The checksum is computed while the content is written.
+
+    :param session: requests.Session to download with
+    :param name: File name in download folder
+    :param url: URL to download
+    :param download_folder: Destination folder
+    :param ledger: Optional - DownloadLedger of the download folder
+    :param segments: Optional - Number of parallel byte range segments for
+                     files larger than SEGMENT_THRESHOLD
+    :param timeout: Optional - Request timeout in seconds
+    :param on_chunk: Optional - Called with the size of each written chunk
+    :param revalidate: Optional - Check complete files for remote changes
+                       with a conditional request, default: False
+    :return: True when the file is completely downloaded
+    :raises requests.HTTPError: On server errors
+    """
+    if ledger is None:
+        ledger = DownloadLedger(download_folder)
+
+    revalidate = kwargs.get('revalidate', False)
+    complete = ledger.is_complete(name)
+
+    if complete and not revalidate:
+        print('File: ' + name + ' already downloaded')
+        return True
+
     file_name = os.path.join(download_folder, name)
+    part_file = file_name + PART_FILE_SUFFIX
+    offset = file_size(part_file)
+    validator = load_part_validator(part_file) if offset > 0 else None
+
+    timeout = kwargs.get('timeout')
+    on_chunk = kwargs.get('on_chunk')
 
-    if not os.path.isfile(file_name) or os.path.getsize(file_name) != file_size:
-        response = session.get(url, stream=True)
-        with open(file_name, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=2000000):
-                f.write(chunk)
-        if response.status_code is 200:
-            print('Successfully downloaded: ' + name)
-        else:
-            print('Download for: ' + name + ' failed')
+    if offset > 0:
+        headers = resume_headers(offset, validator)
+    elif complete:
+        headers = ledger.conditional_headers(name)
     else:
-        print('File: ' + name + ' already downloaded')
+        headers = {}
+
+    response = session.get(
+        url, stream=True, headers=headers, timeout=timeout,
+    )
+
+    if response.status_code == 304:
+        response.close()
+        print('File: ' + name + ' not modified')
+        return True
+
+    if response.status_code == 416 or (
+            response.status_code == 206 and
+            response.headers.get('Content-Range') is None
+    ):
+        # Partial file does not match the remote file anymore or the range
+        # of the content is unknown
+        response.close()
+        remove_part(part_file)
+        offset = 0
+        response = session.get(url, stream=True, headers={}, timeout=timeout)
+
+    check_server_error(response)
+
+    if response.status_code not in [200, 206]:
+        response.close()
+        print('Download for: ' + name + ' failed')
+        return False
+
+    if response.status_code == 206:
+        total_size = response.headers.get('Content-Range', '*')
+        total_size = total_size.split('/')[-1]
+        total_size = int(total_size) if total_size != '*' else -1
+        # Hash the already downloaded part once, the rest while writing
+        md5 = DownloadLedger.md5(part_file)
+    else:
+        # Server sent the complete file, a part file is started again
+        offset = 0
+        validator = response_validator(response)
+        total_size = int(response.headers.get('Content-Length', -1))
+        md5 = hashlib.md5()
+
+        if ledger.entry(name) is None and \
+                file_size(file_name) == total_size:
+            response.close()
+            ledger.record(
+                name, total_size, validator['etag'],
+                DownloadLedger.checksum(file_name),
+                validator['last_modified'],
+            )
+            print('File: ' + name + ' already downloaded')
+            return True
+
+        if load_part_validator(part_file) != validator:
+            # Part or segments of an earlier version of the remote file
+            remove_part(part_file)
+        save_part_validator(part_file, validator)
+
+        if segments > 1 and total_size >= SEGMENT_THRESHOLD and \
+                response.headers.get('Accept-Ranges') == 'bytes':
+            response.close()
+            response = None
+            download_segments(
+                session, url, part_file, total_size, segments, md5,
+                validator=validator, timeout=timeout, on_chunk=on_chunk
+            )
+
+    if response is not None:
+        write_response(response, part_file, offset, on_chunk, md5)
+
+    if total_size != -1 and file_size(part_file) != total_size:
+        print('Download for: ' + name + ' incomplete, will resume next run')
+        return False
+
+    os.replace(part_file, file_name)
+    remove_part(part_file)
+    validator = validator or {}
+    ledger.record(
+        name, file_size(file_name), validator.get('etag'), md5.hexdigest(),
+        validator.get('last_modified'),
+    )
+    print('Successfully downloaded: ' + name)
+    return True
@@ -84,18 +84,27 @@ class SourceFolder:
         if os.path.exists(duplicate):
             os.remove(duplicate)
 
-    def process_new_files(self):
+    def process_new_files(self, doy=None, ledger=None):
         """
         Checks base_path for individual day files and moves them to their
         corresponding day folder
+
+        :param doy: Optional - Only move files of given day (YYYYDDD)
+        :param ledger: Optional - DownloadLedger of the type path, which
+                       records the new location of moved files
         """
-        [self.__move_files_to_folder(file) for file in self.files]
+        [
+            self.__move_files_to_folder(file, ledger) for file in self.files
+            if doy is None or
+            self.doy_from_file_name(os.path.basename(file)) == doy
+        ]
 
-    def __move_files_to_folder(self, file):
+    def __move_files_to_folder(self, file, ledger=None):
         """
         Moves given file to corresponding day folder
 
         :param file: Name of file to move
+        :param ledger: Optional - DownloadLedger to record the move in
         """
         doy = self.doy_from_file_name(file)
         source_folder_for_file = os.path.join(self.type_path, doy)
@@ -105,6 +114,11 @@ class SourceFolder:
         if fnmatch.fnmatch(file, '*' + doy + '*'):
             self.check_duplicate(file, source_folder_for_file)
             shutil.move(file, source_folder_for_file)
+            if ledger is not None:
+                name = os.path.basename(file)
+                ledger.record_move(
+                    name, os.path.join(source_folder_for_file, name)
+                )
 
     def doy_folders(self):
         """
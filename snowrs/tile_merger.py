@@ -1,8 +1,13 @@
 import glob
 import os
+from xml.sax.saxutils import escape
 
+import numpy
 from osgeo import gdal, gdalconst, gdalnumeric, osr
 
+from .execution_profile import ExecutionProfile
+from .output_profile import OutputProfile
+
 
 class TileMerger:
     BAND_DATA_TYPE = gdalconst.GDT_Int16  # Int16 to enable NoData value of -999
@@ -19,8 +24,6 @@ class TileMerger:
         }
     }
 
-    CREATE_OPTIONS = ["COMPRESS=LZW", "TILED=YES", "BIGTIFF=IF_SAFER"]
-
     FILE_SUFFIX = {
         'forcing': '_rf.tif',
         'fraction': '_SCA.tif',
@@ -40,12 +43,45 @@ class TileMerger:
     OUTPUT_PROJECTION = osr.SpatialReference()
     OUTPUT_PROJECTION.ImportFromEPSG(4326)
 
+    # Upper bound for the mosaic window that is held in memory while copying
+    WINDOW_MEMORY_BUDGET = 64 * 1024 ** 2  # In Bytes
+    # Int16 value plus the boolean mask of the threshold filter and the
+    # comparison that is combined into it
+    WINDOW_BYTES_PER_PIXEL = 4
+
+    # Threshold filter applied by the VRT while warping in the single pass
+    # pipeline. Requires GDAL_VRT_ENABLE_PYTHON, which is set during the run.
+    FILTER_PIXEL_FUNCTION = '''
+import numpy
+
+def filter_limits(in_ar, out_ar, *args, **kwargs):
+    values = in_ar[0]
+    out_ar[:] = numpy.where(
+        (values < {lower}) | (values > {upper}), {no_data}, values
+    )
+'''
+    FILTER_VRT = '''<VRTDataset rasterXSize="{x_size}" rasterYSize="{y_size}">
+  <SRS>{projection}</SRS>
+  <GeoTransform>{geo_transform}</GeoTransform>
+  <VRTRasterBand dataType="Int16" band="1" subClass="VRTDerivedRasterBand">
+    <NoDataValue>{no_data}</NoDataValue>
+    <PixelFunctionType>filter_limits</PixelFunctionType>
+    <PixelFunctionLanguage>Python</PixelFunctionLanguage>
+    <PixelFunctionCode><![CDATA[{pixel_function}]]></PixelFunctionCode>
+    <SourceTransferType>Int16</SourceTransferType>
+    <SimpleSource>
+      <SourceFilename relativeToVRT="0">{source}</SourceFilename>
+      <SourceBand>{band}</SourceBand>
+    </SimpleSource>
+  </VRTRasterBand>
+</VRTDataset>'''
+
     SOURCE_FILE_GLOB = '*[!_SCA,_rf].tif'
     SOURCE_FILE_PROJECTION = '+proj=sinu +lon_0=0 +x_0=0 +y_0=0 ' \
                              '+a=6371007.181 +b=6371007.181 +units=m ' \
                              '+no_defs +nadgrids=@null +wktext'
 
-    def __init__(self, source_folder, source_type):
+    def __init__(self, source_folder, source_type, **kwargs):
         self.source_folder = source_folder
         self.output_file = None
         self.mosaic_vrt = None
@@ -54,6 +90,12 @@ class TileMerger:
         self.file_queue = glob.glob(source_folder + self.SOURCE_FILE_GLOB)
         self.lower_limit = self.FILTER_TYPE_LIMITS[source_type]['lower']
         self.upper_limit = self.FILTER_TYPE_LIMITS[source_type]['upper']
+        self.window_budget = kwargs.get(
+            'window_budget', self.WINDOW_MEMORY_BUDGET
+        )
+        self.profile = kwargs.get('profile', ExecutionProfile())
+        self.output_profile = kwargs.get('output_profile', OutputProfile())
+        self.single_pass = kwargs.get('single_pass', False)
 
     @property
     def output_file_name(self):
@@ -63,6 +105,33 @@ class TileMerger:
             + self.FILE_SUFFIX[self.source_type]
         )
 
+    @property
+    def fingerprint(self):
+        """
+        Names, sizes and modification times of all source tiles plus the
+        filter limits, output settings and pipeline used for the output.
+        """
+        return {
+            'files': [
+                [os.path.basename(file), os.path.getsize(file),
+                 os.path.getmtime(file)]
+                for file in sorted(self.file_queue)
+            ],
+            'limits': self.FILTER_TYPE_LIMITS[self.source_type],
+            'output': self.output_profile.settings,
+            'single_pass': self.single_pass,
+        }
+
+    def is_up_to_date(self, manifest):
+        """
+        Check whether the output file was already created from the current
+        source tiles.
+
+        :param manifest: MergeManifest of the type path
+        :return: Boolean
+        """
+        return manifest.is_current(self.output_file_name, self.fingerprint)
+
     @property
     def mosaic_vrt_file(self):
         if self._mosaic_vrt_file is None:
@@ -79,6 +148,32 @@ class TileMerger:
             self.mosaic_vrt_file, self.file_queue, options=vrt_options
         )
 
+    def __filtered_mosaic_vrt(self):
+        """
+        Wrap the mosaic VRT into a derived VRT that applies the threshold
+        filter while GDAL reads the source tiles.
+
+        :return: GDAL dataset of filtered mosaic
+        """
+        pixel_function = self.FILTER_PIXEL_FUNCTION.format(
+            lower=self.lower_limit,
+            upper=self.upper_limit,
+            no_data=self.BAND_NO_DATA_VALUE,
+        )
+
+        return gdal.Open(self.FILTER_VRT.format(
+            x_size=self.mosaic_vrt.RasterXSize,
+            y_size=self.mosaic_vrt.RasterYSize,
+            projection=escape(self.mosaic_vrt.GetProjection()),
+            geo_transform=', '.join(
+                repr(value) for value in self.mosaic_vrt.GetGeoTransform()
+            ),
+            no_data=self.BAND_NO_DATA_VALUE,
+            pixel_function=pixel_function,
+            source=escape(os.path.abspath(self.mosaic_vrt_file)),
+            band=self.BAND_NUMBER,
+        ))
+
     def __init_output_file(self):
         self.output_file = self.OUTPUT_FILE_DRIVER.Create(
             self.output_file_name,
@@ -89,27 +184,72 @@ class TileMerger:
         self.output_file.SetGeoTransform(self.mosaic_vrt.GetGeoTransform())
         self.output_file.SetProjection(self.mosaic_vrt.GetProjection())
 
+    def windows(self, band):
+        """
+        Split given band into read windows that are aligned to the natural
+        block size of the band. Each window holds as many blocks as fit into
+        the configured window budget, but at least one.
+
+        :param band: GDAL raster band to split
+        :return: Generator with (x offset, y offset, x size, y size)
+        """
+        block_x, block_y = band.GetBlockSize()
+        blocks_in_budget = max(
+            self.window_budget //
+            (block_x * block_y * self.WINDOW_BYTES_PER_PIXEL),
+            1
+        )
+        blocks_per_row = -(-band.XSize // block_x)
+
+        if blocks_in_budget >= blocks_per_row:
+            window_x = band.XSize
+            window_y = block_y * (blocks_in_budget // blocks_per_row)
+        else:
+            window_x = block_x * blocks_in_budget
+            window_y = block_y
+
+        for y_offset in range(0, band.YSize, window_y):
+            for x_offset in range(0, band.XSize, window_x):
+                yield (
+                    x_offset, y_offset,
+                    min(window_x, band.XSize - x_offset),
+                    min(window_y, band.YSize - y_offset),
+                )
+
+    def filter_values(self, values):
+        """
+        Filter by upper and lower band threshold values. Values outside the
+        limits are set to the no data value in place.
+
+        :param values: Numpy array with band values
+        :return: Filtered numpy array
+        """
+        outside = numpy.less(values, self.lower_limit)
+        outside |= numpy.greater(values, self.upper_limit)
+        values[outside] = self.BAND_NO_DATA_VALUE
+        return values
+
     def __copy_band_data(self):
+        source_band = self.mosaic_vrt.GetRasterBand(self.BAND_NUMBER)
         target_band = self.output_file.GetRasterBand(self.BAND_NUMBER)
         target_band.SetNoDataValue(self.BAND_NO_DATA_VALUE)
 
-        source_values = gdalnumeric.BandReadAsArray(
-            self.mosaic_vrt.GetRasterBand(self.BAND_NUMBER),
-            buf_type=self.BAND_DATA_TYPE,
-        )
-
-        # Filter by upper and lower band threshold values
-        source_values[
-            (source_values < self.lower_limit) |
-            (source_values > self.upper_limit)
-            ] = self.BAND_NO_DATA_VALUE
+        for x_offset, y_offset, x_size, y_size in self.windows(source_band):
+            source_values = gdalnumeric.BandReadAsArray(
+                source_band, x_offset, y_offset, x_size, y_size,
+                buf_type=self.BAND_DATA_TYPE,
+            )
+            gdalnumeric.BandWriteArray(
+                target_band, self.filter_values(source_values),
+                xoff=x_offset, yoff=y_offset,
+            )
+            del source_values
 
-        gdalnumeric.BandWriteArray(target_band, source_values)
         target_band.FlushCache()
         target_band.SetMetadata(self.BAND_METADATA[self.source_type])
 
+        del source_band
         del target_band
-        del source_values
 
     def create_mosaic(self):
         if len(self.file_queue) == 0:
@@ -131,8 +271,96 @@ class TileMerger:
         print('Generating projected output file: ' + self.output_file_name)
 
         file = gdal.Warp(
-            '', self.output_file, dstSRS=self.OUTPUT_PROJECTION, format='MEM'
+            '', self.output_file, dstSRS=self.OUTPUT_PROJECTION, format='MEM',
+            **self.profile.warp_options()
         )
         gdal.Translate(
-            self.output_file_name, file, creationOptions=self.CREATE_OPTIONS
+            self.output_file_name, file,
+            **self.output_profile.translate_options(self.profile)
+        )
+
+    def create_projected_mosaic(self):
+        """
+        Single pass pipeline that filters the mosaic while reading the source
+        tiles and warps it directly into the final GeoTiff. Skips the
+        in-memory copies of create_mosaic and project.
+        """
+        if len(self.file_queue) == 0:
+            # Indicate no source files to process
+            return -1
+
+        print('Generating projected output file: ' + self.output_file_name)
+
+        self.__build_mosaic_vrt()
+        # Write the VRT to disk for the filter to reference
+        self.mosaic_vrt.FlushCache()
+
+        vrt_python = gdal.GetConfigOption('GDAL_VRT_ENABLE_PYTHON')
+        gdal.SetConfigOption('GDAL_VRT_ENABLE_PYTHON', 'YES')
+
+        # Restore the option and remove the mosaic VRT also when the warp
+        # fails, the worker process continues with the next day
+        try:
+            filtered_mosaic = self.__filtered_mosaic_vrt()
+            warp_options = self.output_profile.streaming_options(self.profile)
+            warp_options.update(self.profile.warp_options())
+            output_file = gdal.Warp(
+                self.output_file_name,
+                filtered_mosaic,
+                dstSRS=self.OUTPUT_PROJECTION,
+                outputType=self.BAND_DATA_TYPE,
+                srcNodata=self.BAND_NO_DATA_VALUE,
+                dstNodata=self.BAND_NO_DATA_VALUE,
+                **warp_options
+            )
+            del filtered_mosaic
+            if output_file is None:
+                raise IOError(
+                    'Could not warp: ' + self.output_file_name + ': ' +
+                    gdal.GetLastErrorMsg()
+                )
+            del output_file
+        finally:
+            gdal.SetConfigOption('GDAL_VRT_ENABLE_PYTHON', vrt_python)
+            self.mosaic_vrt = None
+            if os.path.exists(self.mosaic_vrt_file):
+                os.remove(self.mosaic_vrt_file)
+
+        output_file = gdal.Open(self.output_file_name, gdal.GA_Update)
+        output_file.GetRasterBand(self.BAND_NUMBER).SetMetadata(
+            self.BAND_METADATA[self.source_type]
         )
+
+        del output_file
+        self.output_profile.finish(self.output_file_name, self.profile)
+
+        # Indicate success
+        return 1
+
+    def run(self, single_pass=None):
+        """
+        Mosaic, filter and project all source tiles of the folder.
+
+        :param single_pass: Optional - Use create_projected_mosaic, default:
+                            the single_pass setting of the merger
+        :return: 'done', 'empty' without source tiles or the error message
+        """
+        if single_pass is None:
+            single_pass = self.single_pass
+
+        try:
+            if single_pass:
+                status = self.create_projected_mosaic()
+            else:
+                status = self.create_mosaic()
+                if status != -1:
+                    self.project()
+        except Exception as error:
+            return str(error)
+
+        if status == -1:
+            return 'empty'
+        if not os.path.isfile(self.output_file_name):
+            return 'No output file written'
+
+        return 'done'
@@ -0,0 +1,29 @@
+import pytest
+
+from snowrs.amsr2 import EaseGrid
+
+
+class TestEaseGrid:
+    def test_north_upper_left(self):
+        grid = EaseGrid.for_hemisphere('north')
+
+        assert grid.ul_x == pytest.approx(-9006074.5708, abs=1e-3)
+        assert grid.ul_y == pytest.approx(9006074.5708, abs=1e-3)
+
+    def test_south_upper_left(self):
+        grid = EaseGrid.for_hemisphere('south')
+
+        assert grid.ul_x == pytest.approx(-9006074.5708, abs=1e-3)
+        assert grid.ul_y == pytest.approx(9006074.5708, abs=1e-3)
+
+    def test_geo_transform(self):
+        grid = EaseGrid.for_hemisphere('south')
+
+        assert grid.geo_transform[1] == EaseGrid.SOURCE_SPAT_RES
+        assert grid.geo_transform[5] == -EaseGrid.SOURCE_SPAT_RES
+
+    def test_cached_per_hemisphere(self):
+        assert EaseGrid.for_hemisphere('north') is \
+               EaseGrid.for_hemisphere('north')
+        assert EaseGrid.for_hemisphere('north') is not \
+               EaseGrid.for_hemisphere('south')
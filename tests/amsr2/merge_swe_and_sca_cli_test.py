@@ -0,0 +1,251 @@
+from unittest import mock
+
+import pytest
+from click.testing import CliRunner
+from numpy.testing import assert_equal
+
+from scripts import merge_swe_and_sca
+from snowrs import OutputProfile
+from snowrs.amsr2 import RegridPlan
+
+YEAR = '2019'
+GEO_TRANSFORM = (8.0, 0.1, 0.0, 61.0, 0.0, -0.1)
+PROJECTION = 'EPSG:4326'
+
+
+class Reference:
+    """
+    Geometry of an SCA file, as used by RegridPlan.matches
+    """
+    RasterXSize = 2
+    RasterYSize = 1
+
+    def __init__(self, geo_transform=GEO_TRANSFORM):
+        self.geo_transform = geo_transform
+
+    def GetGeoTransform(self):
+        return self.geo_transform
+
+    def GetProjection(self):
+        return PROJECTION
+
+
+def small_plan(reference, **_kwargs):
+    indices, weights = RegridPlan.bilinear([0, 1], [0, 0], (2, 2))
+    return RegridPlan(
+        indices, weights, (1, 2),
+        geo_transform=reference.GetGeoTransform(),
+        projection=reference.GetProjection(),
+    )
+
+
+class SerialPool:
+    """
+    Runs the batch in the test process, where the patches apply
+    """
+    def __init__(self, _processes, initializer, initargs):
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        pass
+
+    @staticmethod
+    def imap_unordered(function, items):
+        return map(function, items)
+
+
+class MergeDay:
+    """
+    Records the merged days with the plan of the worker
+    """
+    def __init__(self, failed=()):
+        self.failed = failed
+        self.days = []
+        self.plans = []
+
+    def __call__(self, pair):
+        self.days.append(pair)
+        self.plans.append(merge_swe_and_sca.worker_plan)
+        doy = pair[0]
+        return doy, 'failed' if doy in self.failed else 'done'
+
+
+@pytest.fixture
+def folders(tmpdir):
+    """
+    AMSR2 files across 2019 and MODIS SCA files of three of its days
+    """
+    swe_folder = tmpdir.mkdir('amsr2')
+    for date in ['20190101', '20190201', '20190315', '20191231', '20200101']:
+        swe_folder.join('AMSR_2_L3_DailySnow_B01_' + date + '.he5').write('')
+    swe_folder.join('AMSR_2_L3_DailySnow_B01_20190102.h5').write('')
+
+    modis_folder = tmpdir.mkdir('modis')
+    for doy in ['2019001', '2019032', '2019365', '2020001']:
+        modis_folder.join(doy[:4], 'snow_fraction', doy).ensure(
+            doy + merge_swe_and_sca.SCA_FILE_SUFFIX
+        )
+
+    return swe_folder, modis_folder
+
+
+def run_batch(folders, merge_day, cli_args=(), reference=None):
+    swe_folder, modis_folder = folders
+    reference = reference or Reference()
+
+    with mock.patch.object(merge_swe_and_sca, 'Pool', SerialPool), \
+            mock.patch.object(merge_swe_and_sca, 'merge_day', merge_day), \
+            mock.patch.object(
+                merge_swe_and_sca.gdal, 'Open', return_value=reference
+            ), \
+            mock.patch.object(
+                RegridPlan, 'for_reference', side_effect=small_plan
+            ) as for_reference:
+        result = CliRunner().invoke(merge_swe_and_sca.cli, [
+            'batch',
+            '--swe-folder', str(swe_folder),
+            '--modis-folder', str(modis_folder),
+            '--year', YEAR,
+            *cli_args
+        ])
+
+    return result, for_reference
+
+
+class TestBatch:
+    def test_days_with_sca(self, folders):
+        merge_day = MergeDay()
+
+        result, _for_reference = run_batch(folders, merge_day)
+
+        assert result.exit_code == 0
+        assert [doy for doy, _swe, _sca in merge_day.days] == \
+            ['2019001', '2019032', '2019365']
+
+    def test_pairs_files_of_same_day(self, folders):
+        swe_folder, modis_folder = folders
+        merge_day = MergeDay()
+
+        run_batch(folders, merge_day)
+
+        doy, swe_file, sca_file = merge_day.days[1]
+        assert swe_file == str(
+            swe_folder.join('AMSR_2_L3_DailySnow_B01_20190201.he5')
+        )
+        assert sca_file == str(modis_folder.join(
+            YEAR, 'snow_fraction', doy, doy + '_SCA.tif'
+        ))
+
+    def test_skips_missing_sca_days(self, folders):
+        merge_day = MergeDay()
+
+        result, _for_reference = run_batch(folders, merge_day)
+
+        # 20190315 has no SCA file
+        assert '(3 days)' in result.output
+        assert '2019074' not in [doy for doy, _swe, _sca in merge_day.days]
+
+    def test_failed_days(self, folders):
+        merge_day = MergeDay(failed=['2019032'])
+
+        result, _for_reference = run_batch(folders, merge_day)
+
+        assert result.exit_code == 1
+        assert 'Failed to process day 2019032: failed' in result.output
+        assert len(merge_day.days) == 3
+
+    def test_one_plan_for_all_days(self, folders):
+        merge_day = MergeDay()
+
+        _result, for_reference = run_batch(folders, merge_day)
+
+        for_reference.assert_called_once()
+        assert len(set(id(plan) for plan in merge_day.plans)) == 1
+
+
+class TestBatchPlanFile:
+    def test_plan_stored(self, folders, tmpdir):
+        plan_file = str(tmpdir.join('plan.npz'))
+
+        result, for_reference = run_batch(
+            folders, MergeDay(), ['--plan-file', plan_file]
+        )
+
+        assert result.exit_code == 0
+        for_reference.assert_called_once()
+        assert tmpdir.join('plan.npz').exists()
+
+    def test_stored_plan_reused(self, folders, tmpdir):
+        plan_file = str(tmpdir.join('plan.npz'))
+        run_batch(folders, MergeDay(), ['--plan-file', plan_file])
+        merge_day = MergeDay()
+
+        result, for_reference = run_batch(
+            folders, merge_day, ['--plan-file', plan_file]
+        )
+
+        assert result.exit_code == 0
+        for_reference.assert_not_called()
+        assert 'Building regrid plan' not in result.output
+        assert_equal(
+            merge_day.plans[0].indices, small_plan(Reference()).indices
+        )
+
+    def test_plan_of_other_geometry_rebuilt(self, folders, tmpdir):
+        plan_file = str(tmpdir.join('plan.npz'))
+        run_batch(folders, MergeDay(), ['--plan-file', plan_file])
+        merge_day = MergeDay()
+        moved = Reference((9.0, 0.1, 0.0, 61.0, 0.0, -0.1))
+
+        result, for_reference = run_batch(
+            folders, merge_day, ['--plan-file', plan_file], moved
+        )
+
+        assert 'does not match' in result.output
+        for_reference.assert_called_once()
+        assert merge_day.plans[0].geo_transform == moved.geo_transform
+        assert RegridPlan.load(plan_file).matches(moved)
+
+
+class TestSingle:
+    @staticmethod
+    def run_single(tmpdir, cli_args):
+        tmpdir.join('swe.he5').write('')
+        tmpdir.join('sca.tif').write('')
+        sca = Reference()
+
+        with mock.patch.object(merge_swe_and_sca, 'SWE') as swe, \
+                mock.patch.object(
+                    merge_swe_and_sca.gdal, 'Open', return_value=sca
+                ), \
+                mock.patch.object(
+                    merge_swe_and_sca, 'merge_swe_with_sca'
+                ) as merge:
+            result = CliRunner().invoke(merge_swe_and_sca.cli, [
+                'single', '--modis-file', str(tmpdir.join('sca.tif')),
+                *cli_args
+            ])
+
+        return result, swe, sca, merge
+
+    def test_clip_and_merge(self, tmpdir):
+        result, swe, sca, merge = self.run_single(
+            tmpdir, ['--swe-file', str(tmpdir.join('swe.he5'))]
+        )
+
+        assert result.exit_code == 0
+        swe.assert_called_once_with(str(tmpdir.join('swe.he5')))
+        swe.return_value.clip_to_tif.assert_called_once_with(sca)
+        [(args, kwargs)] = merge.call_args_list
+        assert args == (swe.return_value.tif_file, sca)
+        assert kwargs['output_profile'].output_format == OutputProfile.GTIFF
+
+    def test_requires_swe(self, tmpdir):
+        result, _swe, _sca, merge = self.run_single(tmpdir, [])
+
+        assert result.exit_code == 2
+        assert 'Either --swe-file or --swe-url is required' in result.output
+        merge.assert_not_called()
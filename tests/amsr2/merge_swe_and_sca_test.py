@@ -0,0 +1,245 @@
+from unittest import mock
+
+import numpy
+import pytest
+from numpy.testing import assert_equal
+from osgeo import gdal, gdalnumeric
+
+from scripts import merge_swe_and_sca
+from scripts.merge_swe_and_sca import (
+    WINDOW_BYTES_PER_PIXEL, RunningStatistics, merge_swe_with_sca,
+    row_windows, swe_by_sca
+)
+from snowrs import OutputProfile
+
+SWE_NO_DATA = -999
+SCA_NO_DATA = 255
+NO_DATA = -9999
+SHAPE = (7, 5)
+
+
+class Band:
+    """
+    Size and block size of a GDAL band, as used by row_windows
+    """
+    def __init__(self, shape, block_y=1):
+        self.YSize, self.XSize = shape
+        self.block_y = block_y
+
+    def GetBlockSize(self):
+        return [self.XSize, self.block_y]
+
+
+def budget_for(rows, x_size=SHAPE[1]):
+    return rows * x_size * WINDOW_BYTES_PER_PIXEL
+
+
+@pytest.fixture
+def swe():
+    values = numpy.arange(SHAPE[0] * SHAPE[1], dtype=numpy.int16) * 14
+    values = values.reshape(SHAPE)
+    values[0, 0] = SWE_NO_DATA
+    values[3, 2] = SWE_NO_DATA
+    return values
+
+
+@pytest.fixture
+def sca():
+    values = numpy.arange(SHAPE[0] * SHAPE[1], dtype=numpy.uint8) * 2
+    values = values.reshape(SHAPE)
+    values[1, 1] = SCA_NO_DATA
+    values[3, 2] = SCA_NO_DATA
+    values[5, :] = 0
+    return values
+
+
+def reference(swe, sca):
+    """
+    SWE by SCA of the whole array in floating point
+    """
+    values = numpy.floor(swe.astype(numpy.float64) * sca / 100)
+    values = values.astype(numpy.int16)
+    values[(swe == SWE_NO_DATA) | (sca == SCA_NO_DATA)] = NO_DATA
+    return values
+
+
+def windowed(swe, sca, windows):
+    return numpy.concatenate([
+        swe_by_sca(
+            swe[y_offset:y_offset + y_size], sca[y_offset:y_offset + y_size],
+            SWE_NO_DATA, SCA_NO_DATA, NO_DATA
+        )
+        for y_offset, y_size in windows
+    ])
+
+
+class TestSweBySca:
+    def test_whole_array(self, swe, sca):
+        values = swe_by_sca(swe, sca, SWE_NO_DATA, SCA_NO_DATA, NO_DATA)
+
+        assert values.dtype == numpy.int16
+        assert_equal(values, reference(swe, sca))
+
+    def test_no_data_of_either_input(self, swe, sca):
+        values = swe_by_sca(swe, sca, SWE_NO_DATA, SCA_NO_DATA, NO_DATA)
+
+        assert values[0, 0] == NO_DATA
+        assert values[1, 1] == NO_DATA
+        assert values[3, 2] == NO_DATA
+        assert (values == NO_DATA).sum() == 3
+
+    def test_zero_sca(self, swe, sca):
+        values = swe_by_sca(swe, sca, SWE_NO_DATA, SCA_NO_DATA, NO_DATA)
+
+        # No snow cover is a valid zero and not no data
+        assert values[5].tolist() == [0] * SHAPE[1]
+
+    def test_without_no_data_values(self, swe, sca):
+        values = swe_by_sca(swe, sca, None, None, NO_DATA)
+
+        assert (values == NO_DATA).sum() == 0
+
+    def test_windows_match_whole_array(self, swe, sca):
+        windows = list(row_windows(Band(SHAPE), budget_for(2)))
+
+        assert_equal(windowed(swe, sca, windows), reference(swe, sca))
+
+
+class TestRowWindows:
+    def test_uneven_last_window(self):
+        windows = list(row_windows(Band(SHAPE), budget_for(2)))
+
+        assert windows == [(0, 2), (2, 2), (4, 2), (6, 1)]
+
+    def test_aligned_to_block_height(self):
+        windows = list(row_windows(Band(SHAPE, block_y=3), budget_for(4)))
+
+        assert windows == [(0, 3), (3, 3), (6, 1)]
+
+    def test_budget_below_one_block(self):
+        windows = list(row_windows(Band(SHAPE, block_y=2), 1))
+
+        assert windows == [(0, 2), (2, 2), (4, 2), (6, 1)]
+
+    def test_budget_above_band(self):
+        windows = list(row_windows(Band(SHAPE), budget_for(100)))
+
+        assert windows == [(0, SHAPE[0])]
+
+
+class TestRunningStatistics:
+    def test_windows_match_whole_array(self, swe, sca):
+        values = reference(swe, sca)
+        statistics = RunningStatistics()
+
+        for y_offset, y_size in row_windows(Band(SHAPE), budget_for(3)):
+            window = values[y_offset:y_offset + y_size]
+            statistics.add(window[window != NO_DATA])
+
+        valid = values[values != NO_DATA]
+        assert statistics.count == valid.size
+        assert statistics.minimum == valid.min()
+        assert statistics.maximum == valid.max()
+        assert statistics.mean == pytest.approx(valid.mean())
+        assert statistics.std_dev == pytest.approx(valid.std())
+
+    def test_no_overflow_of_int16(self):
+        statistics = RunningStatistics()
+        statistics.add(numpy.full((100, 100), 30000, dtype=numpy.int16))
+
+        assert statistics.mean == 30000
+        assert statistics.std_dev == 0
+
+    def test_empty_window(self):
+        statistics = RunningStatistics()
+        statistics.add(numpy.array([], dtype=numpy.int16))
+        statistics.add(numpy.array([4, 8], dtype=numpy.int16))
+
+        assert (statistics.minimum, statistics.maximum) == (4, 8)
+        assert statistics.mean == 6
+
+
+def write_raster(driver, file_name, values, data_type, no_data):
+    raster = gdal.GetDriverByName(driver).Create(
+        file_name, SHAPE[1], SHAPE[0], 1, data_type
+    )
+    raster.SetGeoTransform((8.0, 0.1, 0, 61.0, 0, -0.1))
+    band = raster.GetRasterBand(1)
+    band.SetNoDataValue(no_data)
+    gdalnumeric.BandWriteArray(band, values)
+    band.FlushCache()
+    return raster
+
+
+class TestMergeSweWithSca:
+    @staticmethod
+    def merge(tmpdir, swe, sca, output_profile=None):
+        swe_file = write_raster('MEM', '', swe, gdal.GDT_Int16, SWE_NO_DATA)
+        sca_file = write_raster(
+            'GTiff', str(tmpdir.join('2019032_SCA.tif')), sca, gdal.GDT_Byte,
+            SCA_NO_DATA
+        )
+
+        # Several windows with an uneven last one
+        with mock.patch.object(
+                merge_swe_and_sca, 'row_windows',
+                lambda band: row_windows(band, budget_for(2))
+        ), mock.patch.object(
+                OutputProfile, 'finish', autospec=True,
+                side_effect=OutputProfile.finish
+        ) as finish:
+            merge_swe_with_sca(
+                swe_file, sca_file, output_profile=output_profile
+            )
+
+        return str(tmpdir.join('SWE_by_SCA.tif')), finish
+
+    def test_values(self, tmpdir, swe, sca):
+        output_file, _finish = self.merge(tmpdir, swe, sca)
+
+        output = gdal.Open(output_file)
+        band = output.GetRasterBand(1)
+        no_data = band.GetNoDataValue()
+        expected = swe_by_sca(swe, sca, SWE_NO_DATA, SCA_NO_DATA, no_data)
+
+        assert band.DataType == gdal.GDT_Int16
+        assert no_data == SCA_NO_DATA
+        assert_equal(band.ReadAsArray(), expected)
+        del band
+        del output
+
+    def test_statistics(self, tmpdir, swe, sca):
+        output_file, _finish = self.merge(tmpdir, swe, sca)
+
+        output = gdal.Open(output_file)
+        band = output.GetRasterBand(1)
+        values = band.ReadAsArray()
+        valid = values[values != band.GetNoDataValue()]
+        minimum, maximum, mean, std_dev = band.GetStatistics(False, False)
+        del band
+        del output
+
+        assert (minimum, maximum) == (valid.min(), valid.max())
+        assert mean == pytest.approx(valid.mean())
+        assert std_dev == pytest.approx(valid.std())
+
+    def test_finish(self, tmpdir, swe, sca):
+        output_profile = OutputProfile(compression='DEFLATE')
+
+        output_file, finish = self.merge(tmpdir, swe, sca, output_profile)
+
+        finish.assert_called_once_with(output_profile, output_file, mock.ANY)
+
+    def test_finish_to_cog(self, tmpdir, swe, sca):
+        output_file, finish = self.merge(
+            tmpdir, swe, sca, OutputProfile(output_format=OutputProfile.COG)
+        )
+
+        finish.assert_called_once()
+        output = gdal.Open(output_file)
+        assert output.GetMetadata('IMAGE_STRUCTURE').get('LAYOUT') == 'COG'
+        assert_equal(
+            output.ReadAsArray(),
+            swe_by_sca(swe, sca, SWE_NO_DATA, SCA_NO_DATA, SCA_NO_DATA)
+        )
+        del output
@@ -0,0 +1,72 @@
+import numpy
+import pytest
+from numpy.testing import assert_equal
+
+from snowrs.amsr2 import RegridPlan
+
+NO_DATA = -999
+SOURCE = numpy.array([[10, 20, 30],
+                      [40, 50, 60]], dtype=numpy.int16)
+
+
+def plan_for(columns, rows):
+    indices, weights = RegridPlan.bilinear(columns, rows, SOURCE.shape)
+    return RegridPlan(
+        indices, weights, (1, len(columns)),
+        geo_transform=(0, 1, 0, 0, 0, -1), projection='',
+    )
+
+
+class TestRegridPlan:
+    def test_pixel_centers(self):
+        plan = plan_for([0, 2, 1], [0, 0, 1])
+
+        assert plan.regrid(SOURCE, NO_DATA).tolist() == [[10, 30, 50]]
+
+    def test_bilinear_weights(self):
+        plan = plan_for([0.5, 0.25], [0.5, 0])
+
+        assert plan.regrid(SOURCE, NO_DATA).tolist() == [[30, 13]]
+
+    def test_no_data_neighbour(self):
+        source = SOURCE.copy()
+        source[0, 0] = NO_DATA
+        plan = plan_for([0.5], [0.5])
+
+        # Mean of the three valid neighbours
+        assert plan.regrid(source, NO_DATA).tolist() == [[37]]
+
+    def test_outside_source(self):
+        plan = plan_for([-2, 5, 2.5], [0, 0, 0])
+
+        assert plan.regrid(SOURCE, NO_DATA).tolist() == \
+            [[NO_DATA, NO_DATA, 30]]
+
+    def test_nearest(self):
+        plan = plan_for([0.4, 1.6, -3], [0.6, 0.2, 0])
+
+        assert plan.regrid_nearest(SOURCE, NO_DATA).tolist() == \
+            [[40, 30, NO_DATA]]
+
+    def test_save_and_load(self, tmpdir):
+        plan = plan_for([0.5, 1], [0.5, 1])
+        file_name = str(tmpdir.join('plan.npz'))
+
+        plan.save(file_name)
+        loaded = RegridPlan.load(file_name)
+
+        assert loaded.shape == plan.shape
+        assert loaded.hemisphere == plan.hemisphere
+        assert loaded.geo_transform == plan.geo_transform
+        assert_equal(loaded.indices, plan.indices)
+        assert_equal(
+            loaded.regrid(SOURCE, NO_DATA), plan.regrid(SOURCE, NO_DATA)
+        )
+
+    @pytest.mark.parametrize('row', [0, 1])
+    def test_weights_sum_to_one(self, row):
+        _indices, weights = RegridPlan.bilinear(
+            numpy.linspace(0, 2, 7), numpy.full(7, row * 0.5), SOURCE.shape
+        )
+
+        assert weights.sum(axis=0) == pytest.approx(numpy.ones(7))
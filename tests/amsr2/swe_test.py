@@ -0,0 +1,237 @@
+from unittest import mock
+
+import numpy
+import pytest
+from numpy.testing import assert_equal
+from osgeo import gdal, osr
+
+from snowrs.amsr2 import SWE, EaseGrid, RegridPlan
+
+# Linear ramp over the EASE-Grid, SWE changes by 2 mm per grid cell in both
+# directions
+RAMP = numpy.add.outer(
+    numpy.arange(RegridPlan.SOURCE_SHAPE[0]),
+    numpy.arange(RegridPlan.SOURCE_SHAPE[1])
+).astype(numpy.int16) * 2
+RAMP_STEP = 2
+
+
+def masked_decode(raw_values):
+    """
+    Decoding with two masks, as done before the lookup table
+    """
+    swe = raw_values.astype(numpy.int16)
+    swe[swe > SWE.BAND_MAX_DATA_VALUE] = SWE.NO_DATA_VALUE
+    swe[swe > SWE.NO_DATA_VALUE] *= SWE.BAND_VALUE_SCALE_FACTOR
+    return swe
+
+
+class TestDecodeSWE:
+    def test_all_raw_values(self):
+        raw_values = numpy.arange(256, dtype=numpy.uint8)
+
+        assert_equal(SWE.decode_swe(raw_values), masked_decode(raw_values))
+
+    def test_decoded_type_and_shape(self):
+        raw_values = numpy.array([[0, 240], [241, 255]], dtype=numpy.uint8)
+
+        decoded = SWE.decode_swe(raw_values)
+
+        assert decoded.dtype == numpy.int16
+        assert decoded.tolist() == [[0, 480], [-999, -999]]
+
+
+HDF_FILE_NAME = '/data/AMSR_2_L3_DailySnow_B01_20190101.he5'
+GRIDS = {
+    'North': 'Northern Hemisphere',
+    'South': 'Southern Hemisphere',
+}
+RAW_VALUES = numpy.array([[0, 240], [241, 255]], dtype=numpy.uint8)
+
+
+def subdataset_name(grid, field):
+    return 'HDF5:"{0}"://HDFEOS/GRIDS/{1}/Data Fields/{2}'.format(
+        HDF_FILE_NAME, GRIDS[grid], field
+    )
+
+
+class FakeSubdataset:
+    def __init__(self, values):
+        self.values = values
+
+    def ReadAsArray(self, buf_type=None):
+        return self.values
+
+
+class FakeDailySnowFile:
+    """
+    Daily snow file with SWE and flags of the given hemispheres, which
+    records the opened subdatasets
+    """
+    def __init__(self, grids=('North', 'South')):
+        self.names = [
+            subdataset_name(grid, field + '_' + grid + 'ernDaily')
+            for grid in grids for field in ['SWE', 'Flags']
+        ]
+        self.opened = []
+
+    def GetSubDatasets(self):
+        return [(name, 'Description') for name in self.names]
+
+    def open(self, name, _access):
+        self.opened.append(name)
+        if name == HDF_FILE_NAME:
+            return self
+        if name not in self.names:
+            return None
+        return FakeSubdataset(RAW_VALUES)
+
+
+@pytest.fixture
+def daily_snow_file():
+    daily_snow_file = FakeDailySnowFile()
+    with mock.patch('snowrs.amsr2.swe.gdal.Open', daily_snow_file.open):
+        yield daily_snow_file
+
+
+class TestProducts:
+    def test_subdataset_by_keywords(self, daily_snow_file):
+        swe = SWE(HDF_FILE_NAME)
+
+        assert swe.subdataset('Flags', 'South') == \
+            subdataset_name('South', 'Flags_SouthernDaily')
+
+    def test_subdataset_not_in_file(self, daily_snow_file):
+        with pytest.raises(ValueError, match='No subdataset with: SWE, East'):
+            SWE(HDF_FILE_NAME).subdataset('SWE', 'East')
+
+    def test_available_products(self, daily_snow_file):
+        assert SWE(HDF_FILE_NAME).available_products() == [
+            'north_flags', 'north_swe', 'south_flags', 'south_swe'
+        ]
+
+    def test_available_products_of_one_hemisphere(self):
+        daily_snow_file = FakeDailySnowFile(grids=['North'])
+
+        with mock.patch('snowrs.amsr2.swe.gdal.Open', daily_snow_file.open):
+            products = SWE(HDF_FILE_NAME).available_products()
+
+        assert products == ['north_flags', 'north_swe']
+
+    def test_read_swe(self, daily_snow_file):
+        values = SWE(HDF_FILE_NAME).read_product('south_swe')
+
+        assert daily_snow_file.opened[-1] == \
+            subdataset_name('South', 'SWE_SouthernDaily')
+        assert values.tolist() == [[0, 480], [-999, -999]]
+
+    def test_read_flags_unchanged(self, daily_snow_file):
+        values = SWE(HDF_FILE_NAME).read_product('north_flags')
+
+        assert daily_snow_file.opened[-1] == \
+            subdataset_name('North', 'Flags_NorthernDaily')
+        assert values.dtype == numpy.int16
+        assert values.tolist() == RAW_VALUES.tolist()
+
+    def test_container_opened_once(self, daily_snow_file):
+        swe = SWE(HDF_FILE_NAME)
+        swe.read_product('north_swe')
+        swe.read_product('south_swe')
+
+        assert daily_snow_file.opened.count(HDF_FILE_NAME) == 1
+
+    def test_unknown_product(self, daily_snow_file):
+        with pytest.raises(ValueError, match='Unknown product: east_swe'):
+            SWE(HDF_FILE_NAME).read_product('east_swe')
+
+        assert daily_snow_file.opened == []
+
+
+class TestProductToTif:
+    def test_grid_set_up_once(self, daily_snow_file):
+        with mock.patch.dict(EaseGrid._grids, clear=True), \
+                mock.patch.object(
+                    EaseGrid, '__init__', autospec=True,
+                    side_effect=EaseGrid.__init__
+                ) as grid_setup:
+            first = SWE(HDF_FILE_NAME).product_to_tif('north_swe')
+            second = SWE(HDF_FILE_NAME).product_to_tif('north_flags')
+            SWE(HDF_FILE_NAME).product_to_tif('south_swe')
+
+        assert grid_setup.call_count == 2
+        assert first.GetGeoTransform() == second.GetGeoTransform()
+        assert first.GetProjection() == second.GetProjection()
+
+    def test_unknown_product(self, daily_snow_file):
+        with pytest.raises(ValueError, match='Unknown product'):
+            SWE(HDF_FILE_NAME).product_to_tif('north_snow_depth')
+
+
+@pytest.fixture
+def reference_file():
+    """
+    Geographic 0.1 degree grid over southern Norway
+    """
+    reference = gdal.GetDriverByName('MEM').Create(
+        '', 20, 10, 1, gdal.GDT_Int16
+    )
+    reference.SetGeoTransform((8.0, 0.1, 0, 61.0, 0, -0.1))
+    projection = osr.SpatialReference()
+    projection.ImportFromEPSG(4326)
+    reference.SetProjection(projection.ExportToWkt())
+    return reference
+
+
+class TestRegridToTif:
+    @staticmethod
+    def product(swe, product_values, method, *args):
+        with mock.patch.object(
+                SWE, 'read_product', return_value=product_values
+        ):
+            method(swe, *args)
+        return swe.tif_file
+
+    def test_grid_of_clip(self, reference_file):
+        plan = RegridPlan.for_reference(reference_file)
+
+        regridded = self.product(SWE(''), RAMP, SWE.regrid_to_tif, plan)
+        clipped = self.product(
+            SWE(''), RAMP, SWE.clip_to_tif, reference_file
+        )
+
+        assert (regridded.RasterXSize, regridded.RasterYSize) == \
+            (clipped.RasterXSize, clipped.RasterYSize)
+        assert regridded.GetGeoTransform() == \
+            pytest.approx(clipped.GetGeoTransform())
+
+    def test_values_of_clip(self, reference_file):
+        plan = RegridPlan.for_reference(reference_file)
+
+        regridded = self.product(
+            SWE(''), RAMP, SWE.regrid_to_tif, plan
+        ).ReadAsArray()
+        clipped = self.product(
+            SWE(''), RAMP, SWE.clip_to_tif, reference_file
+        ).ReadAsArray()
+
+        # Nearest neighbour warp of clip_to_tif, half a cell in each
+        # direction, plus rounding
+        assert numpy.abs(
+            regridded.astype(numpy.int32) - clipped
+        ).max() <= 2 * RAMP_STEP
+
+    def test_flags_no_data(self, reference_file):
+        plan = RegridPlan.for_reference(reference_file)
+        flags = numpy.zeros(RegridPlan.SOURCE_SHAPE, dtype=numpy.int16)
+
+        regridded = self.product(
+            SWE(''), flags, SWE.regrid_to_tif, plan, 'north_flags'
+        )
+        clipped = self.product(
+            SWE(''), flags, SWE.clip_to_tif, reference_file, 'north_flags'
+        )
+
+        assert regridded.GetRasterBand(1).GetNoDataValue() == \
+            SWE.NO_DATA_VALUE
+        assert clipped.GetRasterBand(1).GetNoDataValue() == \
+            SWE.NO_DATA_VALUE
@@ -0,0 +1,57 @@
+import threading
+
+import requests
+
+
+class FakeResponse:
+    """
+    Stand in for requests.Response with the attributes the downloads use
+    """
+    def __init__(self, content=b'', status_code=200, headers=None, url=''):
+        self.content = content
+        self.status_code = status_code
+        if headers is None:
+            headers = {'Content-Length': str(len(content))}
+        self.headers = headers
+        self.url = url
+        self.closed = False
+
+    @property
+    def text(self):
+        if isinstance(self.content, bytes):
+            return self.content.decode()
+        return self.content
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                str(self.status_code), response=self
+            )
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """
+    Stand in for requests.Session that records all requests and answers
+    them with the given responses in order. Sub classes override respond to
+    create the responses.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.requests.append((url, kwargs))
+        return self.respond(url, **kwargs)
+
+    def respond(self, _url, **_kwargs):
+        with self.lock:
+            return self.responses.pop(0)
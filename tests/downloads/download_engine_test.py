@@ -0,0 +1,194 @@
+import threading
+import time
+from unittest import mock
+
+import requests
+
+from snowrs.download_engine import (
+    BandwidthLimiter, DownloadEngine, ProgressMonitor
+)
+from tests.conftest import FakeResponse, FakeSession
+
+CONTENT = b'swe' * 100
+
+
+def response(status_code=200):
+    return FakeResponse(
+        CONTENT, status_code, url='https://n5eil01u.ecs.nsidc.org/'
+    )
+
+
+class CountingSession(FakeSession):
+    """
+    Counts the requests that are served at the same time
+    """
+    active = 0
+    max_active = 0
+    counter_lock = threading.Lock()
+
+    def respond(self, _url, **_kwargs):
+        with self.counter_lock:
+            CountingSession.active += 1
+            CountingSession.max_active = max(
+                CountingSession.max_active, CountingSession.active
+            )
+        time.sleep(0.01)
+        with self.counter_lock:
+            CountingSession.active -= 1
+        return response()
+
+
+class FlakySession(FakeSession):
+    """
+    Answers every first request for a file with a server error
+    """
+    def respond(self, url, **_kwargs):
+        if [requested for requested, _ in self.requests].count(url) > 1:
+            return response()
+        return response(status_code=503)
+
+
+class BrokenResponse(FakeResponse):
+    """
+    Connection that breaks off while the content is read
+    """
+    def iter_content(self, chunk_size):
+        yield self.content[:10]
+        raise requests.exceptions.ChunkedEncodingError('Connection broken')
+
+
+class BrokenSession(FakeSession):
+    """
+    Breaks off every first response for a file
+    """
+    def respond(self, url, **_kwargs):
+        if [requested for requested, _ in self.requests].count(url) > 1:
+            return response()
+        return BrokenResponse(CONTENT, url=url)
+
+
+class FailingSession(FakeSession):
+    """
+    Raises an error that is not retried for one file
+    """
+    def respond(self, url, **_kwargs):
+        if url.endswith('file_1.hdf'):
+            raise KeyError('Content-Range')
+        return response()
+
+
+def files(count, host='n5eil01u.ecs.nsidc.org'):
+    return [
+        ('file_{0}.hdf'.format(index),
+         'https://{0}/file_{1}.hdf'.format(host, index))
+        for index in range(count)
+    ]
+
+
+class TestDownloadEngine:
+    def test_one_session_per_worker(self, tmpdir):
+        sessions = []
+
+        def session_factory():
+            sessions.append(CountingSession())
+            return sessions[-1]
+
+        engine = DownloadEngine(session_factory, workers=2)
+        downloads = engine.download(files(10), str(tmpdir))
+
+        assert all(downloads.values())
+        assert 1 <= len(sessions) <= 2
+        assert len(tmpdir.listdir(lambda path: path.ext == '.hdf')) == 10
+
+    def test_host_connection_limit(self, tmpdir):
+        CountingSession.max_active = 0
+        engine = DownloadEngine(
+            CountingSession, workers=6, host_connections=2
+        )
+
+        engine.download(files(12), str(tmpdir))
+
+        assert CountingSession.max_active <= 2
+
+    @mock.patch.object(DownloadEngine, 'BACKOFF', 0.01)
+    def test_retry_server_errors(self, tmpdir):
+        session = FlakySession()
+        engine = DownloadEngine(lambda: session, workers=1)
+
+        downloads = engine.download(files(3), str(tmpdir))
+
+        assert all(downloads.values())
+        assert engine.progress.files_done == 3
+
+    def test_retries_exhausted(self, tmpdir):
+        engine = DownloadEngine(
+            lambda: FlakySession(), workers=1, retries=0
+        )
+
+        downloads = engine.download(files(2), str(tmpdir))
+
+        assert not any(downloads.values())
+        assert engine.progress.files_failed == 2
+
+    @mock.patch.object(DownloadEngine, 'BACKOFF', 0.01)
+    def test_retry_broken_content(self, tmpdir):
+        session = BrokenSession()
+        engine = DownloadEngine(lambda: session, workers=1)
+
+        downloads = engine.download(files(2), str(tmpdir))
+
+        assert all(downloads.values())
+        assert tmpdir.join('file_0.hdf').read_binary() == CONTENT
+
+    def test_other_error_fails_only_its_file(self, tmpdir):
+        completed = []
+        session = FailingSession()
+        engine = DownloadEngine(lambda: session, workers=2)
+
+        downloads = engine.download(
+            files(3), str(tmpdir),
+            on_complete=lambda name, success: completed.append(
+                (name, success)
+            )
+        )
+
+        assert downloads == {
+            'file_0.hdf': True, 'file_1.hdf': False, 'file_2.hdf': True,
+        }
+        assert sorted(completed) == sorted(downloads.items())
+        assert engine.progress.files_failed == 1
+        # Not retried
+        assert len([
+            url for url, _kwargs in session.requests
+            if url.endswith('file_1.hdf')
+        ]) == 1
+
+
+class TestBandwidthLimiter:
+    @mock.patch('time.sleep')
+    def test_sleeps_when_over_rate(self, sleep):
+        limiter = BandwidthLimiter(rate=1000)
+
+        limiter.consume(1000)
+        sleep.assert_not_called()
+
+        limiter.consume(500)
+        assert 0.4 < sleep.call_args[0][0] <= 0.5
+
+    @mock.patch('time.sleep')
+    def test_no_limit(self, sleep):
+        BandwidthLimiter().consume(10 ** 9)
+
+        sleep.assert_not_called()
+
+
+class TestProgressMonitor:
+    def test_eta(self):
+        progress = ProgressMonitor()
+        progress.start = time.monotonic() - 10
+        [progress.file_queued() for _ in range(4)]
+        progress.add_bytes(1000)
+        progress.file_finished(True)
+
+        # 3 files of 1000 bytes left at 100 bytes per second
+        assert round(progress.eta) == 30
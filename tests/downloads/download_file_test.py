@@ -0,0 +1,302 @@
+import os
+import re
+from unittest import mock
+
+import pytest
+import requests
+
+from snowrs.download_ledger import DownloadLedger
+from snowrs.script_helpers import PART_FILE_SUFFIX, PART_INFO_SUFFIX, \
+    download_file, save_part_validator
+from tests.conftest import FakeResponse, FakeSession
+
+FILE_NAME = 'MOD09GA.A2018001.h24v05.snow_fraction.tif'
+FILE_URL = 'https://snow-data.jpl.nasa.gov/modscag/2018/001/' + FILE_NAME
+CONTENT = b'snow' * 1024
+ETAG = '"5f1e-snow"'
+
+
+class RangeSession(FakeSession):
+    """
+    Serves the content and honors range and If-Range request headers
+    """
+    RANGE_REGEX = re.compile(r'bytes=(\d+)-(\d*)')
+
+    def __init__(self, content, etag=ETAG):
+        super(RangeSession, self).__init__()
+        self.content = content
+        self.etag = etag
+
+    @property
+    def ranges(self):
+        return [
+            (kwargs.get('headers') or {}).get('Range')
+            for _url, kwargs in self.requests
+        ]
+
+    def respond(self, _url, headers=None, **_kwargs):
+        headers = headers or {}
+        byte_range = headers.get('Range')
+
+        if byte_range is None or \
+                headers.get('If-Range', self.etag) != self.etag:
+            return FakeResponse(
+                self.content, headers={
+                    'Content-Length': str(len(self.content)),
+                    'Accept-Ranges': 'bytes',
+                    'ETag': self.etag,
+                }
+            )
+
+        start, end = self.RANGE_REGEX.match(byte_range).groups()
+        end = int(end) if end else len(self.content) - 1
+        content = self.content[int(start):end + 1]
+        return FakeResponse(content, status_code=206, headers={
+            'Content-Length': str(len(content)),
+            'Content-Range': 'bytes {0}-{1}/{2}'.format(
+                start, end, len(self.content)
+            ),
+        })
+
+
+class ChangingSession(RangeSession):
+    """
+    Remote file changes after the first request
+    """
+    def respond(self, url, **kwargs):
+        response = super(ChangingSession, self).respond(url, **kwargs)
+        self.content = CONTENT[::-1]
+        self.etag = '"5f1f-snow"'
+        return response
+
+
+class TestDownloadFile:
+    def test_download_records_ledger(self, tmpdir):
+        session = FakeSession(FakeResponse(CONTENT))
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+        entry = DownloadLedger(str(tmpdir)).entry(FILE_NAME)
+        assert entry['size'] == len(CONTENT)
+        assert entry['checksum'] == DownloadLedger.checksum(
+            str(tmpdir.join(FILE_NAME))
+        )
+
+    def test_complete_file_without_request(self, tmpdir):
+        tmpdir.join(FILE_NAME).write_binary(CONTENT)
+        DownloadLedger(str(tmpdir)).record(FILE_NAME, len(CONTENT))
+        session = FakeSession()
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert session.requests == []
+
+    def test_revalidate_not_modified(self, tmpdir):
+        tmpdir.join(FILE_NAME).write_binary(CONTENT)
+        DownloadLedger(str(tmpdir)).record(
+            FILE_NAME, len(CONTENT), ETAG,
+            last_modified='Mon, 01 Jan 2018 00:00:00 GMT'
+        )
+        session = FakeSession(FakeResponse(status_code=304, headers={}))
+
+        assert download_file(
+            session, FILE_NAME, FILE_URL, str(tmpdir), revalidate=True
+        )
+
+        assert session.requests[0][1]['headers'] == {
+            'If-None-Match': ETAG,
+            'If-Modified-Since': 'Mon, 01 Jan 2018 00:00:00 GMT',
+        }
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+
+    def test_revalidate_changed_file(self, tmpdir):
+        tmpdir.join(FILE_NAME).write_binary(b'old!' * 1024)
+        DownloadLedger(str(tmpdir)).record(FILE_NAME, len(CONTENT), '"old"')
+        response = FakeResponse(CONTENT, headers={
+            'Content-Length': str(len(CONTENT)), 'ETag': ETAG,
+        })
+
+        download_file(
+            FakeSession(response), FILE_NAME, FILE_URL, str(tmpdir),
+            revalidate=True
+        )
+
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+        assert DownloadLedger(str(tmpdir)).entry(FILE_NAME)['etag'] == ETAG
+
+    def test_existing_file_without_ledger_entry(self, tmpdir):
+        tmpdir.join(FILE_NAME).write_binary(CONTENT)
+        response = FakeResponse(CONTENT)
+
+        download_file(
+            FakeSession(response), FILE_NAME, FILE_URL, str(tmpdir)
+        )
+
+        assert response.closed
+        assert DownloadLedger(str(tmpdir)).is_complete(FILE_NAME)
+
+    def test_truncated_file_is_downloaded_again(self, tmpdir):
+        tmpdir.join(FILE_NAME).write_binary(CONTENT[:10])
+        DownloadLedger(str(tmpdir)).record(FILE_NAME, len(CONTENT))
+
+        download_file(
+            FakeSession(FakeResponse(CONTENT)), FILE_NAME, FILE_URL,
+            str(tmpdir)
+        )
+
+        assert os.path.getsize(str(tmpdir.join(FILE_NAME))) == len(CONTENT)
+
+    def test_failed_download_not_recorded(self, tmpdir):
+        assert not download_file(
+            FakeSession(FakeResponse(b'', status_code=404)),
+            FILE_NAME, FILE_URL, str(tmpdir)
+        )
+
+        assert DownloadLedger(str(tmpdir)).entry(FILE_NAME) is None
+
+    def test_server_error_raises(self, tmpdir):
+        with pytest.raises(requests.exceptions.HTTPError):
+            download_file(
+                FakeSession(FakeResponse(b'', status_code=503)),
+                FILE_NAME, FILE_URL, str(tmpdir)
+            )
+
+    def test_resume_partial_download(self, tmpdir):
+        part_file = tmpdir.join(FILE_NAME + PART_FILE_SUFFIX)
+        part_file.write_binary(CONTENT[:100])
+        save_part_validator(str(part_file), {'etag': ETAG})
+        session = RangeSession(CONTENT)
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert session.ranges == ['bytes=100-']
+        assert session.requests[0][1]['headers']['If-Range'] == ETAG
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+        assert not part_file.exists()
+        assert not tmpdir.join(
+            FILE_NAME + PART_FILE_SUFFIX + PART_INFO_SUFFIX
+        ).exists()
+
+    def test_resume_of_changed_file_starts_again(self, tmpdir):
+        part_file = tmpdir.join(FILE_NAME + PART_FILE_SUFFIX)
+        part_file.write_binary(b'old!' * 25)
+        save_part_validator(str(part_file), {'etag': '"old"'})
+        session = RangeSession(CONTENT)
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert len(session.requests) == 1
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+        entry = DownloadLedger(str(tmpdir)).entry(FILE_NAME)
+        assert entry['etag'] == ETAG
+        assert entry['checksum'] == DownloadLedger.checksum(
+            str(tmpdir.join(FILE_NAME))
+        )
+
+    def test_resume_checksum_covers_part(self, tmpdir):
+        part_file = tmpdir.join(FILE_NAME + PART_FILE_SUFFIX)
+        part_file.write_binary(CONTENT[:100])
+        save_part_validator(str(part_file), {'etag': ETAG})
+
+        download_file(
+            RangeSession(CONTENT), FILE_NAME, FILE_URL, str(tmpdir)
+        )
+
+        assert DownloadLedger(str(tmpdir)).entry(FILE_NAME)['checksum'] == \
+            DownloadLedger.checksum(str(tmpdir.join(FILE_NAME)))
+
+    def test_validator_kept_with_incomplete_part(self, tmpdir):
+        response = FakeResponse(
+            CONTENT[:100], headers={
+                'Content-Length': str(len(CONTENT)), 'ETag': ETAG,
+            }
+        )
+
+        download_file(FakeSession(response), FILE_NAME, FILE_URL, str(tmpdir))
+
+        session = RangeSession(CONTENT)
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert session.requests[0][1]['headers'] == {
+            'Range': 'bytes=100-', 'If-Range': ETAG,
+        }
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+
+    def test_range_without_content_range_starts_again(self, tmpdir):
+        part_file = tmpdir.join(FILE_NAME + PART_FILE_SUFFIX)
+        part_file.write_binary(CONTENT[:100])
+        save_part_validator(str(part_file), {'etag': ETAG})
+        session = FakeSession(
+            FakeResponse(CONTENT[100:], status_code=206),
+            FakeResponse(CONTENT),
+        )
+
+        assert download_file(session, FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert session.requests[1][1]['headers'] == {}
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+
+    def test_incomplete_download_is_kept_as_part(self, tmpdir):
+        response = FakeResponse(
+            CONTENT[:100], headers={'Content-Length': str(len(CONTENT))}
+        )
+
+        download_file(FakeSession(response), FILE_NAME, FILE_URL, str(tmpdir))
+
+        assert not tmpdir.join(FILE_NAME).exists()
+        assert tmpdir.join(FILE_NAME + PART_FILE_SUFFIX).size() == 100
+
+    @mock.patch('snowrs.script_helpers.SEGMENT_THRESHOLD', 1024)
+    def test_segmented_download(self, tmpdir):
+        session = RangeSession(CONTENT)
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir), segments=3)
+
+        assert sorted(session.ranges[1:]) == [
+            'bytes=0-1365', 'bytes=1366-2731', 'bytes=2732-4095'
+        ]
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
+        assert tmpdir.listdir(lambda path: 'part' in path.basename) == []
+        assert DownloadLedger(str(tmpdir)).entry(FILE_NAME)['checksum'] == \
+            DownloadLedger.checksum(str(tmpdir.join(FILE_NAME)))
+
+    @mock.patch('snowrs.script_helpers.SEGMENT_THRESHOLD', 1024)
+    def test_segments_sent_with_if_range(self, tmpdir):
+        session = RangeSession(CONTENT)
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir), segments=3)
+
+        assert [
+            kwargs['headers']['If-Range']
+            for _url, kwargs in session.requests[1:]
+        ] == [ETAG] * 3
+
+    @mock.patch('snowrs.script_helpers.SEGMENT_THRESHOLD', 1024)
+    def test_segments_of_changed_file_start_again(self, tmpdir):
+        session = ChangingSession(CONTENT)
+
+        assert not download_file(
+            session, FILE_NAME, FILE_URL, str(tmpdir), segments=3
+        )
+        assert tmpdir.listdir(lambda path: 'part' in path.basename) == []
+
+        download_file(session, FILE_NAME, FILE_URL, str(tmpdir), segments=3)
+
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT[::-1]
+
+    @mock.patch('snowrs.script_helpers.SEGMENT_THRESHOLD', 1024)
+    def test_segments_of_earlier_version_removed(self, tmpdir):
+        part_file = str(tmpdir.join(FILE_NAME + PART_FILE_SUFFIX))
+        # Complete first segment, which is not requested again
+        tmpdir.join(FILE_NAME + PART_FILE_SUFFIX + '.0').write_binary(
+            b'o' * 1366
+        )
+        save_part_validator(part_file, {'etag': '"old"'})
+
+        download_file(
+            RangeSession(CONTENT), FILE_NAME, FILE_URL, str(tmpdir),
+            segments=3
+        )
+
+        assert tmpdir.join(FILE_NAME).read_binary() == CONTENT
@@ -0,0 +1,168 @@
+import re
+import threading
+from unittest import mock
+
+import requests
+
+from snowrs import JPLData, ListingCache
+from tests.conftest import FakeResponse, FakeSession
+
+TILES = ['h24v05', 'h25v05']
+FILE_TYPES = ['snow_fraction.tif']
+INDEX_HTML = '''<html><body><table>
+<tr><td><a href="?C=N;O=D">Name</a></td></tr>
+<tr><td><a href="{0}">{0}</a></td></tr>
+<tr><td><a href="{1}">{1}</a></td></tr>
+<tr><td><a href="{2}">{2}</a></td></tr>
+</table></body></html>
+'''
+
+
+def file_name(year, day, tile, file_type='snow_fraction.tif'):
+    return 'MOD09GA.A{0}{1:03d}.{2}.{3}'.format(year, day, tile, file_type)
+
+
+class IndexSession(FakeSession):
+    """
+    Serves a day index with the requested tiles and one other file type
+    """
+    DAY_REGEX = re.compile(r'/(\d{4})/(\d{3})/$')
+
+    def __init__(self, failing_days=(), blocked_day=None):
+        super(IndexSession, self).__init__()
+        self.failing_days = failing_days
+        self.blocked_day = blocked_day
+        self.unblock = threading.Event()
+
+    def respond(self, url, **_kwargs):
+        year, day = map(int, self.DAY_REGEX.search(url).groups())
+
+        if day in self.failing_days:
+            raise requests.exceptions.ConnectionError('Connection refused')
+        if day == self.blocked_day:
+            self.unblock.wait(5)
+
+        return FakeResponse(INDEX_HTML.format(
+            file_name(year, day, TILES[0]),
+            file_name(year, day, 'h08v05'),
+            file_name(year, day, TILES[1]),
+        ))
+
+
+def jpl_data(session, **kwargs):
+    data = JPLData(
+        username='user', password='secret', source_type='fraction', **kwargs
+    )
+    # Requests of the index crawl and the listing cache
+    data.get = session.get
+    return data
+
+
+class TestIterFilesForDateRange:
+    def test_files_of_requested_tiles(self):
+        data = jpl_data(IndexSession())
+
+        files = data.files_for_date_range(TILES, 2018, [1, 2], FILE_TYPES)
+
+        assert sorted(files) == sorted(
+            file_name(2018, day, tile) for day in [1, 2] for tile in TILES
+        )
+        assert files[file_name(2018, 2, TILES[0])] == \
+            JPLData.TYPES['fraction'] + '/2018/002/' + \
+            file_name(2018, 2, TILES[0])
+
+    def test_days_in_order_of_arrival(self):
+        session = IndexSession(blocked_day=1)
+        data = jpl_data(session, index_workers=3)
+        files = data.iter_files_for_date_range(
+            TILES, 2018, [1, 2, 3], FILE_TYPES
+        )
+
+        # Day 1 is only answered after the other days were returned
+        first = [next(files) for _ in range(4)]
+        session.unblock.set()
+        rest = list(files)
+
+        assert sorted(first) == sorted(
+            (name, mock.ANY) for name in [
+                file_name(2018, day, tile) for day in [2, 3] for tile in TILES
+            ]
+        )
+        assert [name for name, _url in rest] == \
+            [file_name(2018, 1, tile) for tile in TILES]
+
+    def test_files_of_day_in_index_order(self):
+        data = jpl_data(IndexSession(), index_workers=4)
+
+        files = list(data.iter_files_for_date_range(
+            TILES, 2018, range(1, 9), FILE_TYPES
+        ))
+
+        for day in range(1, 9):
+            assert [
+                name for name, _url in files
+                if name.startswith('MOD09GA.A2018{0:03d}'.format(day))
+            ] == [file_name(2018, day, tile) for tile in TILES]
+
+    def test_failed_day_skipped(self):
+        data = jpl_data(IndexSession(failing_days=[2]))
+
+        files = data.files_for_date_range(TILES, 2018, [1, 2, 3], FILE_TYPES)
+
+        assert sorted(files) == sorted(
+            file_name(2018, day, tile) for day in [1, 3] for tile in TILES
+        )
+        assert data.failed_days == [2]
+
+    def test_failed_days_reset(self):
+        session = IndexSession(failing_days=[2])
+        data = jpl_data(session)
+        data.files_for_date_range(TILES, 2018, [1, 2], FILE_TYPES)
+
+        data.files_for_date_range(TILES, 2018, [1], FILE_TYPES)
+
+        assert data.failed_days == []
+
+
+class TestGetListing:
+    URL = JPLData.TYPES['fraction'] + '/2018/001/'
+
+    def test_without_cache(self):
+        session = IndexSession()
+        data = jpl_data(session)
+
+        assert 'MOD09GA.A2018001' in data.get_listing(self.URL, 2018)
+        assert [url for url, _kwargs in session.requests] == [self.URL]
+
+    def test_archived_year_cached_forever(self):
+        cache = mock.Mock(spec=ListingCache)
+        data = jpl_data(IndexSession(), listing_cache=cache, listing_ttl=60)
+
+        data.get_listing(self.URL, 2014)
+
+        cache.fetch.assert_called_once_with(
+            data, self.URL, ListingCache.FOREVER
+        )
+
+    def test_current_year_with_ttl(self):
+        cache = mock.Mock(spec=ListingCache)
+        data = jpl_data(IndexSession(), listing_cache=cache, listing_ttl=60)
+
+        data.get_listing(self.URL, 2015)
+
+        cache.fetch.assert_called_once_with(data, self.URL, 60)
+
+    def test_archived_index_not_requested_again(self, tmpdir):
+        session = IndexSession()
+        data = jpl_data(
+            session, listing_cache=ListingCache(str(tmpdir)), listing_ttl=0
+        )
+
+        data.files_for_date_range(TILES, 2010, [1, 2], FILE_TYPES)
+        files = data.files_for_date_range(TILES, 2010, [1, 2], FILE_TYPES)
+
+        assert len(files) == 4
+        assert sorted(url for url, _kwargs in session.requests) == [
+            JPLData.TYPES['fraction'] + '-historic/2010/001/',
+            JPLData.TYPES['fraction'] + '-historic/2010/002/',
+        ]
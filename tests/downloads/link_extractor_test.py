@@ -0,0 +1,52 @@
+import re
+
+from snowrs.link_extractor import extract_links, find_links
+
+INDEX_HTML = '''
+<html><body><table>
+<tr><th><a href="?C=N;O=D">Name</a></th></tr>
+<tr><td><a href="MOD09GA.A2018001.h24v05.snow_fraction.tif">
+MOD09GA.A2018001.h24v05.snow_fraction.tif</a></td></tr>
+<tr><td><A HREF='MOD09GA.A2018001.h25v05.snow_fraction.tif'><b>MOD09GA.A2018001.h25v05.snow_fraction.tif</b></A></td></tr>
+<tr><td><a href="AMSR_2_L3_DailySnow_B01_20180101.he5">Snow &amp; Ice</a></td></tr>
+</table></body></html>
+'''
+
+
+class TestExtractLinks:
+    def test_all_links(self):
+        links = extract_links(INDEX_HTML)
+
+        assert [href for href, _text in links] == [
+            '?C=N;O=D',
+            'MOD09GA.A2018001.h24v05.snow_fraction.tif',
+            'MOD09GA.A2018001.h25v05.snow_fraction.tif',
+            'AMSR_2_L3_DailySnow_B01_20180101.he5',
+        ]
+
+    def test_link_text(self):
+        links = extract_links(INDEX_HTML)
+
+        assert links[2][1] == 'MOD09GA.A2018001.h25v05.snow_fraction.tif'
+        assert links[3][1] == 'Snow & Ice'
+
+    def test_unquoted_href_fallback(self):
+        links = extract_links('<a href=file.tif>file.tif</a>')
+
+        assert links == [('file.tif', 'file.tif')]
+
+
+class TestFindLinks:
+    def test_match_text(self):
+        links = find_links(INDEX_HTML, re.compile(r'h25v05.*tif$'))
+
+        assert [href for href, _text in links] == [
+            'MOD09GA.A2018001.h25v05.snow_fraction.tif'
+        ]
+
+    def test_match_href(self):
+        links = find_links(
+            INDEX_HTML, re.compile(r'AMSR_2_L3_DailySnow_.*'), attribute='href'
+        )
+
+        assert links == [('AMSR_2_L3_DailySnow_B01_20180101.he5', 'Snow & Ice')]
@@ -0,0 +1,63 @@
+import json
+
+from snowrs import ListingCache
+from tests.conftest import FakeResponse, FakeSession
+
+INDEX_URL = 'https://snow-data.jpl.nasa.gov/modscag/2018/001/'
+
+
+def expire(cache, url):
+    with open(cache.entry_file(url)) as entry_file:
+        entry = json.load(entry_file)
+    entry['fetched'] = 0
+    with open(cache.entry_file(url), 'w') as entry_file:
+        json.dump(entry, entry_file)
+
+
+class TestListingCache:
+    def test_caches_listing(self, tmpdir):
+        cache = ListingCache(str(tmpdir))
+        session = FakeSession(FakeResponse('index'))
+
+        assert cache.fetch(session, INDEX_URL) == 'index'
+        assert cache.fetch(session, INDEX_URL) == 'index'
+        assert len(session.requests) == 1
+
+    def test_revalidates_expired_listing(self, tmpdir):
+        cache = ListingCache(str(tmpdir))
+        session = FakeSession(
+            FakeResponse('index', headers={'ETag': '"abc"'}),
+            FakeResponse(status_code=304),
+        )
+        cache.fetch(session, INDEX_URL, ttl=60)
+        expire(cache, INDEX_URL)
+
+        assert cache.fetch(session, INDEX_URL, ttl=60) == 'index'
+        assert session.requests[1][1]['headers'] == {
+            'If-None-Match': '"abc"'
+        }
+
+    def test_replaces_changed_listing(self, tmpdir):
+        cache = ListingCache(str(tmpdir))
+        session = FakeSession(
+            FakeResponse(
+                'index', headers={'Last-Modified': 'Mon, 01 Jan 2018'}
+            ),
+            FakeResponse('new index'),
+        )
+        cache.fetch(session, INDEX_URL, ttl=60)
+        expire(cache, INDEX_URL)
+
+        assert cache.fetch(session, INDEX_URL, ttl=60) == 'new index'
+        assert session.requests[1][1]['headers'] == {
+            'If-Modified-Since': 'Mon, 01 Jan 2018'
+        }
+
+    def test_does_not_cache_errors(self, tmpdir):
+        cache = ListingCache(str(tmpdir))
+        session = FakeSession(
+            FakeResponse('unavailable', 503), FakeResponse('index')
+        )
+
+        assert cache.fetch(session, INDEX_URL) == 'unavailable'
+        assert cache.fetch(session, INDEX_URL) == 'index'
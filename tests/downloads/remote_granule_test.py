@@ -0,0 +1,143 @@
+import functools
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from unittest import mock
+
+import numpy
+import pytest
+import requests
+from osgeo import gdal, gdalnumeric
+
+from snowrs import RemoteGranule
+from tests.conftest import FakeResponse
+
+GRANULE_NAME = 'AMSR_2_L3_DailySnow_B01_20180101.tif'
+GRANULE_VALUES = numpy.arange(12, dtype=numpy.int16).reshape(3, 4)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def granule_server(tmpdir_factory):
+    folder = tmpdir_factory.mktemp('granules')
+
+    granule = gdal.GetDriverByName('GTiff').Create(
+        str(folder.join(GRANULE_NAME)), 4, 3, 1, gdal.GDT_Int16
+    )
+    gdalnumeric.BandWriteArray(granule.GetRasterBand(1), GRANULE_VALUES)
+    del granule
+
+    server = HTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(QuietHandler, directory=str(folder))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield 'http://127.0.0.1:{0}/'.format(server.server_port)
+
+    server.shutdown()
+
+
+class TestRemoteGranule:
+    def test_vsimem(self, granule_server):
+        with RemoteGranule(
+                requests.Session(), granule_server + GRANULE_NAME
+        ) as granule:
+            path = granule.path
+            assert path.startswith('/vsimem/')
+
+            dataset = granule.open()
+            numpy.testing.assert_equal(dataset.ReadAsArray(), GRANULE_VALUES)
+            del dataset
+
+        assert gdal.VSIStatL(path) is None
+
+    def test_vsicurl_path(self):
+        granule = RemoteGranule(
+            requests.Session(), 'https://lance.nsstc.nasa.gov/snow.he5',
+            RemoteGranule.VSICURL
+        )
+
+        assert granule.path == '/vsicurl/https://lance.nsstc.nasa.gov/snow.he5'
+
+    def test_vsicurl_logs_in_with_session(self):
+        session = requests.Session()
+        session.auth = ('user', 'secret')
+        granule = RemoteGranule(
+            session, 'https://lance.nsstc.nasa.gov/snow.he5',
+            RemoteGranule.VSICURL
+        )
+
+        with mock.patch.object(
+                session, 'get', return_value=FakeResponse()
+        ) as get, mock.patch('snowrs.remote_granule.gdal'):
+            granule.path
+
+        get.assert_called_once_with(
+            'https://lance.nsstc.nasa.gov/snow.he5', stream=True
+        )
+
+    def test_vsicurl_global_options_reset_on_close(self):
+        session = requests.Session()
+        session.auth = ('user', 'secret')
+        granule = RemoteGranule(
+            session, 'https://lance.nsstc.nasa.gov/snow.he5',
+            RemoteGranule.VSICURL
+        )
+
+        with mock.patch.object(
+                session, 'get', return_value=FakeResponse()
+        ), mock.patch(
+            'snowrs.remote_granule.gdal', spec=['SetConfigOption']
+        ) as gdal_mock:
+            granule.path
+            granule.close()
+
+        assert gdal_mock.SetConfigOption.call_args_list[-2:] == [
+            mock.call('GDAL_HTTP_AUTH', None),
+            mock.call('GDAL_HTTP_USERPWD', None),
+        ]
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            RemoteGranule(requests.Session(), 'https://host/file', 'disk')
+
+
+class TestGdalHttpOptions:
+    def test_digest_auth(self):
+        session = requests.Session()
+        session.auth = requests.auth.HTTPDigestAuth('user', 'secret')
+
+        assert RemoteGranule.gdal_http_options(session) == {
+            'GDAL_HTTP_AUTH': 'DIGEST',
+            'GDAL_HTTP_USERPWD': 'user:secret',
+        }
+
+    def test_basic_auth_and_cookies(self):
+        session = requests.Session()
+        session.auth = ('user', 'secret')
+        session.cookies.set('urs_session', 'abc')
+
+        assert RemoteGranule.gdal_http_options(session) == {
+            'GDAL_HTTP_AUTH': 'BASIC',
+            'GDAL_HTTP_USERPWD': 'user:secret',
+            'GDAL_HTTP_COOKIE': 'urs_session=abc',
+        }
+
+    @pytest.mark.parametrize('auth', [
+        (None, None),
+        ('user', None),
+        requests.auth.HTTPDigestAuth(None, None),
+    ])
+    def test_auth_without_credentials(self, auth):
+        session = requests.Session()
+        session.auth = auth
+        session.cookies.set('urs_session', 'abc')
+
+        assert RemoteGranule.gdal_http_options(session) == {
+            'GDAL_HTTP_COOKIE': 'urs_session=abc',
+        }
@@ -65,31 +65,44 @@ def create_source_folder(name):
     shutil.copytree(TEST_TIFFS_DIR, test_source_folder)
 
 
-def execute_runner(source_type):
+def execute_runner(source_type, cli_args=()):
     arguments = [
         '--source-folder', TEST_SOURCE_FOLDER,
-        '--source-type', source_type
+        '--source-type', source_type,
+        *cli_args
     ]
 
     cli_runner = CliRunner()
     return cli_runner.invoke(process_folder, arguments)
 
 
-# Utility method to get a pytest marker from a test class
+# Utility method to get a pytest marker from a test class.
+# Marks of sub classes are listed after the inherited ones.
 def get_cls_marker(cls, name):
     return next(
-        (mark for mark in cls.pytestmark if mark.name == name)
+        (
+            mark for mark in reversed(getattr(cls, 'pytestmark', []))
+            if mark.name == name
+        ),
+        None
     )
 
 
 @pytest.fixture(scope='class', autouse=True)
 def runner(request):
     mark = get_cls_marker(request.cls, 'runner_args')
+    if mark is None:
+        # Test does not need a processed source folder
+        yield
+        return
+
     source_type = mark.kwargs['source_type']
 
     create_source_folder(source_type)
 
-    request.cls.runner = execute_runner(source_type)
+    request.cls.runner = execute_runner(
+        source_type, mark.kwargs.get('cli_args', ())
+    )
     request.cls.out_file = OutputFile(
         get_source_folder(source_type), source_type
     )
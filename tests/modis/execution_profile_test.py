@@ -0,0 +1,37 @@
+from unittest import mock
+
+from snowrs import ExecutionProfile
+
+
+class TestExecutionProfile:
+    def test_defaults_use_all_cores(self):
+        profile = ExecutionProfile()
+
+        assert profile.warp_options() == {
+            'multithread': True,
+            'warpMemoryLimit': ExecutionProfile.WARP_MEMORY_LIMIT,
+            'warpOptions': ['NUM_THREADS=ALL_CPUS'],
+        }
+        assert profile.creation_options(['COMPRESS=LZW']) == [
+            'COMPRESS=LZW', 'NUM_THREADS=ALL_CPUS'
+        ]
+
+    def test_single_thread(self):
+        profile = ExecutionProfile(warp_threads=1)
+
+        assert profile.warp_options()['multithread'] is False
+
+    @mock.patch('multiprocessing.cpu_count', return_value=8)
+    def test_for_workers_splits_cores(self, _cpu_count):
+        profile = ExecutionProfile.for_workers(4)
+
+        assert profile.warp_threads == 2
+        assert profile.compression_threads == 2
+
+    @mock.patch('multiprocessing.cpu_count', return_value=2)
+    def test_for_workers_at_least_one_thread(self, _cpu_count):
+        assert ExecutionProfile.for_workers(4).warp_threads == 1
+
+    def test_for_single_worker(self):
+        assert ExecutionProfile.for_workers(1).warp_threads == \
+               ExecutionProfile.ALL_CPUS
@@ -1,9 +1,20 @@
+import os
+import shutil
+from unittest import mock
+
 import pytest
+from click.testing import CliRunner
 from numpy.testing import assert_equal
 from osgeo import gdal
 
+from scripts.modis.gdal_merge import process_folder
+from snowrs import TileMerger
 from tests.setup_scripts.create_test_images import TILE_VALUES, PROJECTION
 
+TEST_TIFFS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'source_tiffs'
+)
+
 NO_DATA_VALUE = -999.0
 
 
@@ -107,3 +118,35 @@ class TestFraction:
             self.out_file.band_values != NO_DATA_VALUE
         ]
         assert_equal(source_band_values, mosaic_band_values)
+
+
+@pytest.mark.runner_args(source_type='forcing', cli_args=['--single-pass'])
+class TestForcingSinglePass(TestForcing):
+    pass
+
+
+@pytest.mark.runner_args(source_type='fraction', cli_args=['--single-pass'])
+class TestFractionSinglePass(TestFraction):
+    pass
+
+
+@pytest.mark.runner_args(source_type='fraction', cli_args=['--workers', '2'])
+class TestFractionWorkers(TestFraction):
+    pass
+
+
+class TestFailedDays:
+    def test_exit_code(self, tmpdir):
+        shutil.copytree(
+            TEST_TIFFS_DIR, str(tmpdir.join('2019', 'forcing', '2019001'))
+        )
+
+        with mock.patch.object(TileMerger, 'run', return_value='Failed'):
+            result = CliRunner().invoke(process_folder, [
+                '--source-folder', str(tmpdir),
+                '--source-type', 'forcing',
+                '--year', '2019',
+            ])
+
+        assert result.exit_code == 1
+        assert '2019001' in result.output
@@ -0,0 +1,304 @@
+import os
+from unittest import mock
+
+import pytest
+from click.testing import CliRunner
+
+from scripts.modis import jpl_snow_pipeline
+from scripts.modis.jpl_snow_pipeline import DayQueue
+from snowrs import (
+    ExecutionProfile, JPLData, MergeManifest, OutputProfile, SourceFolder
+)
+from snowrs.download_ledger import DownloadLedger
+
+YEAR = 2019
+TILES = ['h24v05', 'h25v05']
+FILE_NAME = 'MOD09GA.A{0}.{1}.snow_fraction.tif'
+OPTIONS = {
+    'source_type': 'fraction',
+    'window_budget': 64,
+    'single_pass': False,
+    'profile': ExecutionProfile(),
+    'output_profile': OutputProfile(),
+}
+
+
+def file_name(doy, tile):
+    return FILE_NAME.format(doy, tile)
+
+
+class AsyncResult:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class RecordingPool:
+    """
+    Records the queued mosaics without running them
+    """
+    def __init__(self, *_args, **_kwargs):
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        pass
+
+    def apply_async(self, function, args):
+        self.calls.append((function, args))
+        return AsyncResult(None)
+
+
+class SerialPool(RecordingPool):
+    """
+    Runs the queued mosaics right away in the test process
+    """
+    def apply_async(self, function, args):
+        super(SerialPool, self).apply_async(function, args)
+        return AsyncResult(function(*args))
+
+
+def merge_folder(_options, doy_folder):
+    """
+    Writes the output file without a mosaic
+    """
+    doy = os.path.basename(os.path.dirname(doy_folder))
+    with open(os.path.join(doy_folder, doy + '_SCA.tif'), 'w'):
+        pass
+    return doy_folder, 'done'
+
+
+@pytest.fixture
+def source_folder(tmpdir):
+    folder = SourceFolder(str(tmpdir), source_type='fraction')
+    folder.year = YEAR
+    os.makedirs(folder.type_path)
+    return folder
+
+
+def download(source_folder, name):
+    with open(os.path.join(source_folder.type_path, name), 'w') as file:
+        file.write(name)
+
+
+def day_queue(source_folder, manifest=None):
+    return DayQueue(
+        source_folder, len(TILES), RecordingPool(), OPTIONS,
+        manifest or MergeManifest(source_folder.type_path),
+        DownloadLedger(source_folder.type_path),
+    )
+
+
+class TestDayQueue:
+    def test_queue_once_all_tiles_arrived(self, source_folder):
+        queue = day_queue(source_folder)
+        download(source_folder, file_name('2019001', TILES[0]))
+        queue.file_complete(file_name('2019001', TILES[0]), True)
+
+        assert queue.pool.calls == []
+
+        download(source_folder, file_name('2019001', TILES[1]))
+        queue.file_complete(file_name('2019001', TILES[1]), True)
+
+        doy_folder = os.path.join(source_folder.type_path, '2019001', '')
+        assert queue.pool.calls == [
+            (jpl_snow_pipeline.merge_folder, (queue.options, doy_folder))
+        ]
+        assert sorted(os.listdir(doy_folder)) == \
+            [file_name('2019001', tile) for tile in TILES]
+
+    def test_failed_download_not_counted(self, source_folder):
+        queue = day_queue(source_folder)
+        for tile in TILES:
+            queue.file_complete(file_name('2019001', tile), False)
+
+        assert queue.pool.calls == []
+        assert '2019001' not in queue.arrived
+
+    def test_repeated_file_not_counted(self, source_folder):
+        queue = day_queue(source_folder)
+        download(source_folder, file_name('2019001', TILES[0]))
+        queue.file_complete(file_name('2019001', TILES[0]), True)
+        queue.file_complete(file_name('2019001', TILES[0]), True)
+
+        assert queue.pool.calls == []
+
+    def test_day_queued_once(self, source_folder):
+        queue = day_queue(source_folder)
+        for tile in TILES:
+            download(source_folder, file_name('2019001', tile))
+            queue.file_complete(file_name('2019001', tile), True)
+        queue.file_complete(file_name('2019001', TILES[1]), True)
+        queue.queue_incomplete()
+
+        assert len(queue.pool.calls) == 1
+        assert list(queue.merges) == ['2019001']
+
+    def test_days_queued_separately(self, source_folder):
+        queue = day_queue(source_folder)
+        for doy in ['2019002', '2019001']:
+            for tile in TILES:
+                download(source_folder, file_name(doy, tile))
+                queue.file_complete(file_name(doy, tile), True)
+
+        assert [
+            os.path.basename(os.path.dirname(args[1]))
+            for _function, args in queue.pool.calls
+        ] == ['2019002', '2019001']
+
+    def test_incomplete_day(self, source_folder):
+        queue = day_queue(source_folder)
+        download(source_folder, file_name('2019001', TILES[0]))
+        queue.file_complete(file_name('2019001', TILES[0]), True)
+
+        queue.queue_incomplete()
+
+        assert list(queue.merges) == ['2019001']
+
+    def test_up_to_date_day_not_queued(self, source_folder):
+        queue = day_queue(source_folder)
+        for tile in TILES:
+            download(source_folder, file_name('2019001', tile))
+            queue.file_complete(file_name('2019001', tile), True)
+        output_file, fingerprint, _merge = queue.merges['2019001']
+        merge_folder(queue.options, os.path.dirname(output_file) + os.sep)
+        queue.manifest.update(output_file, fingerprint)
+
+        queue = day_queue(source_folder, queue.manifest)
+        queue.arrived['2019001'] = set(TILES)
+        queue.queue_incomplete()
+
+        assert queue.pool.calls == []
+        assert queue.up_to_date == {'2019001'}
+
+
+class FakeEngine:
+    """
+    Writes each file to the download folder instead of requesting it
+    """
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    @staticmethod
+    def download(files, download_folder, **kwargs):
+        for name, _url in files:
+            with open(os.path.join(download_folder, name), 'w') as file:
+                file.write(name)
+            kwargs['on_complete'](name, True)
+
+
+def remote_files(_session, tiles, year, days, _file_types):
+    for day in days:
+        for tile in tiles:
+            doy = '{0}{1:03d}'.format(year, day)
+            yield file_name(doy, tile), 'https://example.com/' + doy
+
+
+def remote_files_without_day_2(session, tiles, year, days, file_types):
+    session.failed_days = [2]
+    return remote_files(
+        session, tiles, year, [day for day in days if day != 2], file_types
+    )
+
+
+def run_pipeline(tmpdir, merge=merge_folder, cli_args=(),
+                 files=remote_files):
+    pools = []
+
+    def pool(*args, **kwargs):
+        pools.append(SerialPool(*args, **kwargs))
+        return pools[-1]
+
+    with mock.patch.object(jpl_snow_pipeline, 'DownloadEngine', FakeEngine), \
+            mock.patch.object(jpl_snow_pipeline, 'Pool', pool), \
+            mock.patch.object(jpl_snow_pipeline, 'merge_folder', merge), \
+            mock.patch.object(
+                JPLData, 'iter_files_for_date_range', files
+            ):
+        result = CliRunner().invoke(jpl_snow_pipeline.data_pipeline, [
+            '--username', 'user',
+            '--password', 'secret',
+            '--download-folder', str(tmpdir),
+            '--year', str(YEAR),
+            '--day-from', '1',
+            '--day-to', '3',
+            '--source-type', 'fraction',
+            '--tiles', ','.join(TILES),
+            '--file-names', 'snow_fraction.tif',
+            *cli_args
+        ])
+
+    return result, [call for pool in pools for call in pool.calls]
+
+
+class TestDataPipeline:
+    def test_days_merged(self, tmpdir):
+        result, calls = run_pipeline(tmpdir)
+
+        assert result.exit_code == 0
+        assert sorted(
+            os.path.basename(os.path.dirname(args[1]))
+            for _function, args in calls
+        ) == ['2019001', '2019002', '2019003']
+
+    def test_merge_options(self, tmpdir):
+        _result, calls = run_pipeline(
+            tmpdir, cli_args=['--output-format', 'COG']
+        )
+
+        options = calls[0][1][0]
+        assert options['source_type'] == 'fraction'
+        assert options['single_pass'] is False
+        assert options['output_profile'].output_format == OutputProfile.COG
+
+    def test_manifest_saved(self, tmpdir):
+        run_pipeline(tmpdir)
+
+        manifest = MergeManifest(str(tmpdir.join(str(YEAR), 'snow_fraction')))
+        assert sorted(manifest.entries) == [
+            os.path.join(doy, doy + '_SCA.tif')
+            for doy in ['2019001', '2019002', '2019003']
+        ]
+
+    def test_up_to_date_days_skipped(self, tmpdir):
+        run_pipeline(tmpdir)
+
+        result, calls = run_pipeline(tmpdir)
+
+        assert result.exit_code == 0
+        assert '0 days to download, 3 are up to date' in result.output
+        assert calls == []
+
+    def test_changed_output_options_rebuilt(self, tmpdir):
+        run_pipeline(tmpdir)
+
+        result, calls = run_pipeline(
+            tmpdir, cli_args=['--compression', 'DEFLATE']
+        )
+
+        assert '3 days to download, 0 are up to date' in result.output
+        assert len(calls) == 3
+
+    def test_failed_day(self, tmpdir):
+        def failed_merge(options, doy_folder):
+            if '2019002' in doy_folder:
+                return doy_folder, 'Could not warp'
+            return merge_folder(options, doy_folder)
+
+        result, _calls = run_pipeline(tmpdir, failed_merge)
+
+        assert result.exit_code == 1
+        assert 'Failed to process day 2019002: Could not warp' in \
+            result.output
+
+    def test_failed_day_index(self, tmpdir):
+        result, calls = run_pipeline(
+            tmpdir, files=remote_files_without_day_2
+        )
+
+        assert result.exit_code == 1
+        assert len(calls) == 2
@@ -0,0 +1,28 @@
+import json
+from unittest import mock
+
+import pytest
+
+from snowrs.json_file import write_json
+
+
+class TestWriteJson:
+    def test_write(self, tmpdir):
+        file_name = str(tmpdir.join('cache.json'))
+
+        write_json(file_name, {'a': 1}, indent=1)
+
+        with open(file_name) as json_file:
+            assert json.load(json_file) == {'a': 1}
+        assert tmpdir.listdir() == [tmpdir.join('cache.json')]
+
+    def test_failed_write_keeps_file(self, tmpdir):
+        file_name = tmpdir.join('cache.json')
+        file_name.write('{"a": 1}')
+
+        with mock.patch('snowrs.json_file.json.dump', side_effect=ValueError):
+            with pytest.raises(ValueError):
+                write_json(str(file_name), {'a': 2})
+
+        assert file_name.read() == '{"a": 1}'
+        assert tmpdir.listdir() == [file_name]
@@ -0,0 +1,147 @@
+from unittest import mock
+
+import numpy
+import pytest
+from osgeo import gdal, gdalnumeric
+
+from snowrs import LayerReader
+
+FILE_NAME = '/data/2019001.h5'
+SNOW_FRACTION = numpy.arange(12, dtype=numpy.uint8).reshape(3, 4)
+GRAIN_SIZE = numpy.linspace(0, 1, 12, dtype=numpy.float32).reshape(3, 4)
+
+
+def subdataset(name):
+    return 'HDF5:"{0}"://Grid/MODIS_Grid_500m/{1}'.format(FILE_NAME, name)
+
+
+def mem_layer(values, data_type, no_data=None):
+    layer = gdal.GetDriverByName('MEM').Create(
+        '', values.shape[1], values.shape[0], 1, data_type
+    )
+    band = layer.GetRasterBand(1)
+    if no_data is not None:
+        band.SetNoDataValue(no_data)
+    gdalnumeric.BandWriteArray(band, values)
+    return layer
+
+
+class FakeContainer:
+    """
+    HDF container with MEM datasets as layers, which counts all opens
+    """
+    def __init__(self, layers):
+        self.layers = layers
+        self.opened = []
+
+    def GetSubDatasets(self):
+        return [(subdataset(name), name) for name in self.layers]
+
+    def open(self, name, _access):
+        self.opened.append(name)
+        if name == FILE_NAME:
+            return self
+        return self.layers[LayerReader.layer_name(name)]
+
+
+@pytest.fixture
+def container():
+    container = FakeContainer({
+        'snow_fraction': mem_layer(SNOW_FRACTION, gdal.GDT_Byte, 255),
+        'grain_size': mem_layer(GRAIN_SIZE, gdal.GDT_Float32),
+    })
+    with mock.patch('snowrs.layer_reader.gdal.Open', container.open):
+        yield container
+
+
+class TestLayerName:
+    def test_hdf5_path(self):
+        assert LayerReader.layer_name(
+            'HDF5:"/data/2019001.h5"://Grid/MODIS_Grid_500m/snow_fraction'
+        ) == 'snow_fraction'
+
+    def test_plain_name(self):
+        assert LayerReader.layer_name('snow_fraction') == 'snow_fraction'
+
+
+class TestLayerNames:
+    def test_same_name_in_other_group(self):
+        container = FakeContainer({})
+        container.GetSubDatasets = lambda: [
+            (subdataset('QA'), 'QA'),
+            ('HDF5:"{0}"://Grid/MODIS_Grid_1km/QA'.format(FILE_NAME), 'QA'),
+        ]
+
+        with mock.patch('snowrs.layer_reader.gdal.Open', container.open):
+            with pytest.raises(ValueError, match='QA is not unique'):
+                LayerReader(FILE_NAME).layer_names
+
+
+class TestRead:
+    def test_layer_names_in_container_order(self, container):
+        assert LayerReader(FILE_NAME).layer_names == [
+            'snow_fraction', 'grain_size'
+        ]
+
+    def test_stack_in_requested_order(self, container):
+        stack = LayerReader(FILE_NAME).read(['grain_size', 'snow_fraction'])
+
+        assert stack.shape == (2, 3, 4)
+        numpy.testing.assert_equal(stack[0], GRAIN_SIZE)
+        numpy.testing.assert_equal(stack[1], SNOW_FRACTION)
+
+    def test_size_mismatch(self, container):
+        container.layers['small'] = mem_layer(
+            numpy.zeros((2, 2), dtype=numpy.uint8), gdal.GDT_Byte
+        )
+
+        with pytest.raises(ValueError):
+            LayerReader(FILE_NAME).read()
+
+    def test_each_layer_opened_once(self, container):
+        reader = LayerReader(FILE_NAME)
+
+        reader.read()
+        reader.to_dataset(['grain_size'])
+        reader.layer('snow_fraction')
+
+        assert sorted(container.opened) == sorted([
+            FILE_NAME, subdataset('snow_fraction'), subdataset('grain_size')
+        ])
+
+
+class TestToDataset:
+    def test_bands_with_descriptions(self, container):
+        dataset = LayerReader(FILE_NAME).to_dataset()
+
+        assert dataset.RasterCount == 2
+        assert [
+            dataset.GetRasterBand(index).GetDescription()
+            for index in [1, 2]
+        ] == ['snow_fraction', 'grain_size']
+        numpy.testing.assert_equal(
+            dataset.GetRasterBand(1).ReadAsArray(), SNOW_FRACTION
+        )
+        numpy.testing.assert_equal(
+            dataset.GetRasterBand(2).ReadAsArray(), GRAIN_SIZE
+        )
+
+    def test_no_data_per_band(self, container):
+        dataset = LayerReader(FILE_NAME).to_dataset()
+
+        assert dataset.GetRasterBand(1).GetNoDataValue() == 255
+        assert dataset.GetRasterBand(2).GetNoDataValue() is None
+
+    def test_widest_data_type(self, container):
+        assert LayerReader(FILE_NAME).to_dataset().GetRasterBand(1) \
+            .DataType == gdal.GDT_Float32
+        assert LayerReader(FILE_NAME).to_dataset(['snow_fraction']) \
+            .GetRasterBand(1).DataType == gdal.GDT_Byte
+
+    def test_size_mismatch(self, container):
+        container.layers['small'] = mem_layer(
+            numpy.zeros((2, 2), dtype=numpy.uint8), gdal.GDT_Byte
+        )
+
+        with pytest.raises(ValueError):
+            LayerReader(FILE_NAME).to_dataset(['snow_fraction', 'small'])
@@ -0,0 +1,53 @@
+import os
+
+from snowrs import MergeManifest
+
+FINGERPRINT = {
+    'files': [['h24v05.tif', 1024, 1546300800.25]],
+    'limits': {'lower': 15.0, 'upper': 100.0},
+}
+
+
+def output_file(type_path):
+    day_folder = type_path.mkdir('2019001')
+    output = day_folder.join('2019001_SCA.tif')
+    output.write('')
+    return str(output)
+
+
+class TestMergeManifest:
+    def test_unknown_output(self, tmpdir):
+        manifest = MergeManifest(str(tmpdir))
+
+        assert not manifest.is_current(output_file(tmpdir), FINGERPRINT)
+
+    def test_saved_fingerprint(self, tmpdir):
+        output = output_file(tmpdir)
+        manifest = MergeManifest(str(tmpdir))
+        manifest.update(output, FINGERPRINT)
+        manifest.save()
+
+        assert MergeManifest(str(tmpdir)).is_current(output, FINGERPRINT)
+        assert tmpdir.listdir(lambda path: path.ext == '.tmp') == []
+
+    def test_changed_fingerprint(self, tmpdir):
+        output = output_file(tmpdir)
+        manifest = MergeManifest(str(tmpdir))
+        manifest.update(output, FINGERPRINT)
+
+        changed = dict(FINGERPRINT, files=[['h24v05.tif', 2048, 1.0]])
+
+        assert not manifest.is_current(output, changed)
+
+    def test_missing_output(self, tmpdir):
+        output = output_file(tmpdir)
+        manifest = MergeManifest(str(tmpdir))
+        manifest.update(output, FINGERPRINT)
+        os.remove(output)
+
+        assert not manifest.is_current(output, FINGERPRINT)
+
+    def test_unreadable_manifest(self, tmpdir):
+        tmpdir.join(MergeManifest.FILE_NAME).write('{')
+
+        assert MergeManifest(str(tmpdir)).entries == {}
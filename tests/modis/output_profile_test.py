@@ -0,0 +1,101 @@
+import click
+import pytest
+from click.testing import CliRunner
+
+from snowrs import ExecutionProfile, OutputProfile
+from snowrs.script_helpers import output_profile_options
+
+SINGLE_THREAD = ExecutionProfile(compression_threads=1)
+
+
+class TestOutputProfile:
+    def test_default_tiled_lzw(self):
+        assert OutputProfile().creation_options(SINGLE_THREAD) == [
+            'COMPRESS=LZW', 'TILED=YES', 'BIGTIFF=IF_SAFER', 'NUM_THREADS=1'
+        ]
+
+    def test_gtiff_level_and_predictor(self):
+        profile = OutputProfile(
+            compression='ZSTD', compression_level=9, predictor='standard'
+        )
+
+        assert profile.creation_options(SINGLE_THREAD) == [
+            'COMPRESS=ZSTD', 'TILED=YES', 'BIGTIFF=IF_SAFER',
+            'PREDICTOR=2', 'ZSTD_LEVEL=9', 'NUM_THREADS=1'
+        ]
+
+    def test_cog_options(self):
+        profile = OutputProfile(
+            output_format='COG', compression='DEFLATE', compression_level=6,
+            predictor='floating_point'
+        )
+
+        assert profile.creation_options(SINGLE_THREAD) == [
+            'COMPRESS=DEFLATE', 'BIGTIFF=IF_SAFER',
+            'PREDICTOR=FLOATING_POINT', 'OVERVIEW_RESAMPLING=NEAREST',
+            'LEVEL=6', 'NUM_THREADS=1'
+        ]
+
+    def test_cog_streams_gtiff(self):
+        profile = OutputProfile(output_format='COG', compression='ZSTD')
+
+        options = profile.streaming_options(SINGLE_THREAD)
+
+        assert options['format'] == OutputProfile.GTIFF
+        assert 'TILED=YES' in options['creationOptions']
+        assert profile.translate_options(SINGLE_THREAD)['format'] == 'COG'
+
+    def test_extra_options(self):
+        options = OutputProfile().creation_options(
+            SINGLE_THREAD, extra=['INTERLEAVE=BAND']
+        )
+
+        assert options[-2:] == ['INTERLEAVE=BAND', 'NUM_THREADS=1']
+
+    @pytest.mark.parametrize('kwargs', [
+        {'output_format': 'PNG'},
+        {'compression': 'JPEG'},
+        {'predictor': 'diagonal'},
+    ])
+    def test_invalid_options(self, kwargs):
+        with pytest.raises(ValueError):
+            OutputProfile(**kwargs)
+
+
+class TestOutputProfileOptions:
+    @staticmethod
+    def command(received):
+        @click.command()
+        @click.option('--name')
+        @output_profile_options
+        def profile_command(**kwargs):
+            received.update(kwargs)
+
+        return profile_command
+
+    def test_options_to_profile(self):
+        received = {}
+
+        result = CliRunner().invoke(self.command(received), [
+            '--name', 'day', '--output-format', 'COG',
+            '--compression', 'ZSTD', '--compression-level', '9',
+            '--predictor', 'standard',
+        ])
+
+        assert result.exit_code == 0
+        assert sorted(received) == ['name', 'output_profile']
+        profile = received['output_profile']
+        assert profile.is_cog
+        assert profile.compression == 'ZSTD'
+        assert profile.compression_level == 9
+        assert profile.predictor == 'standard'
+
+    def test_defaults(self):
+        received = {}
+
+        CliRunner().invoke(self.command(received), [])
+
+        profile = received['output_profile']
+        assert profile.output_format == OutputProfile.GTIFF
+        assert profile.compression == 'LZW'
+        assert profile.predictor == 'none'
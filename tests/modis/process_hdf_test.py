@@ -0,0 +1,192 @@
+import os
+from unittest import mock
+
+import numpy
+from click.testing import CliRunner
+from numpy.testing import assert_equal
+from osgeo import gdal, gdalnumeric, osr
+
+from scripts.modis import process_hdf
+from snowrs import LayerReader, ReferenceInfo
+
+YEAR = '2019'
+FILES = ['2019001.h5', '2019002.h5']
+REFERENCE_FILE = 'reference.h5'
+
+# Sinusoidal grid of tile h24v05
+GEO_TRANSFORM = (7783653.6, 463.3127, 0, 4447802.1, 0, -463.3127)
+SIZE = (8, 6)
+
+LAYERS = {
+    'snow_fraction': (numpy.uint8, gdal.GDT_Byte, 255),
+    'grain_size': (numpy.float32, gdal.GDT_Float32, None),
+}
+
+
+def mem_layer(name):
+    dtype, data_type, no_data = LAYERS[name]
+    layer = gdal.GetDriverByName('MEM').Create('', *SIZE, 1, data_type)
+    layer.SetGeoTransform(GEO_TRANSFORM)
+    projection = osr.SpatialReference()
+    projection.ImportFromProj4(ReferenceInfo.GCP_PROJECTION)
+    layer.SetProjection(projection.ExportToWkt())
+
+    band = layer.GetRasterBand(1)
+    if no_data is not None:
+        band.SetNoDataValue(no_data)
+    values = numpy.arange(SIZE[0] * SIZE[1]).reshape(SIZE[1], SIZE[0])
+    gdalnumeric.BandWriteArray(band, values.astype(dtype))
+    return layer
+
+
+class FakeLayerReader(LayerReader):
+    """
+    Serves MEM layers for every file instead of reading an HDF5 container
+    """
+    @property
+    def subdatasets(self):
+        return dict((name, name) for name in LAYERS)
+
+    def layer(self, name):
+        if name not in self._layers:
+            self._layers[name] = mem_layer(name)
+        return self._layers[name]
+
+
+def source_folder(tmpdir):
+    """
+    Empty source and reference files, the layers come from FakeLayerReader
+    """
+    year_folder = tmpdir.mkdir(YEAR)
+    for file in FILES:
+        year_folder.join(file).write('')
+    tmpdir.join(REFERENCE_FILE).write('')
+    return year_folder
+
+
+def execute_runner(tmpdir, cli_args=()):
+    year_folder = source_folder(tmpdir)
+
+    with mock.patch.object(process_hdf, 'LayerReader', FakeLayerReader), \
+            mock.patch('snowrs.reference_info.LayerReader', FakeLayerReader):
+        result = CliRunner().invoke(process_hdf.process_folder, [
+            '--source-folder', str(tmpdir),
+            '--tmp-folder', str(tmpdir),
+            '--reference-file', str(tmpdir.join(REFERENCE_FILE)),
+            '--year', YEAR,
+            *cli_args
+        ])
+
+    return result, year_folder
+
+
+def read_bands(file_name):
+    output = gdal.Open(str(file_name))
+    bands = [
+        (
+            output.GetRasterBand(index + 1).GetDescription(),
+            output.GetRasterBand(index + 1).ReadAsArray(),
+        )
+        for index in range(output.RasterCount)
+    ]
+    del output
+    return bands
+
+
+class TestLayerFiles:
+    def test_output_per_layer(self, tmpdir):
+        result, year_folder = execute_runner(tmpdir)
+
+        assert result.exit_code == 0
+        for file in FILES:
+            for name in LAYERS:
+                assert year_folder.join(
+                    process_hdf.output_file_name(file, name)
+                ).exists()
+        assert year_folder.listdir(lambda path: 'part' in path.basename) == []
+
+    def test_part_file_replaces_output(self, tmpdir):
+        with mock.patch.object(
+                process_hdf.os, 'replace', wraps=os.replace
+        ) as replace:
+            _result, year_folder = execute_runner(tmpdir)
+
+        output_file = str(year_folder.join(
+            process_hdf.output_file_name(FILES[0], 'snow_fraction')
+        ))
+        replace.assert_any_call(
+            output_file + process_hdf.PART_FILE_SUFFIX, output_file
+        )
+
+    def test_data_type_of_layer(self, tmpdir):
+        _result, year_folder = execute_runner(tmpdir)
+
+        output = gdal.Open(str(year_folder.join(
+            process_hdf.output_file_name(FILES[0], 'snow_fraction')
+        )))
+        assert output.RasterCount == 1
+        assert output.GetRasterBand(1).DataType == gdal.GDT_Byte
+        del output
+
+
+class TestStacked:
+    def test_bands_and_descriptions(self, tmpdir):
+        result, year_folder = execute_runner(tmpdir, ['--stacked'])
+
+        assert result.exit_code == 0
+        bands = read_bands(year_folder.join(
+            FILES[0].replace('.h5', process_hdf.STACKED_FILE_SUFFIX)
+        ))
+        assert [description for description, _values in bands] == \
+            list(LAYERS)
+
+    def test_bands_match_layer_files(self, tmpdir):
+        _result, stacked_folder = execute_runner(
+            tmpdir.mkdir('stacked'), ['--stacked']
+        )
+        _result, layer_folder = execute_runner(tmpdir.mkdir('layers'))
+
+        bands = read_bands(stacked_folder.join(
+            FILES[0].replace('.h5', process_hdf.STACKED_FILE_SUFFIX)
+        ))
+        for name, values in bands:
+            [(_description, layer_values)] = read_bands(layer_folder.join(
+                process_hdf.output_file_name(FILES[0], name)
+            ))
+            assert_equal(values, layer_values)
+
+
+class TestWorkers:
+    def test_same_outputs_as_serial(self, tmpdir):
+        _result, serial_folder = execute_runner(tmpdir.mkdir('serial'))
+        result, pool_folder = execute_runner(
+            tmpdir.mkdir('pool'), ['--workers', '2']
+        )
+
+        assert result.exit_code == 0
+        for file in FILES:
+            for name in LAYERS:
+                output_file = process_hdf.output_file_name(file, name)
+                [(_name, serial)] = read_bands(serial_folder.join(output_file))
+                [(_name, pool)] = read_bands(pool_folder.join(output_file))
+                assert_equal(pool, serial)
+
+
+class TestFailedWrite:
+    @staticmethod
+    def failed_translate(part_file, *_args, **_kwargs):
+        # Leave a partial file behind like an interrupted write
+        with open(part_file, 'w') as part:
+            part.write('partial')
+        return None
+
+    def test_part_file_removed(self, tmpdir):
+        with mock.patch.object(
+                process_hdf.gdal, 'Translate', self.failed_translate
+        ):
+            result, year_folder = execute_runner(tmpdir)
+
+        assert result.exit_code == 1
+        assert 'Could not write' in result.output
+        assert year_folder.listdir(lambda path: 'part' in path.basename) == []
+        assert year_folder.listdir(lambda path: path.ext == '.tif') == []
@@ -0,0 +1,144 @@
+import json
+import os
+from unittest import mock
+
+import numpy
+import pytest
+from osgeo import gdal
+
+from snowrs import LayerReader, ReferenceInfo
+from snowrs.json_file import write_json
+
+# Four GCPs within the basin and one outside
+GCPS = [
+    (80.0, 30.0, 0, 0, 0),
+    (81.0, 30.0, 0, 4, 0),
+    (80.0, 29.0, 0, 0, 3),
+    (81.0, 29.0, 0, 4, 3),
+    (10.0, 10.0, 0, 2, 2),
+]
+CACHED_GRID = {'output_bounds': [0, 0, 1, 1], 'width': 1, 'height': 1}
+CACHED_GCPS = [[80.5, 29.5, 0, 2, 1]] * 3
+
+
+class GCPLayerReader(LayerReader):
+    """
+    Serves a MEM layer with GCPs instead of reading an HDF5 container
+    """
+    @property
+    def subdatasets(self):
+        return {'snow_fraction': 'snow_fraction'}
+
+    def layer(self, name):
+        layer = gdal.GetDriverByName('MEM').Create('', 4, 3, 1, gdal.GDT_Byte)
+        layer.SetGCPs([gdal.GCP(*gcp) for gcp in GCPS], '')
+        return layer
+
+
+@pytest.fixture
+def reference_file(tmpdir):
+    file = tmpdir.join('reference.h5')
+    file.write('')
+    with mock.patch('snowrs.reference_info.LayerReader', GCPLayerReader):
+        yield str(file)
+
+
+def cache_file(reference_file):
+    return reference_file + ReferenceInfo.CACHE_FILE_SUFFIX
+
+
+def edit_cache(reference_file, **values):
+    with open(cache_file(reference_file)) as cache:
+        content = json.load(cache)
+    content.update(values)
+    write_json(cache_file(reference_file), content)
+
+
+class TestBasinMask:
+    def test_bounds(self):
+        x = numpy.array([
+            ReferenceInfo.GCP_X_MIN, ReferenceInfo.GCP_X_MAX, 80.0, 130.0,
+        ])
+        y = numpy.array([
+            ReferenceInfo.GCP_Y_MIN, ReferenceInfo.GCP_Y_MAX, 10.0, 30.0,
+        ])
+
+        assert ReferenceInfo.basin_mask(x, y).tolist() == \
+            [True, True, False, False]
+
+    def test_empty(self):
+        assert ReferenceInfo.basin_mask(
+            numpy.array([]), numpy.array([])
+        ).size == 0
+
+
+class TestWarpCache:
+    def test_cache_written(self, reference_file):
+        info = ReferenceInfo(reference_file)
+        info.warp_grid
+
+        with open(cache_file(reference_file)) as cache:
+            content = json.load(cache)
+        assert content['warp_grid'] == info.warp_grid
+        assert len(content['gcps']) == 4
+
+    def test_cache_reused(self, reference_file):
+        ReferenceInfo(reference_file).warp_grid
+        edit_cache(reference_file, warp_grid=CACHED_GRID, gcps=CACHED_GCPS)
+
+        with mock.patch('snowrs.reference_info.gdal.Warp') as warp:
+            info = ReferenceInfo(reference_file)
+
+            assert info.warp_grid == CACHED_GRID
+        assert len(info.gcps) == 3
+        warp.assert_not_called()
+
+    def test_changed_reference_file(self, reference_file):
+        ReferenceInfo(reference_file).warp_grid
+        edit_cache(reference_file, warp_grid=CACHED_GRID, gcps=CACHED_GCPS)
+        modified = os.path.getmtime(reference_file) + 60
+        os.utime(reference_file, (modified, modified))
+
+        info = ReferenceInfo(reference_file)
+
+        assert info.warp_grid != CACHED_GRID
+        assert len(info.gcps) == 4
+
+    def test_changed_basin(self, reference_file):
+        ReferenceInfo(reference_file).warp_grid
+        edit_cache(reference_file, warp_grid=CACHED_GRID, gcps=CACHED_GCPS)
+
+        with mock.patch.object(ReferenceInfo, 'GCP_X_MAX', 100.0):
+            info = ReferenceInfo(reference_file)
+
+            assert info.warp_grid != CACHED_GRID
+            assert len(info.gcps) == 4
+
+    def test_without_cache_file(self, reference_file):
+        ReferenceInfo(reference_file, cache_file=None).warp_grid
+
+        assert not os.path.exists(cache_file(reference_file))
+
+    @pytest.mark.parametrize('values', [
+        {'warp_grid': None},
+        {'warp_grid': {'width': 1, 'height': 1}},
+        {'warp_grid': dict(CACHED_GRID, output_bounds=[0, 1])},
+        {'gcps': 5},
+        {'gcps': [[80.5, 29.5, 0]]},
+        {'gcps': [['80.5E', 29.5, 0, 2, 1]]},
+    ])
+    def test_incomplete_cache(self, reference_file, values):
+        ReferenceInfo(reference_file).warp_grid
+        edit_cache(reference_file, **values)
+
+        info = ReferenceInfo(reference_file)
+
+        assert len(info.gcps) == 4
+        assert sorted(info.warp_grid) == ['height', 'output_bounds', 'width']
+
+    def test_cache_without_object(self, reference_file):
+        write_json(cache_file(reference_file), [CACHED_GRID])
+
+        info = ReferenceInfo(reference_file)
+
+        assert len(info.gcps) == 4
@@ -0,0 +1,49 @@
+from snowrs import SourceFolder
+from snowrs.download_ledger import DownloadLedger
+
+FILES = [
+    'MOD09GA.A2018001.h24v05.snow_fraction.tif',
+    'MOD09GA.A2018001.h25v05.snow_fraction.tif',
+    'MOD09GA.A2018002.h24v05.snow_fraction.tif',
+]
+
+
+def source_folder(tmpdir):
+    type_path = tmpdir.mkdir('2018').mkdir('snow_fraction')
+    for file in FILES:
+        type_path.join(file).write('')
+
+    folder = SourceFolder(str(tmpdir), source_type='fraction')
+    folder.year = 2018
+    return folder, type_path
+
+
+class TestProcessNewFiles:
+    def test_move_all_days(self, tmpdir):
+        folder, type_path = source_folder(tmpdir)
+
+        folder.process_new_files()
+
+        assert len(type_path.join('2018001').listdir()) == 2
+        assert len(type_path.join('2018002').listdir()) == 1
+
+    def test_move_single_day(self, tmpdir):
+        folder, type_path = source_folder(tmpdir)
+
+        folder.process_new_files('2018001')
+
+        assert len(type_path.join('2018001').listdir()) == 2
+        assert not type_path.join('2018002').exists()
+        assert type_path.join(FILES[2]).exists()
+
+    def test_moved_file_recorded_in_ledger(self, tmpdir):
+        folder, type_path = source_folder(tmpdir)
+        ledger = DownloadLedger(str(type_path))
+        ledger.record(FILES[0], 0)
+
+        folder.process_new_files('2018001', ledger)
+
+        assert ledger.file_path(FILES[0]) == \
+            str(type_path.join('2018001', FILES[0]))
+        assert DownloadLedger(str(type_path)).is_complete(FILES[0])
+        assert DownloadLedger(str(type_path)).entry(FILES[1]) is None
@@ -0,0 +1,146 @@
+import os
+import shutil
+from unittest import mock
+
+import numpy
+import pytest
+from osgeo import gdal
+
+from snowrs import OutputProfile, TileMerger
+
+TEST_TIFFS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'source_tiffs'
+)
+
+
+class FakeBand:
+    def __init__(self, x_size, y_size, block_size):
+        self.XSize = x_size
+        self.YSize = y_size
+        self.block_size = block_size
+
+    def GetBlockSize(self):
+        return self.block_size
+
+
+def budget(block_x, block_y, blocks):
+    return block_x * block_y * blocks * TileMerger.WINDOW_BYTES_PER_PIXEL
+
+
+class TestWindows:
+    def test_full_rows_within_budget(self):
+        merger = TileMerger('', 'fraction', window_budget=budget(4, 2, 6))
+        windows = list(merger.windows(FakeBand(10, 5, [4, 2])))
+
+        assert windows == [(0, 0, 10, 4), (0, 4, 10, 1)]
+
+    def test_partial_rows_when_over_budget(self):
+        merger = TileMerger('', 'fraction', window_budget=budget(4, 2, 2))
+        windows = list(merger.windows(FakeBand(10, 2, [4, 2])))
+
+        assert windows == [(0, 0, 8, 2), (8, 0, 2, 2)]
+
+    def test_at_least_one_block(self):
+        merger = TileMerger('', 'forcing', window_budget=1)
+        windows = list(merger.windows(FakeBand(6, 3, [3, 3])))
+
+        assert windows == [(0, 0, 3, 3), (3, 0, 3, 3)]
+
+    def test_windows_cover_band(self):
+        merger = TileMerger('', 'forcing', window_budget=budget(3, 3, 5))
+        coverage = numpy.zeros((20, 31), dtype=numpy.int8)
+
+        for x_off, y_off, x_size, y_size in merger.windows(
+                FakeBand(31, 20, [3, 3])
+        ):
+            coverage[y_off:y_off + y_size, x_off:x_off + x_size] += 1
+
+        assert (coverage == 1).all()
+
+
+class TestFingerprint:
+    @pytest.fixture
+    def day_folder(self, tmpdir):
+        folder = tmpdir.mkdir('2019001')
+        folder.join('MOD09GA.A2019001.h24v05.snow_fraction.tif').write('')
+        return os.path.join(str(folder), '')
+
+    def test_same_settings(self, day_folder):
+        assert TileMerger(day_folder, 'fraction').fingerprint == \
+            TileMerger(day_folder, 'fraction').fingerprint
+
+    def test_source_files(self, day_folder):
+        fingerprint = TileMerger(day_folder, 'fraction').fingerprint
+
+        assert [name for name, _size, _mtime in fingerprint['files']] == \
+            ['MOD09GA.A2019001.h24v05.snow_fraction.tif']
+
+    @pytest.mark.parametrize('kwargs', [
+        {'output_format': OutputProfile.COG},
+        {'compression': 'DEFLATE'},
+        {'compression': 'DEFLATE', 'compression_level': 9},
+        {'predictor': 'standard'},
+    ])
+    def test_output_settings(self, day_folder, kwargs):
+        default = TileMerger(day_folder, 'fraction')
+        changed = TileMerger(
+            day_folder, 'fraction', output_profile=OutputProfile(**kwargs)
+        )
+
+        assert changed.fingerprint != default.fingerprint
+
+    def test_single_pass(self, day_folder):
+        default = TileMerger(day_folder, 'fraction')
+        single_pass = TileMerger(day_folder, 'fraction', single_pass=True)
+
+        assert single_pass.fingerprint != default.fingerprint
+
+    def test_execution_settings_ignored(self, day_folder):
+        default = TileMerger(day_folder, 'fraction')
+        changed = TileMerger(day_folder, 'fraction', window_budget=1)
+
+        assert changed.fingerprint == default.fingerprint
+
+
+class TestFilterValues:
+    def test_filter_limits(self):
+        merger = TileMerger('', 'fraction')
+        values = numpy.array([[0, 15, 100], [101, 50, 2550]], dtype=numpy.int16)
+
+        merger.filter_values(values)
+
+        assert values.tolist() == [[-999, 15, 100], [-999, 50, -999]]
+
+
+class TestProjectedMosaicFailure:
+    @pytest.fixture
+    def day_folder(self, tmpdir):
+        folder = tmpdir.join('2019001')
+        shutil.copytree(TEST_TIFFS_DIR, str(folder))
+        return os.path.join(str(folder), '')
+
+    def test_cleanup_when_warp_fails(self, day_folder):
+        merger = TileMerger(day_folder, 'fraction')
+        vrt_python = gdal.GetConfigOption('GDAL_VRT_ENABLE_PYTHON')
+
+        with mock.patch.object(
+                gdal, 'Warp', side_effect=RuntimeError('Warp failed')
+        ):
+            with pytest.raises(RuntimeError):
+                merger.create_projected_mosaic()
+
+        assert gdal.GetConfigOption('GDAL_VRT_ENABLE_PYTHON') == vrt_python
+        assert not os.path.exists(merger.mosaic_vrt_file)
+
+    def test_error_when_warp_returns_none(self, day_folder):
+        merger = TileMerger(day_folder, 'fraction')
+
+        with mock.patch.object(gdal, 'Warp', return_value=None), \
+                mock.patch.object(
+                    gdal, 'GetLastErrorMsg', return_value='Disk full'
+                ):
+            status = merger.run(single_pass=True)
+
+        assert status.startswith('Could not warp: ')
+        assert status.endswith(': Disk full')
+        assert not os.path.exists(merger.mosaic_vrt_file)